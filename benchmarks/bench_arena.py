@@ -0,0 +1,29 @@
+import sys
+import timeit
+
+from benchmarks.bench_ast_memory import retained
+from benchmarks.bench_parser import peak_memory
+from benchmarks.programs import program
+from compiler.arena import Arena
+from compiler.codegen import arena_to_ir, to_ir
+from compiler.lexer import TokenStream
+from compiler.parser import CMinusParser
+from compiler.semantics import analyze, analyze_arena
+
+
+def bench(name: str, fn, repeat: int):
+    seconds = min(timeit.repeat(fn, number=1, repeat=repeat))
+    print(f'{name:18}{seconds:9.3f} s{peak_memory(fn) / 1e6:10.1f} MB peak')
+
+
+if __name__ == '__main__':
+    functions = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    tree = CMinusParser(TokenStream.from_string(program(functions))).parse()
+    arena = Arena.from_tree(tree)
+    assert to_ir(analyze(tree)) == arena_to_ir(analyze_arena(arena))
+    print(f'{len(arena):,} nodes: tree {retained(lambda: Arena.from_tree(tree).to_tree()) / 1e6:.1f} MB, '
+          f'arena {retained(lambda: Arena.from_tree(tree)) / 1e6:.1f} MB, serialized {len(arena.to_bytes()) / 1e6:.1f} MB')
+    bench('analyze tree', lambda: analyze(tree), 3)
+    bench('analyze arena', lambda: analyze_arena(arena), 3)
+    bench('to_ir tree', lambda: to_ir(tree), 3)
+    bench('to_ir arena', lambda: arena_to_ir(arena), 3)
@@ -0,0 +1,61 @@
+import sys
+import tracemalloc
+
+from benchmarks.programs import program
+from compiler.astnodes import Node
+from compiler.lexer import TokenStream
+from compiler.parser import CMinusParser
+
+
+def legacy_class(cls: type) -> type:
+    # A class with the same fields as cls, kept in a per-instance __dict__ like the nodes were before
+    # they had __slots__
+    def __init__(self, *values):
+        for field, value in zip(cls.fields, values):
+            setattr(self, field, value)
+    return type(cls.__name__, (), {'__init__': __init__})
+
+
+def rebuild(node, classes: dict):
+    # Copies the tree into the given classes. Leaves (names, numbers, types) are shared with the original
+    if isinstance(node, list):
+        return [rebuild(item, classes) for item in node]
+    if isinstance(node, Node):
+        return classes[type(node)](*(rebuild(getattr(node, field), classes) for field in node.fields))
+    return node
+
+
+def count(node) -> int:
+    if isinstance(node, list):
+        return sum(count(item) for item in node)
+    if isinstance(node, Node):
+        return 1 + sum(count(getattr(node, field)) for field in node.fields)
+    return 0
+
+
+def retained(fn) -> int:
+    # Memory allocated by fn that is still held by its result
+    tracemalloc.start()
+    result = fn()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return size
+
+
+if __name__ == '__main__':
+    nodes = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    per_function = count(CMinusParser(TokenStream.from_string(program(100))).parse()) / 100
+    tree = CMinusParser(TokenStream.from_string(program(int(nodes / per_function)))).parse()
+    nodes = count(tree)
+    classes, subclasses = {}, [Node]
+    while subclasses:
+        cls = subclasses.pop()
+        classes[cls] = cls
+        subclasses.extend(cls.__subclasses__())
+    legacy = {cls: legacy_class(cls) for cls in classes}
+    old = retained(lambda: rebuild(tree, legacy))
+    new = retained(lambda: rebuild(tree, classes))
+    print(f'{nodes:,} nodes')
+    print(f'__dict__ {old / 1e6:8.1f} MB{old / nodes:8.1f} bytes/node')
+    print(f'__slots__{new / 1e6:8.1f} MB{new / nodes:8.1f} bytes/node')
+    print(f'reduction: {old / new:.2f}x')
@@ -0,0 +1,104 @@
+import sys
+import timeit
+
+from compiler.astnodes import *
+from compiler.codegen import CodeGenerator, Quadruple
+
+
+class ConcatenatingCodeGenerator(CodeGenerator):
+    # Statements return their quadruples and each enclosing statement joins those of its children, as
+    # before: a quadruple is copied once for every statement it is nested in. Branch offsets are
+    # relative and made absolute at the end. Expressions are still emitted, then cut out of the buffer
+
+    def program(self, program: Program) -> List[Quadruple]:
+        return [(q[0], q[1], q[2], str(q[3] + i + 1)) if q[0].startswith('br') else q for i, q in
+                enumerate([q for d in program.declarations for q in self.visit(d)])]
+
+    def cut(self, expr: Expression):
+        start = len(self.ir)
+        ref = self.expression(expr)
+        quads = [self.ir[i] for i in range(start, len(self.ir))]
+        del self.ir.ops[start:], self.ir.operands[3 * start:]
+        return quads, self.ir.value(ref)
+
+    def global_declaration(self, dec: VarDeclaration):
+        return [self.var_declaration(dec)]
+
+    def var_declaration(self, dec: VarDeclaration) -> Quadruple:
+        return 'alloc', str(4 * (dec.array or Number(1)).value), None, dec.name
+
+    def fun_declaration(self, dec: FunDeclaration):
+        func = ('func', dec.name, dec.type.to_string(), str(len(dec.params)))
+        params = [('param', None, None, p.name) for p in dec.params]
+        allocs = [('alloc', '4', None, p.name) for p in dec.params]
+        return [func] + params + allocs + self.compound_statement(dec.body) + [('end', 'func', dec.name, None)]
+
+    def compound_statement(self, stmt: CompoundStatement):
+        allocs = [self.var_declaration(dec) for dec in stmt.vars]
+        return allocs + [quad for stmt in stmt.body for quad in self.visit(stmt)]
+
+    def expression_statement(self, stmt: ExpressionStatement):
+        return self.cut(stmt.expression)[0] if stmt.expression is not None else []
+
+    def block(self, stmt: CompoundStatement):
+        return [('block', None, None, None)] + self.compound_statement(stmt) + [('end', 'block', None, None)]
+
+    def comparison(self, cond: Expression):
+        quads, ref = self.cut(cond)
+        if self.last_equality_op is None:
+            ref2 = self.ir.value(self.next_temp())
+            self.last_equality_op = '>'
+            return quads + [('comp', ref, '0', ref2)], ref2
+        return quads, ref
+
+    def if_statement(self, stmt: IfStatement):
+        cond, ref = self.comparison(stmt.cond)
+        jump = self.next_jump()
+        true = self.visit(stmt.true)
+        false = self.visit(stmt.false) if stmt.false is not None else []
+        return cond + [(jump, ref, None, len(true) + 2)] + true + [('br', None, None, len(false) + 1)] + false
+
+    def while_statement(self, stmt: WhileStatement):
+        cond, ref = self.comparison(stmt.cond)
+        jump = self.next_jump()
+        quads = self.visit(stmt.body)
+        jump_loop = ('br', None, None, -(len(quads) + len(cond) + 1))
+        return cond + [(jump, ref, None, len(quads) + 2)] + quads + [jump_loop]
+
+    def return_statement(self, stmt: ReturnStatement):
+        if stmt.expression is None:
+            return [('return', None, None, None)]
+        quads, ref = self.cut(stmt.expression)
+        return quads + [('return', None, None, ref)]
+
+
+def nested(depth: int) -> Program:
+    # main with ifs and whiles nested depth deep, each with an assignment before the next one
+    body: Statement = ExpressionStatement(AssignmentExpression(Variable('x', None), Number(0)))
+    for i in range(depth):
+        cond = BinaryOp('<', Variable('x', None), Number(i))
+        step = ExpressionStatement(AssignmentExpression(Variable('x', None),
+                                                        BinaryOp('+', Variable('x', None), Number(1))))
+        inner = CompoundStatement([], [step, body])
+        body = IfStatement(cond, inner, None) if i % 2 else WhileStatement(cond, inner)
+    main = FunDeclaration(Type.VOID, 'main', [], CompoundStatement([VarDeclaration(Type.INTEGER, 'x', None)], [body]))
+    return Program([main])
+
+
+def bench(fn, quads: int, repeat: int = 3) -> float:
+    return min(timeit.repeat(fn, number=1, repeat=repeat)) / quads * 1e9
+
+
+if __name__ == '__main__':
+    sys.setrecursionlimit(100000)
+    deepest = int(sys.argv[1]) if len(sys.argv) > 1 else 4000
+    print(f'{"depth":>8}{"quads":>10}{"concatenating":>18}{"buffer":>12}')
+    depth = deepest // 16 or 1
+    while depth <= deepest:
+        tree = nested(depth)
+        ir = list(CodeGenerator().program(tree))
+        assert ConcatenatingCodeGenerator().program(tree) == ir
+        old = bench(lambda: ConcatenatingCodeGenerator().program(tree), len(ir))
+        new = bench(lambda: CodeGenerator().program(tree), len(ir))
+        print(f'{depth:8,}{len(ir):10,}{old:13.0f} ns/q{new:7.0f} ns/q')
+        depth *= 2
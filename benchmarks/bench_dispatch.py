@@ -0,0 +1,91 @@
+import sys
+import timeit
+
+from benchmarks.bench_ast_memory import count
+from benchmarks.programs import program
+from compiler.astnodes import *
+from compiler.codegen import CodeGenerator
+from compiler.lexer import TokenStream
+from compiler.parser import CMinusParser
+from compiler.semantics import SemanticAnalyzer
+
+
+def isinstance_chain(methods: list):
+    # A visit method that finds the method for a node with a chain of isinstance checks, in the order
+    # the passes checked them before they had dispatch tables
+    def visit(self, node, *args):
+        for node_class, method in methods:
+            if isinstance(node, node_class):
+                return getattr(self, method)(node, *args)
+        raise Exception(f'Unknown node type {node.__class__.__name__}')
+    return visit
+
+
+ANALYZER_METHODS = [
+    (BinaryOp, 'visit_binary_op'), (AssignmentExpression, 'visit_assignment_expression'),
+    (Variable, 'visit_variable'), (Call, 'visit_call'), (Number, 'visit_number'),
+    (ExpressionStatement, 'visit_expression_statement'), (CompoundStatement, 'visit_compound_statement'),
+    (IfStatement, 'visit_if_statement'), (WhileStatement, 'visit_while_statement'),
+    (ReturnStatement, 'visit_return_statement'),
+    (VarDeclaration, 'visit_var_declaration'), (FunDeclaration, 'visit_fun_declaration'),
+]
+
+
+class ChainAnalyzer(SemanticAnalyzer):
+    visit = isinstance_chain(ANALYZER_METHODS)
+
+
+class ChainCodeGenerator(CodeGenerator):
+    visit = isinstance_chain([
+        (BinaryOp, 'binary_op'), (AssignmentExpression, 'assignment_expression'), (Call, 'call_expression'),
+        (Variable, 'variable'), (Number, 'number'),
+        (ExpressionStatement, 'expression_statement'), (CompoundStatement, 'block'), (IfStatement, 'if_statement'),
+        (WhileStatement, 'while_statement'), (ReturnStatement, 'return_statement'),
+        (VarDeclaration, 'global_declaration'), (FunDeclaration, 'fun_declaration'),
+    ])
+
+
+def bench(name: str, fn, nodes: int, repeat: int = 5) -> float:
+    seconds = min(timeit.repeat(fn, number=1, repeat=repeat))
+    print(f'{name:24}{seconds:9.3f} s{seconds / nodes * 1e9:9.0f} ns/node')
+    return seconds
+
+
+if __name__ == '__main__':
+    functions = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    tree = CMinusParser(TokenStream.from_string(program(functions))).parse()
+    nodes = count(tree)
+    assert list(ChainCodeGenerator().program(tree)) == list(CodeGenerator().program(tree))
+    print(f'{nodes:,} nodes')
+    old = bench('analyze isinstance', lambda: ChainAnalyzer().visit_program(tree), nodes)
+    new = bench('analyze table', lambda: SemanticAnalyzer().visit_program(tree), nodes)
+    print(f'speedup: {old / new:.2f}x')
+    old = bench('codegen isinstance', lambda: ChainCodeGenerator().program(tree), nodes)
+    new = bench('codegen table', lambda: CodeGenerator().program(tree), nodes)
+    print(f'speedup: {old / new:.2f}x')
+
+    # Dispatch alone, on the expressions of the program
+    expressions, stack = [], [tree]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, list):
+            stack.extend(node)
+        elif isinstance(node, Node):
+            if isinstance(node, Expression):
+                expressions.append(node)
+            stack.extend(getattr(node, field) for field in node.fields)
+    table = SemanticAnalyzer.dispatch
+
+    def by_chain():
+        for node in expressions:
+            for node_class, method in ANALYZER_METHODS:
+                if isinstance(node, node_class):
+                    break
+
+    def by_table():
+        for node in expressions:
+            table[node.__class__]
+
+    old = bench('dispatch isinstance', by_chain, len(expressions))
+    new = bench('dispatch table', by_table, len(expressions))
+    print(f'speedup: {old / new:.2f}x')
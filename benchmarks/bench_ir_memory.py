@@ -0,0 +1,24 @@
+import sys
+import timeit
+
+from benchmarks.bench_ast_memory import retained
+from benchmarks.programs import program
+from compiler.codegen import CodeGenerator
+from compiler.lexer import TokenStream
+from compiler.parser import CMinusParser
+
+
+if __name__ == '__main__':
+    functions = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    tree = CMinusParser(TokenStream.from_string(program(functions))).parse()
+    ir = CodeGenerator().program(tree)
+    n = len(ir)
+    old = retained(lambda: list(CodeGenerator().program(tree)))
+    new = retained(lambda: CodeGenerator().program(tree))
+    print(f'{functions:,} functions, {n:,} quadruples, {len(ir.pool):,} pooled operands')
+    print(f'tuples {old / 1e6:8.1f} MB{old / n:8.1f} bytes/quadruple')
+    print(f'IR     {new / 1e6:8.1f} MB{new / n:8.1f} bytes/quadruple')
+    print(f'reduction: {old / new:.2f}x')
+    for name, fn in [('generating', lambda: CodeGenerator().program(tree)), ('reading back', lambda: list(ir))]:
+        seconds = min(timeit.repeat(fn, number=1, repeat=3))
+        print(f'{name:13}{seconds / n * 1e9:8.0f} ns/quadruple')
@@ -0,0 +1,57 @@
+import re
+import sys
+import timeit
+
+from benchmarks.programs import program
+from compiler.lexer import Token, lex
+
+# The lexer as it was before the master regex: comments are stripped into a copy of the input,
+# which is then handed to a re.Scanner that calls a lambda for every token
+legacy_scanner = re.Scanner([
+    (r'\s+', lambda _, tok: None),
+    (r'//.*\n', lambda _, tok: None),
+    (r'==|>=|<=|>|<|!=', lambda _, token: Token('RELOP', token)),
+    (r'\(|\)|\[|\]|\{|\}|,|;|=', lambda _, token: Token('PUNCTUATION', token)),
+    (r'\+|-|/|\*', lambda _, token: Token('MATHOP', token)),
+    (r'(?=\d*[.eE][+-]?\d+)\d+(\.\d+)?([eE][+-]?\d+)?', lambda _, token: Token('FLOAT', token)),
+    (r'\d+', lambda _, token: Token('INTEGER', token)),
+    (r'int|float|void|while|if|else|return', lambda _, token: Token('KEYWORD', token)),
+    (r'[a-zA-Z]+', lambda _, token: Token('ID', token)),
+    (r'.', lambda _, token: Token('INVALID', token)),
+])
+
+
+def legacy_strip_comments(string: str):
+    string += " "
+    s, depth = '', 0
+    it = iter(range(len(string) - 1))
+    for i in it:
+        if string[i] + string[i + 1] == '/*':
+            depth += 1
+            next(it)
+        elif string[i] + string[i + 1] == '*/' and depth > 0:
+            depth -= 1
+            next(it)
+        elif depth == 0:
+            s += string[i]
+    return s
+
+
+def legacy_lex(string: str):
+    return legacy_scanner.scan(legacy_strip_comments(string))[0]
+
+
+def bench(name: str, fn, source: str, repeat: int) -> float:
+    seconds = min(timeit.repeat(lambda: fn(source), number=1, repeat=repeat))
+    tokens = len(fn(source))
+    print(f'{name:10}{len(source) / 1e6:8.2f} MB{tokens:>10} tokens{seconds:9.3f} s{tokens / seconds:>12,.0f} tokens/s')
+    return seconds
+
+
+if __name__ == '__main__':
+    functions = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    source = program(functions)
+    assert lex(source) == legacy_lex(source)  # the generated program has no keyword-prefixed names
+    old = bench('legacy', legacy_lex, source, 3)
+    new = bench('lex', lex, source, 3)
+    print(f'speedup: {old / new:.2f}x')
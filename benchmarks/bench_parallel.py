@@ -0,0 +1,26 @@
+import os
+import sys
+import timeit
+
+from benchmarks.programs import program
+from compiler.lexer import TokenStream
+from compiler.parser import CMinusParser
+from compiler.semantics import analyze_parallel, analyze_with_diagnostics
+
+
+def bench(name: str, fn, repeat: int = 3) -> float:
+    seconds = min(timeit.repeat(fn, number=1, repeat=repeat))
+    print(f'{name:24}{seconds:9.3f} s')
+    return seconds
+
+
+if __name__ == '__main__':
+    functions = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    tree = CMinusParser(TokenStream.from_string(program(functions))).parse()
+    print(f'{functions:,} functions, {os.cpu_count()} cores')
+    single = bench('single pass', lambda: analyze_with_diagnostics(tree))
+    workers = 1
+    while workers <= (os.cpu_count() or 1):
+        seconds = bench(f'{workers} workers', lambda: analyze_parallel(tree, workers=workers))
+        print(f'{"":24}{single / seconds:9.2f}x')
+        workers *= 2
@@ -0,0 +1,34 @@
+import sys
+import timeit
+import tracemalloc
+
+from benchmarks.programs import program
+from compiler.lexer import TokenStream
+from compiler.parser import CMinusParser, LLParser, Recognizer
+
+
+def peak_memory(fn) -> int:
+    tracemalloc.start()
+    try:
+        fn()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def bench(name: str, fn, tokens: TokenStream, repeat: int) -> float:
+    seconds = min(timeit.repeat(fn, number=1, repeat=repeat))
+    memory = peak_memory(fn)
+    print(f'{name:12}{len(tokens):>10} tokens{seconds:9.3f} s{len(tokens) / seconds:>12,.0f} tokens/s'
+          f'{memory / 1e6:10.1f} MB peak')
+    return seconds
+
+
+if __name__ == '__main__':
+    functions = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    tokens = TokenStream.from_string(program(functions))
+    assert Recognizer(tokens).recognize()
+    parse = bench('parse', lambda: CMinusParser(tokens).parse(), tokens, 3)
+    bench('LLParser', lambda: LLParser(tokens).parse(), tokens, 3)
+    recognize = bench('recognize', lambda: Recognizer(tokens).recognize(), tokens, 3)
+    print(f'recognize speedup over parse: {parse / recognize:.2f}x')
@@ -0,0 +1,37 @@
+import random
+
+
+def name(i: int) -> str:
+    # Identifiers are letters only, so number them in base 26
+    letters = ''
+    while True:
+        i, r = divmod(i, 26)
+        letters = chr(ord('a') + r) + letters
+        if i == 0:
+            return letters
+
+
+def function(i: int, rng: random.Random) -> str:
+    a, b = rng.randint(1, 9), rng.randint(1, 99)
+    return f'''
+/* function {i} /* with a nested comment */ */
+int f{name(i)}(int x, int y[]) {{
+    int i; int t; float s;
+    i = 0; t = {a};
+    s = 1.5E-{a} * 2.0;
+    while (i < {b}) {{
+        y[i] = y[i] + x * {a} - t / (i + 1); // update the element
+        if (y[i] >= {b}) t = t + f{name(i - 1)}(y[i], y); else {{ t = t - 1; }}
+        i = i + 1;
+    }}
+    return t + y[{a}] * g{name(i % 4)};
+}}
+'''
+
+
+def program(functions: int, seed: int = 0) -> str:
+    # A semantically valid C- program with the given number of functions, each calling the last
+    rng = random.Random(seed)
+    header = 'int ga; int gb; int gc; int gd;\nint fa(int x, int y[]) { return x; }\n'
+    body = ''.join(function(i, rng) for i in range(1, functions + 1))
+    return header + body + 'void main(void) { int a[100]; ga = fb(1, a); }\n'
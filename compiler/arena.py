@@ -0,0 +1,206 @@
+import struct
+from array import array
+from typing import Callable, Dict, Iterable, List, Optional, Tuple, Union
+
+from .astnodes import *
+
+# Node kinds. Each node has a type byte, a value (an id into the string or number table, or -1) and
+# a run of children in the links array. A child that may be left out is -1 when it is, and lists of
+# nodes are LIST nodes of their own. The layout of each kind is:
+#
+#   PROGRAM               children: declarations...
+#   VAR_DECLARATION       type, value: name,   children: array size (NUMBER) or -1
+#   FUN_DECLARATION       type, value: name,   children: params (LIST), body (COMPOUND)
+#   PARAM                 type | ARRAY if it is an array, value: name
+#   COMPOUND              children: variables (LIST), statements (LIST)
+#   EXPRESSION_STATEMENT  children: expression or -1
+#   IF                    children: condition, true statement, false statement or -1
+#   WHILE                 children: condition, body
+#   RETURN                children: expression or -1
+#   ASSIGNMENT            children: variable, value
+#   BINARY_OP             value: operator, children: lhs, rhs
+#   CALL                  value: name, children: arguments...
+#   VARIABLE              value: name, children: index or -1
+#   NUMBER                value: number
+#   LIST                  children: items...
+(PROGRAM, VAR_DECLARATION, FUN_DECLARATION, PARAM, COMPOUND, EXPRESSION_STATEMENT, IF, WHILE, RETURN,
+ ASSIGNMENT, BINARY_OP, CALL, VARIABLE, NUMBER, LIST) = range(15)
+
+ARRAY = 0x80  # set in the type byte of array parameters
+TYPES = [None] + sorted(Type, key=lambda kind: kind.value)  # Type by value
+INTEGER, FLOAT, VOID = Type.INTEGER.value, Type.FLOAT.value, Type.VOID.value
+
+_MAGIC = b'CMA2'
+_HEADER = struct.Struct('<4s6Q')
+_ARRAYS = [('kinds', 'B'), ('types', 'B'), ('values', 'i'), ('firsts', 'I'), ('counts', 'I'), ('links', 'i'),
+           ('positions', 'i')]
+
+
+class Arena:
+    # A tree kept in parallel arrays, with nodes addressed by their index (handle). Nodes are added
+    # after their children, so the root is the last node. Strings and numbers are interned in tables.
+    # The position annotation of each node is kept too, or -1 if it has none
+
+    def __init__(self):
+        self.kinds = array('B')
+        self.types = array('B')
+        self.values = array('i')
+        self.firsts = array('I')  # index in links of the first child
+        self.counts = array('I')  # number of children
+        self.links = array('i')
+        self.positions = array('i')
+        self.strings: List[str] = []
+        self.string_ids: Dict[str, int] = {}
+        self.numbers: List[Union[int, float]] = []
+        self.number_ids: Dict[Tuple[type, Union[int, float]], int] = {}
+
+    def __len__(self) -> int:
+        return len(self.kinds)
+
+    @property
+    def root(self) -> int:
+        return len(self.kinds) - 1
+
+    def add(self, kind: int, children: Iterable[int] = (), value: int = -1, type_: int = 0) -> int:
+        self.kinds.append(kind)
+        self.types.append(type_)
+        self.values.append(value)
+        self.firsts.append(len(self.links))
+        self.links.extend(children)
+        self.counts.append(len(self.links) - self.firsts[-1])
+        self.positions.append(-1)
+        return len(self.kinds) - 1
+
+    def intern(self, string: str) -> int:
+        sid = self.string_ids.get(string)
+        if sid is None:
+            sid = self.string_ids[string] = len(self.strings)
+            self.strings.append(string)
+        return sid
+
+    def number(self, value: Union[int, float]) -> int:
+        key = (value.__class__, value)  # 1 and 1.0 are different constants
+        nid = self.number_ids.get(key)
+        if nid is None:
+            nid = self.number_ids[key] = len(self.numbers)
+            self.numbers.append(value)
+        return nid
+
+    def child(self, handle: int, i: int) -> int:
+        return self.links[self.firsts[handle] + i]
+
+    def children(self, handle: int) -> range:
+        # Indexes in links of the children of a node
+        first = self.firsts[handle]
+        return range(first, first + self.counts[handle])
+
+    def name(self, handle: int) -> str:
+        return self.strings[self.values[handle]]
+
+    # Conversion from the object tree
+
+    @staticmethod
+    def from_tree(program: Program) -> 'Arena':
+        arena = Arena()
+        arena.node(program)
+        return arena
+
+    def node(self, node: Optional[Node]) -> int:
+        if node is None:
+            return -1
+        handle = self._from[node.__class__](self, node)
+        position = node.annotation('position')
+        if position is not None:
+            self.positions[handle] = position
+        return handle
+
+    def node_list(self, nodes: List[Node]) -> int:
+        return self.add(LIST, [self.node(node) for node in nodes])
+
+    _from: Dict[type, Callable[['Arena', Node], int]] = {
+        Program: lambda self, n: self.add(PROGRAM, [self.node(d) for d in n.declarations]),
+        VarDeclaration: lambda self, n: self.add(VAR_DECLARATION, [self.node(n.array)], self.intern(n.name),
+                                                 n.type.value),
+        FunDeclaration: lambda self, n: self.add(FUN_DECLARATION, [self.node_list(n.params), self.node(n.body)],
+                                                 self.intern(n.name), n.type.value),
+        ParamFormal: lambda self, n: self.add(PARAM, (), self.intern(n.name),
+                                              n.type.value | (ARRAY if n.is_array else 0)),
+        CompoundStatement: lambda self, n: self.add(COMPOUND, [self.node_list(n.vars), self.node_list(n.body)]),
+        ExpressionStatement: lambda self, n: self.add(EXPRESSION_STATEMENT, [self.node(n.expression)]),
+        IfStatement: lambda self, n: self.add(IF, [self.node(n.cond), self.node(n.true), self.node(n.false)]),
+        WhileStatement: lambda self, n: self.add(WHILE, [self.node(n.cond), self.node(n.body)]),
+        ReturnStatement: lambda self, n: self.add(RETURN, [self.node(n.expression)]),
+        AssignmentExpression: lambda self, n: self.add(ASSIGNMENT, [self.node(n.var), self.node(n.value)]),
+        BinaryOp: lambda self, n: self.add(BINARY_OP, [self.node(n.lhs), self.node(n.rhs)], self.intern(n.op)),
+        Call: lambda self, n: self.add(CALL, [self.node(arg) for arg in n.args], self.intern(n.name)),
+        Variable: lambda self, n: self.add(VARIABLE, [self.node(n.index)], self.intern(n.name)),
+        Number: lambda self, n: self.add(NUMBER, (), self.number(n.value)),
+    }
+
+    # Conversion to the object tree
+
+    def to_tree(self, handle: Optional[int] = None) -> Optional[Node]:
+        if handle is None:
+            handle = self.root
+        if handle < 0:
+            return None
+        node = self._to[self.kinds[handle]](self, handle)
+        position = self.positions[handle]
+        if position >= 0:
+            node.position = position
+        return node
+
+    def _items(self, handle: int) -> list:
+        return [self.to_tree(self.links[i]) for i in self.children(handle)]
+
+    def _child(self, handle: int, i: int) -> Optional[Node]:
+        return self.to_tree(self.child(handle, i))
+
+    _to: List[Callable[['Arena', int], Node]] = [
+        lambda self, h: Program(self._items(h)),
+        lambda self, h: VarDeclaration(TYPES[self.types[h]], self.name(h), self._child(h, 0)),
+        lambda self, h: FunDeclaration(TYPES[self.types[h]], self.name(h), self._child(h, 0), self._child(h, 1)),
+        lambda self, h: ParamFormal(TYPES[self.types[h] & ~ARRAY], self.name(h), bool(self.types[h] & ARRAY)),
+        lambda self, h: CompoundStatement(self._child(h, 0), self._child(h, 1)),
+        lambda self, h: ExpressionStatement(self._child(h, 0)),
+        lambda self, h: IfStatement(self._child(h, 0), self._child(h, 1), self._child(h, 2)),
+        lambda self, h: WhileStatement(self._child(h, 0), self._child(h, 1)),
+        lambda self, h: ReturnStatement(self._child(h, 0)),
+        lambda self, h: AssignmentExpression(self._child(h, 0), self._child(h, 1)),
+        lambda self, h: BinaryOp(self.name(h), self._child(h, 0), self._child(h, 1)),
+        lambda self, h: Call(self.name(h), self._items(h)),
+        lambda self, h: Variable(self.name(h), self._child(h, 0)),
+        lambda self, h: Number(self.numbers[self.values[h]]),
+        _items,
+    ]
+
+    # Serialization. The arrays are written out as they are, followed by the string table and the
+    # numbers (as text, so floats round-trip exactly). Arrays are in the machine's byte order
+
+    def to_bytes(self) -> bytes:
+        strings = '\0'.join(self.strings).encode()
+        numbers = '\0'.join(map(repr, self.numbers)).encode()
+        header = _HEADER.pack(_MAGIC, len(self.kinds), len(self.links), len(self.strings), len(strings),
+                              len(self.numbers), len(numbers))
+        return b''.join([header] + [getattr(self, name).tobytes() for name, _ in _ARRAYS] + [strings, numbers])
+
+    @staticmethod
+    def from_bytes(data: bytes) -> 'Arena':
+        magic, nodes, links, n_strings, strings_size, n_numbers, numbers_size = _HEADER.unpack_from(data)
+        if magic != _MAGIC:
+            raise ValueError('Not a serialized arena')
+        arena, offset = Arena(), _HEADER.size
+        for name, code in _ARRAYS:
+            values = getattr(arena, name)
+            size = (links if name == 'links' else nodes) * values.itemsize
+            values.frombytes(data[offset:offset + size])
+            offset += size
+        if offset + strings_size + numbers_size != len(data):
+            raise ValueError('Serialized arena has the wrong length')
+        strings = data[offset:offset + strings_size].decode()
+        numbers = data[offset + strings_size:offset + strings_size + numbers_size].decode()
+        arena.strings = strings.split('\0') if n_strings else []
+        arena.string_ids = {string: i for i, string in enumerate(arena.strings)}
+        for number in numbers.split('\0') if n_numbers else []:
+            arena.number(float(number) if '.' in number or 'e' in number or 'n' in number else int(number))
+        return arena
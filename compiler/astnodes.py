@@ -1,5 +1,5 @@
 from enum import Enum
-from typing import List, Union, Optional
+from typing import List, Optional, Tuple, Union
 
 
 class Type(Enum):
@@ -23,25 +23,81 @@ class Type(Enum):
         }[self.name]
 
 
+class Node:
+    # Base of the tree nodes. Fields are declared in __slots__ rather than kept in a per-instance
+    # __dict__, which makes nodes several times smaller. Nodes of the same class are equal when their
+    # fields are equal.
+    #
+    # Annotations are slots for what the passes find out about a node: the parser sets the index of
+    # the token each node starts at as its position, and the semantic analyzer sets the types of
+    # expressions and the declarations that names refer to. They aren't fields: they are left out of
+    # comparisons and aren't kept by other representations of the tree, so may not be set: read them
+    # with annotation, which gives None for one that isn't
+    __slots__ = ('position',)
+    fields: Tuple[str, ...] = ()
+    annotations: Tuple[str, ...] = ('position',)
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls.fields = tuple(field for klass in reversed(cls.__mro__) for field in vars(klass).get('__slots__', ())
+                           if field not in cls.annotations)
+
+    def __eq__(self, other):
+        if self.__class__ is not other.__class__:
+            return NotImplemented
+        # Compared with a stack rather than recursion, so deeply nested trees can be compared too
+        pairs = [(self, other)]
+        while pairs:
+            a, b = pairs.pop()
+            if a.__class__ is not b.__class__:
+                return False
+            if isinstance(a, Node):
+                pairs.extend((getattr(a, field), getattr(b, field)) for field in a.fields)
+            elif isinstance(a, list):
+                if len(a) != len(b):
+                    return False
+                pairs.extend(zip(a, b))
+            elif a != b:
+                return False
+        return True
+
+    __hash__ = None  # nodes are mutable and compared by value
+
+    def annotation(self, name: str):
+        return getattr(self, name, None)
+
+    def __repr__(self):
+        return f'{type(self).__name__}({", ".join(f"{field}={getattr(self, field)!r}" for field in self.fields)})'
+
+
 # Expression
 
-class Expression:
-    pass
+class Expression(Node):
+    __slots__ = ('resolved_type',)  # the (Type, is_array) of the expression, or ERROR
+    annotations = Node.annotations + __slots__
 
 
 class Variable(Expression):
+    __slots__ = ('name', 'index', 'binding')  # binding: its VarDeclaration or ParamFormal
+    annotations = Expression.annotations + ('binding',)
+
     def __init__(self, name: str, index: Optional[Expression]):
         self.name = name
         self.index = index
 
 
 class Call(Expression):
+    __slots__ = ('name', 'args', 'binding')  # binding: its FunDeclaration
+    annotations = Expression.annotations + ('binding',)
+
     def __init__(self, name: str, args: List[Expression]):
         self.name = name
         self.args = args
 
 
 class BinaryOp(Expression):
+    __slots__ = ('op', 'lhs', 'rhs')
+
     def __init__(self, op: str, lhs: Expression, rhs: Expression):
         self.op = op
         self.lhs = lhs
@@ -49,52 +105,68 @@ class BinaryOp(Expression):
 
 
 class AssignmentExpression(Expression):
+    __slots__ = ('var', 'value')
+
     def __init__(self, var: Variable, value: Expression):
         self.var = var
         self.value = value
 
 
 class Number(Expression):
+    __slots__ = ('value',)
+
     def __init__(self, value: Union[int, float]):
         self.value = value
 
 
 # Statement
 
-class Statement:
-    pass
+class Statement(Node):
+    __slots__ = ()
 
 
 class ExpressionStatement(Statement):
+    __slots__ = ('expression',)
+
     def __init__(self, expression: Optional[Expression]):
         self.expression = expression
 
 
 class ReturnStatement(Statement):
+    __slots__ = ('expression',)
+
     def __init__(self, expression: Optional[Expression]):
         self.expression = expression
 
 
 class WhileStatement(Statement):
+    __slots__ = ('cond', 'body')
+
     def __init__(self, cond: Expression, body: Statement):
         self.cond = cond
         self.body = body
 
 
 class IfStatement(Statement):
+    __slots__ = ('cond', 'true', 'false')
+
     def __init__(self, cond: Expression, true: Statement, false: Optional[Statement]):
         self.cond = cond
         self.true = true
         self.false = false
 
 
-class Declaration:
+class Declaration(Node):
+    __slots__ = ('type', 'name')
+
     def __init__(self, kind: Type, name: str):
         self.type = kind
         self.name = name
 
 
 class VarDeclaration(Declaration):
+    __slots__ = ('array',)
+
     def __init__(self, kind: Type, name: str, array: Optional[Number]):
         super().__init__(kind, name)
         self.array = array
@@ -104,12 +176,16 @@ class VarDeclaration(Declaration):
 
 
 class CompoundStatement(Statement):
+    __slots__ = ('vars', 'body')
+
     def __init__(self, variables: List[VarDeclaration], body: List[Statement]):
         self.vars = variables
         self.body = body
 
 
-class ParamFormal:
+class ParamFormal(Node):
+    __slots__ = ('type', 'name', 'is_array')
+
     def __init__(self, kind: Type, name: str, is_array: bool):
         self.type = kind
         self.name = name
@@ -117,6 +193,8 @@ class ParamFormal:
 
 
 class FunDeclaration(Declaration):
+    __slots__ = ('params', 'body')
+
     def __init__(self, kind: Type, name: str, params: List[ParamFormal],
                  body: CompoundStatement):
         super().__init__(kind, name)
@@ -124,6 +202,8 @@ class FunDeclaration(Declaration):
         self.body = body
 
 
-class Program:
+class Program(Node):
+    __slots__ = ('declarations',)
+
     def __init__(self, declarations: List[Declaration]):
         self.declarations = declarations
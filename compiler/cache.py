@@ -0,0 +1,123 @@
+import hashlib
+import os
+import struct
+import tempfile
+from typing import Callable, Dict, Optional, Tuple, Union
+
+from .arena import Arena
+from .dependencies import FunctionGraph
+from .ir import IR
+from .lexer import TokenStream
+
+# How each stage's result is written to and read back from an entry
+STAGES: Dict[str, Tuple[Callable[[object], bytes], Callable[[bytes], object]]] = {
+    'tokens': (TokenStream.to_bytes, TokenStream.from_bytes),
+    'ast': (Arena.to_bytes, Arena.from_bytes),
+    'ir': (IR.to_bytes, IR.from_bytes),
+    'checks': (FunctionGraph.to_bytes, FunctionGraph.from_bytes),  # kept by path, see main.py
+}
+
+_version = None
+
+
+def version() -> str:
+    # The compiler's version is a digest of its own source, so entries made by any other build of the
+    # compiler are never read
+    global _version
+    if _version is None:
+        digest = hashlib.sha256()
+        package = os.path.dirname(os.path.abspath(__file__))
+        for name in sorted(os.listdir(package)):
+            if name.endswith('.py'):
+                with open(os.path.join(package, name), 'rb') as f:
+                    digest.update(name.encode() + b'\0' + f.read())
+        _version = digest.hexdigest()
+    return _version
+
+
+def default_directory() -> str:
+    cache = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(cache, 'c-minus')
+
+
+class Cache:
+    # Content-addressed store of the results of each compiler stage. An entry is a file named by the
+    # hash of the source text and the compiler version, and the stage. Reading an entry refreshes its
+    # modification time, and once the entries take more than max_size bytes, the least recently used
+    # ones are removed
+
+    def __init__(self, directory: Optional[str] = None, max_size: int = 64 << 20):
+        self.directory = directory or default_directory()
+        self.max_size = max_size
+        os.makedirs(self.directory, exist_ok=True)
+
+    @staticmethod
+    def key(source: Union[str, bytes]) -> str:
+        if isinstance(source, str):
+            source = source.encode()
+        return hashlib.sha256(version().encode() + b'\0' + source).hexdigest()
+
+    @staticmethod
+    def file_key(path: str, chunk_size: int = 1 << 16) -> str:
+        # The key of the file's contents, which are read a chunk at a time
+        digest = hashlib.sha256(version().encode() + b'\0')
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(chunk_size), b''):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def path(self, key: str, stage: str) -> str:
+        return os.path.join(self.directory, f'{key}.{stage}')
+
+    def load(self, key: str, stage: str):
+        # The stage's result, or None if it isn't cached
+        path = self.path(key, stage)
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+            os.utime(path)
+        except OSError:
+            return None
+        try:
+            return STAGES[stage][1](data)
+        except (ValueError, IndexError, struct.error):
+            # A damaged entry is dropped and computed again
+            self.remove(path)
+            return None
+
+    def store(self, key: str, stage: str, value):
+        data = STAGES[stage][0](value)
+        # Written to a temporary file first, so a reader never sees a partial entry
+        fd, temp = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(temp, self.path(key, stage))
+        except OSError:
+            self.remove(temp)
+            return
+        self.evict()
+
+    def evict(self):
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith('.tmp'):
+                continue
+            try:
+                stat = entry.stat()
+            except OSError:
+                continue  # removed by another process
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+        size = sum(entry[1] for entry in entries)
+        for _, entry_size, path in sorted(entries):
+            if size <= self.max_size:
+                break
+            self.remove(path)
+            size -= entry_size
+
+    @staticmethod
+    def remove(path: str):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
@@ -1,161 +1,331 @@
-from typing import Tuple
+from typing import Iterator
 
+from .arena import *
 from .astnodes import *
+from .ir import EMPTY, INTEGER, IR, POOLED, Operand, Quadruple, integer, temp
+from .visitor import Visitor, visits
 
-Quadruple = Tuple[str, Optional[str], Optional[str], Union[Optional[str], int]]
+MATHOPS = {'+': 'add', '-': 'sub', '*': 'mult', '/': 'div'}
+
+# Branches taken when a comparison is false
+JUMPS = {
+    '>': 'brle',
+    '<': 'brge',
+    '>=': 'brl',
+    '<=': 'brg',
+    '==': 'brne',
+    '!=': 'bre',
+}
+
+ZERO, FOUR = integer(0), integer(4)
 
 
 def to_ir(program: Optional[Program]) -> List[Quadruple]:
-    return [] if program is None else CodeGenerator().program(program)
+    return [] if program is None else list(CodeGenerator().program(program))
+
+
+def stream_ir(program: Optional[Program]) -> Iterator[IR]:
+    # The quadruples of each declaration in turn, with absolute branch targets, generated as needed.
+    # The IRs share a pool, so they can be joined with IR.join
+    return iter([]) if program is None else CodeGenerator().stream(program)
 
 
-class CodeGenerator:
+def arena_to_ir(arena: Optional[Arena]) -> List[Quadruple]:
+    return [] if arena is None else list(ArenaCodeGenerator(arena).program(arena.root))
+
+
+class CodeGenerator(Visitor):
+    # Quadruples are appended to one IR as the tree is walked, and branches are patched with their
+    # absolute target once it is known, so each quadruple is written once however deeply it is nested
 
     def __init__(self):
-        self.ir: List[Quadruple] = []
+        self.ir = IR()
+        self.line = 0  # the number of quadruples generated before those in ir
         self.temp = -1  # temporary variable counter
         self.last_equality_op = None
 
-    def next_temp(self) -> str:
+    def next_temp(self) -> Operand:
         self.temp += 1
-        return f'_t{self.temp}'
+        return temp(self.temp)
 
     def next_jump(self):
         jump = self.last_equality_op
         self.last_equality_op = None
-        return {
-            '>': 'brle',
-            '<': 'brge',
-            '>=': 'brl',
-            '<=': 'brg',
-            '==': 'brne',
-            '!=': 'bre',
-        }.get(jump)
-
-    def program(self, program: Program) -> List[Quadruple]:
-        return [(q[0], q[1], q[2], str(q[3] + i + 1)) if q[0].startswith('br') else q for i, q in
-                enumerate([q for d in program.declarations for q in self.declaration(d)])]
-
-    def declaration(self, dec: Declaration) -> List[Quadruple]:
-        if isinstance(dec, VarDeclaration):
-            return [self.var_declaration(dec)]
-        elif isinstance(dec, FunDeclaration):
-            return self.fun_declaration(dec)
-        else:
-            raise Exception('Unknown declaration type')
+        return JUMPS.get(jump)
+
+    def next_line(self) -> int:
+        # Quadruples are numbered from 1 in the output
+        return self.line + len(self.ir) + 1
+
+    def patch(self, branch: int, target: int):
+        self.ir.patch(branch, target)
+
+    def constant(self, value: Union[int, float]) -> Operand:
+        return self.ir.integer(value) if isinstance(value, int) else self.ir.name(str(value))
+
+    def element(self, name: str, ref: Operand) -> Operand:
+        # Emits the address of an element of an array. A constant index is multiplied here
+        kind, oid = ref & 3, ref >> 2
+        if kind == POOLED and self.ir.pool[oid].isdigit():  # too large for an id
+            kind, oid = INTEGER, int(self.ir.pool[oid])
+        dest = self.next_temp()
+        if kind == INTEGER:
+            self.ir.add('disp', self.ir.name(name), self.ir.integer(oid * 4), dest)
+            return dest
+        dest2 = self.next_temp()
+        self.ir.add('mult', ref, FOUR, dest)
+        self.ir.add('disp', self.ir.name(name), dest, dest2)
+        return dest2
+
+    def program(self, program: Program) -> IR:
+        for declaration in self.declarations(program):
+            self.declaration(declaration)
+        return self.ir
+
+    def stream(self, program: Program) -> Iterator[IR]:
+        # Only the quadruples of the declaration being generated are kept
+        for declaration in self.declarations(program):
+            self.line += len(self.ir)
+            self.ir = self.ir.following()
+            self.declaration(declaration)
+            yield self.ir
 
     @staticmethod
-    def var_declaration(dec: VarDeclaration) -> Quadruple:
-        return 'alloc', str(4 * (dec.array or Number(1)).value), None, dec.name
-
-    def fun_declaration(self, dec: FunDeclaration) -> List[Quadruple]:
-        func = ('func', dec.name, dec.type.to_string(), str(len(dec.params)))
-        params = [('param', None, None, p.name) for p in dec.params]
-        allocs = [('alloc', '4', None, p.name) for p in dec.params]
-        quads = self.compound_statement(dec.body)
-        end = ('end', 'func', dec.name, None)
-        return [func] + params + allocs + quads + [end]
-
-    def compound_statement(self, stmt: CompoundStatement) -> List[Quadruple]:
-        allocs = [self.var_declaration(dec) for dec in stmt.vars]
-        quads = [quad for stmt in stmt.body for quad in self.statement(stmt)]
-        return allocs + quads
-
-    def statement(self, stmt: Statement) -> List[Quadruple]:
-        if isinstance(stmt, ExpressionStatement):
-            return self.expression(stmt.expression)[0] if stmt.expression is not None else []
-        elif isinstance(stmt, CompoundStatement):
-            block = ('block', None, None, None)
-            end = ('end', 'block', None, None)
-            return [block] + self.compound_statement(stmt) + [end]
-        elif isinstance(stmt, IfStatement):
-            return self.if_statement(stmt)
-        elif isinstance(stmt, WhileStatement):
-            return self.while_statement(stmt)
-        elif isinstance(stmt, ReturnStatement):
-            return self.return_statement(stmt)
-
-    def _patch_comparison(self, expression: (List[Quadruple], str)) -> (List[Quadruple], str):
+    def declarations(program: Program) -> List[Declaration]:
+        return program.declarations
+
+    def declaration(self, dec: Declaration):
+        self.visit(dec)
+
+    @visits(VarDeclaration)
+    def global_declaration(self, dec: VarDeclaration):
+        self.var_declaration(dec)
+
+    def var_declaration(self, dec: VarDeclaration):
+        self.ir.add('alloc', self.ir.integer(4 * (dec.array or Number(1)).value), EMPTY, self.ir.name(dec.name))
+
+    @visits(FunDeclaration)
+    def fun_declaration(self, dec: FunDeclaration):
+        name = self.ir.name(dec.name)
+        self.ir.add('func', name, self.ir.name(dec.type.to_string()), self.ir.integer(len(dec.params)))
+        for p in dec.params:
+            self.ir.add('param', EMPTY, EMPTY, self.ir.name(p.name))
+        for p in dec.params:
+            self.ir.add('alloc', FOUR, EMPTY, self.ir.name(p.name))
+        self.compound_statement(dec.body)
+        self.ir.add('end', self.ir.name('func'), name, EMPTY)
+
+    def compound_statement(self, stmt: CompoundStatement):
+        for dec in stmt.vars:
+            self.var_declaration(dec)
+        for statement in stmt.body:
+            self.visit(statement)
+
+    def statement(self, stmt: Statement):
+        self.visit(stmt)
+
+    @visits(ExpressionStatement)
+    def expression_statement(self, stmt: ExpressionStatement):
+        if stmt.expression is not None:
+            self.visit(stmt.expression)
+
+    @visits(CompoundStatement)
+    def block(self, stmt: CompoundStatement):
+        self.ir.add('block', EMPTY, EMPTY, EMPTY)
+        self.compound_statement(stmt)
+        self.ir.add('end', self.ir.name('block'), EMPTY, EMPTY)
+
+    def condition(self, cond) -> Operand:
         # If the condition in an if/while does not use an equality op, compare the expression to 0
-        cond, ref = expression
+        ref = self.expression(cond)
         if self.last_equality_op is None:
             ref2 = self.next_temp()
             self.last_equality_op = ">"
-            return cond + [('comp', ref, '0', ref2)], ref2
-        return expression
-
-    def if_statement(self, stmt: IfStatement) -> List[Quadruple]:
-        cond, ref = self._patch_comparison(self.expression(stmt.cond))
-        jump = self.next_jump()
-        true = self.statement(stmt.true)
-        false = self.statement(stmt.false) if stmt.false is not None else []
-        jump_else = (jump, ref, None, len(true) + 2)
-        jump_end = ('br', None, None, len(false) + 1)
-        return cond + [jump_else] + true + [jump_end] + false
-
-    def while_statement(self, stmt: WhileStatement) -> List[Quadruple]:
-        cond, ref = self._patch_comparison(self.expression(stmt.cond))
-        jump = self.next_jump()
-        quads = self.statement(stmt.body)
-        jump_end = (jump, ref, None, len(quads) + 2)
-        jump_loop = ('br', None, None, -(len(quads) + len(cond) + 1))
-        return cond + [jump_end] + quads + [jump_loop]
-
-    def return_statement(self, stmt: ReturnStatement) -> List[Quadruple]:
-        if stmt.expression is not None:
-            rhs, ref = self.expression(stmt.expression)
-            return_fun = ('return', None, None, ref)
-            return rhs + [return_fun]
-        else:
-            return_fun = ('return', None, None, None)
-            return [return_fun]
-
-    def expression(self, expr: Expression) -> (List[Quadruple], str):
-        if isinstance(expr, BinaryOp):
-            return self.binary_op(expr)
-        elif isinstance(expr, AssignmentExpression):
-            return self.assignment_expression(expr)
-        elif isinstance(expr, Call):
-            return self.call_expression(expr)
-        elif isinstance(expr, Variable):
-            return self.variable(expr)
-        elif isinstance(expr, Number):
-            return [], str(expr.value)
+            self.ir.add('comp', ref, ZERO, ref2)
+            return ref2
+        return ref
+
+    @visits(IfStatement)
+    def if_statement(self, stmt: IfStatement):
+        ref = self.condition(stmt.cond)
+        jump_else = self.ir.add(self.next_jump(), ref, EMPTY, EMPTY)
+        self.visit(stmt.true)
+        jump_end = self.ir.add('br', EMPTY, EMPTY, EMPTY)
+        self.patch(jump_else, self.next_line())
+        if stmt.false is not None:
+            self.visit(stmt.false)
+        self.patch(jump_end, self.next_line())
+
+    @visits(WhileStatement)
+    def while_statement(self, stmt: WhileStatement):
+        start = self.next_line()
+        ref = self.condition(stmt.cond)
+        jump_end = self.ir.add(self.next_jump(), ref, EMPTY, EMPTY)
+        self.visit(stmt.body)
+        self.ir.add('br', EMPTY, EMPTY, self.ir.integer(start))
+        self.patch(jump_end, self.next_line())
+
+    @visits(ReturnStatement)
+    def return_statement(self, stmt: ReturnStatement):
+        self.ir.add('return', EMPTY, EMPTY, self.visit(stmt.expression) if stmt.expression is not None else EMPTY)
+
+    def expression(self, expr: Expression) -> Operand:
+        # Emits the quadruples of an expression and returns where its value is
+        return self.visit(expr)
+
+    @visits(Number)
+    def number(self, expr: Number) -> Operand:
+        return self.constant(expr.value)
 
-    def binary_op(self, expr: BinaryOp) -> (List[Quadruple], str):
-        mathops = {'+': 'add', '-': 'sub', '*': 'mult', '/': 'div'}
-        lhs, lref = self.expression(expr.lhs)
-        rhs, rref = self.expression(expr.rhs)
+    @visits(BinaryOp)
+    def binary_op(self, expr: BinaryOp) -> Operand:
+        lref = self.visit(expr.lhs)
+        rref = self.visit(expr.rhs)
         ref = self.next_temp()
-        is_mathop = expr.op in mathops
-        op = (mathops[expr.op] if is_mathop else 'comp', lref, rref, ref)
-        if not is_mathop:
+        if expr.op not in MATHOPS:
             self.last_equality_op = expr.op
-        return lhs + rhs + [op], ref
+        self.ir.add(MATHOPS.get(expr.op, 'comp'), lref, rref, ref)
+        return ref
 
-    def assignment_expression(self, expr: AssignmentExpression) -> (List[Quadruple], str):
-        rhs, rref = self.expression(expr.value)
-        lhs, lref = self.variable(expr.var)
-        assign = ('assign', rref, None, lref)
-        return rhs + lhs + [assign], lref
+    @visits(AssignmentExpression)
+    def assignment_expression(self, expr: AssignmentExpression) -> Operand:
+        rref = self.visit(expr.value)
+        lref = self.variable(expr.var)
+        self.ir.add('assign', rref, EMPTY, lref)
+        return lref
 
-    def variable(self, expr: Variable) -> (List[Quadruple], str):
+    @visits(Variable)
+    def variable(self, expr: Variable) -> Operand:
         if expr.index is not None:
-            index, ref = self.expression(expr.index)
-            dest = self.next_temp()
-            if ref.isdigit():
-                disp = ('disp', expr.name, str(int(ref) * 4), dest)
-                return index + [disp], dest
-            else:
-                dest2 = self.next_temp()
-                mult = ('mult', ref, '4', dest)
-                disp = ('disp', expr.name, dest, dest2)
-                return index + [mult, disp], dest2
-        return [], expr.name
-
-    def call_expression(self, expr: Call) -> (List[Quadruple], str):
-        quads = [self.expression(arg) for arg in expr.args]
-        args = [('arg', None, None, var) for _, var in quads]
+            return self.element(expr.name, self.visit(expr.index))
+        return self.ir.name(expr.name)
+
+    @visits(Call)
+    def call_expression(self, expr: Call) -> Operand:
+        refs = [self.visit(arg) for arg in expr.args]
+        for ref in refs:
+            self.ir.add('arg', EMPTY, EMPTY, ref)
         ref = self.next_temp()
-        call = ('call', expr.name, str(len(args)), ref)
-        return [q for quad, _ in quads for q in quad] + args + [call], ref
+        self.ir.add('call', self.ir.name(expr.name), self.ir.integer(len(refs)), ref)
+        return ref
+
+
+class ArenaCodeGenerator(CodeGenerator):
+    # Generates the same quadruples from a tree kept in an arena
+
+    def __init__(self, arena: Arena):
+        super().__init__()
+        self.arena = arena
+
+    def declarations(self, program: int) -> List[int]:
+        return [self.arena.links[i] for i in self.arena.children(program)]
+
+    def declaration(self, dec: int):
+        kind = self.arena.kinds[dec]
+        if kind == VAR_DECLARATION:
+            self.var_declaration(dec)
+        elif kind == FUN_DECLARATION:
+            self.fun_declaration(dec)
+        else:
+            raise Exception('Unknown declaration type')
+
+    def var_declaration(self, dec: int):
+        arena = self.arena
+        array = arena.child(dec, 0)
+        size = 4 * (arena.numbers[arena.values[array]] if array >= 0 else 1)
+        self.ir.add('alloc', self.ir.integer(size), EMPTY, self.ir.name(arena.name(dec)))
+
+    def fun_declaration(self, dec: int):
+        arena = self.arena
+        name, params = self.ir.name(arena.name(dec)), arena.child(dec, 0)
+        self.ir.add('func', name, self.ir.name(TYPES[arena.types[dec]].to_string()),
+                  self.ir.integer(arena.counts[params]))
+        for i in arena.children(params):
+            self.ir.add('param', EMPTY, EMPTY, self.ir.name(arena.name(arena.links[i])))
+        for i in arena.children(params):
+            self.ir.add('alloc', FOUR, EMPTY, self.ir.name(arena.name(arena.links[i])))
+        self.compound_statement(arena.child(dec, 1))
+        self.ir.add('end', self.ir.name('func'), name, EMPTY)
+
+    def compound_statement(self, stmt: int):
+        arena = self.arena
+        for i in arena.children(arena.child(stmt, 0)):
+            self.var_declaration(arena.links[i])
+        for i in arena.children(arena.child(stmt, 1)):
+            self.statement(arena.links[i])
+
+    def statement(self, stmt: int):
+        arena = self.arena
+        kind = arena.kinds[stmt]
+        if kind == EXPRESSION_STATEMENT:
+            if arena.child(stmt, 0) >= 0:
+                self.expression(arena.child(stmt, 0))
+        elif kind == COMPOUND:
+            self.ir.add('block', EMPTY, EMPTY, EMPTY)
+            self.compound_statement(stmt)
+            self.ir.add('end', self.ir.name('block'), EMPTY, EMPTY)
+        elif kind == IF:
+            self.if_statement(stmt)
+        elif kind == WHILE:
+            self.while_statement(stmt)
+        elif kind == RETURN:
+            self.return_statement(stmt)
+
+    def if_statement(self, stmt: int):
+        arena = self.arena
+        ref = self.condition(arena.child(stmt, 0))
+        jump_else = self.ir.add(self.next_jump(), ref, EMPTY, EMPTY)
+        self.statement(arena.child(stmt, 1))
+        jump_end = self.ir.add('br', EMPTY, EMPTY, EMPTY)
+        self.patch(jump_else, self.next_line())
+        if arena.child(stmt, 2) >= 0:
+            self.statement(arena.child(stmt, 2))
+        self.patch(jump_end, self.next_line())
+
+    def while_statement(self, stmt: int):
+        arena = self.arena
+        start = self.next_line()
+        ref = self.condition(arena.child(stmt, 0))
+        jump_end = self.ir.add(self.next_jump(), ref, EMPTY, EMPTY)
+        self.statement(arena.child(stmt, 1))
+        self.ir.add('br', EMPTY, EMPTY, self.ir.integer(start))
+        self.patch(jump_end, self.next_line())
+
+    def return_statement(self, stmt: int):
+        expression = self.arena.child(stmt, 0)
+        self.ir.add('return', EMPTY, EMPTY, self.expression(expression) if expression >= 0 else EMPTY)
+
+    def expression(self, expr: int) -> Operand:
+        arena = self.arena
+        kind, first = arena.kinds[expr], arena.firsts[expr]
+        if kind == BINARY_OP:
+            lref = self.expression(arena.links[first])
+            rref = self.expression(arena.links[first + 1])
+            ref, op = self.next_temp(), arena.name(expr)
+            if op not in MATHOPS:
+                self.last_equality_op = op
+            self.ir.add(MATHOPS.get(op, 'comp'), lref, rref, ref)
+            return ref
+        elif kind == ASSIGNMENT:
+            rref = self.expression(arena.links[first + 1])
+            lref = self.variable(arena.links[first])
+            self.ir.add('assign', rref, EMPTY, lref)
+            return lref
+        elif kind == CALL:
+            refs = [self.expression(arena.links[i]) for i in arena.children(expr)]
+            for ref in refs:
+                self.ir.add('arg', EMPTY, EMPTY, ref)
+            ref = self.next_temp()
+            self.ir.add('call', self.ir.name(arena.name(expr)), self.ir.integer(len(refs)), ref)
+            return ref
+        elif kind == VARIABLE:
+            return self.variable(expr)
+        elif kind == NUMBER:
+            return self.constant(arena.numbers[arena.values[expr]])
+
+    def variable(self, expr: int) -> Operand:
+        arena = self.arena
+        name, index = arena.name(expr), arena.links[arena.firsts[expr]]
+        if index >= 0:
+            return self.element(name, self.expression(index))
+        return self.ir.name(name)
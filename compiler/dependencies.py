@@ -0,0 +1,118 @@
+import hashlib
+import json
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from .astnodes import *
+from .diagnostics import Diagnostic
+from .lexer import Token
+from .semantics import FunctionAnalyzer, place
+
+_MAGIC = b'CMG1'
+
+
+def signature(declaration: Optional[Node]) -> str:
+    # What checking a use of a global variable or a call depends on: the types of the declaration
+    if declaration is None:
+        return ''
+    if isinstance(declaration, FunDeclaration):
+        params = ','.join(f'{p.type.value}{"[]" if p.is_array else ""}' for p in declaration.params)
+        return f'{declaration.type.value}({params})'
+    return f'{declaration.type.value}{"[]" if declaration.array is not None else ""}'
+
+
+def fingerprint(tokens: Iterable[Token]) -> str:
+    return hashlib.sha256('\0'.join(token.val for token in tokens).encode()).hexdigest()
+
+
+def analyze_incremental(program: Program, tokens: Sequence[Token],
+                        graph: Optional['FunctionGraph'] = None) -> Tuple[List[Diagnostic], 'FunctionGraph']:
+    # The same errors as analyze_with_diagnostics, and the dependency graph of the program. Given the
+    # graph of an earlier version of the program, a function whose tokens are the same, and whose
+    # global variables and called functions have the same signatures, isn't checked again: the errors
+    # found in it then are reused. Functions that aren't checked aren't annotated, so their annotations
+    # read as None through Node.annotation
+    analyzer = RecordingAnalyzer(program)
+    declarations = program.declarations
+    previous = graph.functions if graph is not None else {}
+    graph, diagnostics = FunctionGraph(), []
+    for i, declaration in enumerate(declarations):
+        diagnostics.extend(analyzer.signatures[i])
+        if not isinstance(declaration, FunDeclaration):
+            continue
+        start = declaration.annotation('position')
+        end = declarations[i + 1].annotation('position') if i + 1 < len(declarations) else len(tokens)
+        if start is None or end is None:
+            diagnostics.extend(analyzer.check_function(i))  # no tokens to tell it by
+            graph.checked.append(i)
+            continue
+        key = fingerprint(tokens[start:end])
+        entry = previous.get(key)
+        if entry is not None and all(analyzer.resolve(i, use) == sig for use, sig in entry[0].items()):
+            uses, errors = entry
+        else:
+            errors = [Diagnostic(None if at is None else at - start, message)
+                      for at, message in analyzer.check_function(i)]
+            uses = analyzer.uses
+            graph.checked.append(i)
+        graph.functions[key] = (uses, errors)
+        diagnostics.extend(Diagnostic(None if at is None else at + start, message) for at, message in errors)
+    analyzer.diagnostics = diagnostics
+    analyzer.check_main(program)
+    return place(analyzer.diagnostics, tokens), graph
+
+
+class RecordingAnalyzer(FunctionAnalyzer):
+    # Records the signature of each global variable and function that the body being checked uses.
+    # Uses are named 'v' or 'f' followed by the name, as variables and functions are apart
+
+    def __init__(self, program: Program):
+        self.uses: Dict[str, str] = {}
+        super().__init__(program)
+
+    def check_function(self, index: int) -> List[Diagnostic]:
+        self.uses = {}
+        return super().check_function(index)
+
+    def lookup_var(self, name: str):
+        binding = self.symbols.lookup(name)
+        if binding is None:
+            binding = super().lookup_var(name)
+            self.uses['v' + name] = signature(binding)
+        return binding
+
+    def lookup_fun(self, name: str):
+        function = super().lookup_fun(name)
+        self.uses['f' + name] = signature(function)
+        return function
+
+    def resolve(self, index: int, use: str) -> str:
+        # The signature of what a use in the body of the declaration at index refers to now
+        self.index = index
+        if use[0] == 'v':
+            return signature(FunctionAnalyzer.lookup_var(self, use[1:]))
+        return signature(FunctionAnalyzer.lookup_fun(self, use[1:]))
+
+
+class FunctionGraph:
+    # The functions of an analyzed program by fingerprint, each with the signatures of the globals it
+    # uses and the errors found in its body, at token indexes from its start. checked lists the
+    # indexes of the functions that were checked when it was made
+
+    def __init__(self):
+        self.functions: Dict[str, Tuple[Dict[str, str], List[Diagnostic]]] = {}
+        self.checked: List[int] = []
+
+    def to_bytes(self) -> bytes:
+        return _MAGIC + json.dumps(self.functions, separators=(',', ':')).encode()
+
+    @staticmethod
+    def from_bytes(data: bytes) -> 'FunctionGraph':
+        if data[:len(_MAGIC)] != _MAGIC:
+            raise ValueError('Not a serialized function graph')
+        graph = FunctionGraph()
+        try:
+            for key, (uses, errors) in json.loads(data[len(_MAGIC):].decode()).items():
+                graph.functions[key] = (dict(uses), [Diagnostic(at, message) for at, message in errors])
+        except (TypeError, AttributeError) as e:
+            raise ValueError('Damaged function graph') from e
+        return graph
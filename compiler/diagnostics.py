@@ -0,0 +1,15 @@
+from collections import namedtuple
+
+from .lexer import Position
+
+
+class Diagnostic(namedtuple('Diagnostic', ['position', 'message'])):
+    # An error found while compiling. The position is a source position when the tokens carried
+    # one, else the index of the offending token, or None if it isn't known
+
+    def __str__(self):
+        if self.position is None:
+            return self.message
+        if isinstance(self.position, Position):
+            return f'{self.position.line}:{self.position.column}: {self.message}'
+        return f'token {self.position}: {self.message}'
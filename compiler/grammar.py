@@ -0,0 +1,234 @@
+from collections import namedtuple
+from typing import Callable, Dict, FrozenSet, Iterable, Set, Tuple
+
+from .astnodes import *
+from .lexer import Token
+
+# Terminals are token values such as 'int' or ';', except for identifiers and numbers, which are
+# matched by their token type. END marks the end of the input
+END = '$'
+VALUE_TYPES = {'ID', 'INTEGER', 'FLOAT'}
+
+# A production rewrites its head to the symbols in its body. Its action receives the value of each
+# symbol in the body (the token value for terminals) and returns the value of the head
+Production = namedtuple('Production', ['head', 'body', 'action'])
+
+
+def terminal(token: Token) -> str:
+    return token.type if token.type in VALUE_TYPES else token.val
+
+
+class Grammar:
+    # An LL(1) grammar with its FIRST and FOLLOW sets and parse table, computed once on creation
+
+    def __init__(self, start: str, productions: List[Production],
+                 resolved: Iterable[Tuple[str, str]] = ()):
+        self.start = start
+        self.productions = productions
+        self.nonterminals = {p.head for p in productions}
+        self.nullable: Set[str] = set()
+        self.first: Dict[str, FrozenSet[str]] = {}
+        self.follow: Dict[str, FrozenSet[str]] = {}
+        self.table: Dict[str, Dict[str, Production]] = {}
+        self._compute_first()
+        self._compute_follow()
+        self._compute_table(set(resolved))
+
+    def first_of(self, symbols: Iterable[str]) -> Tuple[Set[str], bool]:
+        # FIRST set of a sequence of symbols, and whether the whole sequence can derive ϵ
+        first = set()
+        for symbol in symbols:
+            if symbol not in self.nonterminals:
+                first.add(symbol)
+                return first, False
+            first |= self.first.get(symbol, frozenset())
+            if symbol not in self.nullable:
+                return first, False
+        return first, True
+
+    def _compute_first(self):
+        first = self.first = {head: set() for head in self.nonterminals}
+        changed = True
+        while changed:
+            changed = False
+            for p in self.productions:
+                symbols, nullable = self.first_of(p.body)
+                if not symbols <= first[p.head] or nullable and p.head not in self.nullable:
+                    first[p.head] |= symbols
+                    if nullable:
+                        self.nullable.add(p.head)
+                    changed = True
+        self.first = {head: frozenset(symbols) for head, symbols in first.items()}
+
+    def _compute_follow(self):
+        follow = {head: set() for head in self.nonterminals}
+        follow[self.start].add(END)
+        changed = True
+        while changed:
+            changed = False
+            for p in self.productions:
+                for i, symbol in enumerate(p.body):
+                    if symbol not in self.nonterminals:
+                        continue
+                    symbols, nullable = self.first_of(p.body[i + 1:])
+                    if nullable:
+                        symbols |= follow[p.head]
+                    if not symbols <= follow[symbol]:
+                        follow[symbol] |= symbols
+                        changed = True
+        self.follow = {head: frozenset(symbols) for head, symbols in follow.items()}
+
+    def _compute_table(self, resolved: Set[Tuple[str, str]]):
+        # Conflicting cells must be listed in resolved, in which case the earlier production wins
+        self.table = {head: {} for head in self.nonterminals}
+        for p in self.productions:
+            symbols, nullable = self.first_of(p.body)
+            if nullable:
+                symbols |= self.follow[p.head]
+            for symbol in symbols:
+                row = self.table[p.head]
+                if symbol in row:
+                    if (p.head, symbol) not in resolved:
+                        raise ValueError(f'Grammar is not LL(1): {p.head} on {symbol}')
+                    continue
+                row[symbol] = p
+
+
+# Semantic actions. Lists are built by right-recursive rules, so each rule appends to the list of
+# its tail and the list is reversed once complete. Operator tails are kept as lists of (op, rhs)
+# pairs and folded onto their left operand, which makes the operators associate left. Rules that
+# need a value from their parent (like the name before a call) return a function of that value
+
+def append(item, items: list) -> list:
+    items.append(item)
+    return items
+
+
+def fold(lhs: Expression, tail: list) -> Expression:
+    for op, rhs in reversed(tail):
+        lhs = BinaryOp(op, lhs, rhs)
+    return lhs
+
+
+def same(value):
+    return value
+
+
+def none():
+    return None
+
+
+def number(value: str) -> Number:
+    return Number(int(value)) if value.isdigit() else Number(float(value))
+
+
+def params(kind: str, name: str, is_array: bool, params: List[ParamFormal]) -> List[ParamFormal]:
+    return append(ParamFormal(Type.from_string(kind), name, is_array), params)[::-1]
+
+
+def var_declaration(array: Optional[Number], _) -> Callable[[Type, str], VarDeclaration]:
+    return lambda kind, name: VarDeclaration(kind, name, array)
+
+
+def fun_declaration(_, params: List[ParamFormal], __,
+                    body: CompoundStatement) -> Callable[[Type, str], FunDeclaration]:
+    return lambda kind, name: FunDeclaration(kind, name, params, body)
+
+
+def local_declarations(kind: Type, name: str, array: Optional[Number], _, decls: List[VarDeclaration]):
+    return append(VarDeclaration(kind, name, array), decls)
+
+
+def operators(term: list, additive: list, relation: Callable) -> Callable[[Expression], Expression]:
+    return lambda lhs: relation(fold(fold(lhs, term), additive))
+
+
+def rule(head: str, body: str, action: Callable) -> Production:
+    return Production(head, tuple(body.split()), action)
+
+
+CMINUS = Grammar('program', [
+    rule('program', 'declaration declaration-list', lambda d, ds: Program(append(d, ds)[::-1])),
+    rule('declaration-list', 'declaration declaration-list', append),
+    rule('declaration-list', '', list),
+    rule('declaration', 'type-specifier ID declaration\'', lambda kind, name, d: d(kind, name)),
+    rule('declaration\'', 'var-declaration ;', var_declaration),
+    rule('declaration\'', '( params ) compound-stmt', fun_declaration),
+    rule('var-declaration', '[ number ]', lambda _, n, __: n),
+    rule('var-declaration', '', none),
+    rule('number', 'INTEGER', number),
+    rule('number', 'FLOAT', number),
+    rule('type-specifier', 'int', Type.from_string),
+    rule('type-specifier', 'float', Type.from_string),
+    rule('type-specifier', 'void', Type.from_string),
+    rule('params', 'int ID param\' param-list', params),
+    rule('params', 'float ID param\' param-list', params),
+    rule('params', 'void params\'', lambda _, ps: ps),
+    rule('params\'', 'ID param\' param-list', lambda name, a, ps: params('void', name, a, ps)),
+    rule('params\'', '', list),
+    rule('param-list', ', param param-list', lambda _, p, ps: append(p, ps)),
+    rule('param-list', '', list),
+    rule('param', 'type-specifier ID param\'', ParamFormal),
+    rule('param\'', '[ ]', lambda _, __: True),
+    rule('param\'', '', lambda: False),
+    rule('compound-stmt', '{ local-declarations statement-list }',
+         lambda _, ds, ss, __: CompoundStatement(ds[::-1], ss[::-1])),
+    rule('local-declarations', 'type-specifier ID var-declaration ; local-declarations', local_declarations),
+    rule('local-declarations', '', list),
+    rule('statement-list', 'statement statement-list', append),
+    rule('statement-list', '', list),
+    rule('statement', 'expression-stmt', same),
+    rule('statement', 'compound-stmt', same),
+    rule('statement', 'selection-stmt', same),
+    rule('statement', 'iteration-stmt', same),
+    rule('statement', 'return-stmt', same),
+    rule('expression-stmt', 'expression ;', lambda e, _: ExpressionStatement(e)),
+    rule('expression-stmt', ';', lambda _: ExpressionStatement(None)),
+    rule('selection-stmt', 'if ( expression ) statement selection-stmt\'',
+         lambda _, __, cond, ___, true, false: IfStatement(cond, true, false)),
+    rule('selection-stmt\'', 'else statement', lambda _, s: s),
+    rule('selection-stmt\'', '', none),
+    rule('iteration-stmt', 'while ( expression ) statement',
+         lambda _, __, cond, ___, body: WhileStatement(cond, body)),
+    rule('return-stmt', 'return return-stmt\' ;', lambda _, e, __: ReturnStatement(e)),
+    rule('return-stmt\'', 'expression', same),
+    rule('return-stmt\'', '', none),
+    rule('expression', 'ID expression\'', lambda name, e: e(name)),
+    rule('expression', '( expression ) operators', lambda _, e, __, ops: ops(e)),
+    rule('expression', 'number operators', lambda n, ops: ops(n)),
+    rule('expression\'', '( args ) operators', lambda _, args, __, ops: lambda name: ops(Call(name, args))),
+    rule('expression\'', 'var\' assignment', lambda index, assign: lambda name: assign(Variable(name, index))),
+    rule('assignment', '= expression', lambda _, e: lambda var: AssignmentExpression(var, e)),
+    rule('assignment', 'operators', same),
+    rule('var\'', '[ expression ]', lambda _, e, __: e),
+    rule('var\'', '', none),
+    rule('operators', 'term\' additive-expression\' simple-expression', operators),
+    rule('simple-expression', 'relop additive-expression', lambda op, rhs: lambda lhs: BinaryOp(op, lhs, rhs)),
+    rule('simple-expression', '', lambda: same),
+    rule('additive-expression', 'term additive-expression\'', fold),
+    rule('additive-expression\'', 'addop term additive-expression\'',
+         lambda op, rhs, tail: append((op, rhs), tail)),
+    rule('additive-expression\'', '', list),
+    rule('term', 'factor term\'', fold),
+    rule('term\'', 'mulop factor term\'', lambda op, rhs, tail: append((op, rhs), tail)),
+    rule('term\'', '', list),
+    rule('factor', '( expression )', lambda _, e, __: e),
+    rule('factor', 'ID factor\'', lambda name, f: f(name)),
+    rule('factor', 'number', same),
+    rule('factor\'', '( args )', lambda _, args, __: lambda name: Call(name, args)),
+    rule('factor\'', 'var\'', lambda index: lambda name: Variable(name, index)),
+    rule('args', 'expression arg-list', lambda e, es: append(e, es)[::-1]),
+    rule('args', '', list),
+    rule('arg-list', ', expression arg-list', lambda _, e, es: append(e, es)),
+    rule('arg-list', '', list),
+    rule('relop', '<=', same),
+    rule('relop', '<', same),
+    rule('relop', '>', same),
+    rule('relop', '>=', same),
+    rule('relop', '==', same),
+    rule('relop', '!=', same),
+    rule('addop', '+', same),
+    rule('addop', '-', same),
+    rule('mulop', '*', same),
+    rule('mulop', '/', same),
+], resolved=[('selection-stmt\'', 'else')])  # a dangling else belongs to the closest if
@@ -0,0 +1,159 @@
+from bisect import bisect_left
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from .astnodes import Declaration, Program
+from .lexer import Token, lex_from
+from .parser import CMinusParser, LLParser, ParseError
+
+
+class Region:
+    # The tokens of one top-level declaration, or a run of tokens that failed to parse (broken).
+    # Token offsets are relative to the region's first token, so an edit only has to move the start
+    # of the regions after it
+
+    def __init__(self, start: int, tokens: List[Token], offsets: List[int],
+                 declaration: Optional[Declaration]):
+        self.start = start
+        self.tokens = tokens
+        self.offsets = offsets
+        self.declaration = declaration
+
+
+def declaration_extent(tokens: List[Token], index: int) -> int:
+    # End of the declaration starting at index: its first ';' outside of braces, or the brace that
+    # closes its body. Raises an IndexError if the tokens run out first
+    depth = 0
+    for i in range(index, len(tokens)):
+        val = tokens[i].val
+        if val == '{':
+            depth += 1
+        elif val == '}':
+            depth -= 1
+            if depth == 0:
+                return i + 1
+        elif val == ';' and depth == 0:
+            return i + 1
+    raise IndexError('no more tokens')
+
+
+class IncrementalParser:
+    # Keeps the tokens and top-level declarations of a source text up to date as it is edited. An
+    # edit is lexed again from the start of the declaration before it until the new tokens line up
+    # with the old ones, and parsed again from there until a declaration ends where an old one
+    # started. The declarations outside of that range are reused as they are
+
+    def __init__(self, source: str = ''):
+        self.source = ''
+        self.regions: List[Region] = []
+        self.relexed = 0  # tokens lexed by the last edit
+        self.reparsed = 0  # declarations parsed by the last edit
+        self.edit(0, 0, source)
+
+    @property
+    def program(self) -> Optional[Program]:
+        if not self.regions or any(region.declaration is None for region in self.regions):
+            return None
+        return Program([region.declaration for region in self.regions])
+
+    def tokens(self) -> Iterator[Tuple[Token, int]]:
+        # Every token with its offset in the source
+        for region in self.regions:
+            for token, offset in zip(region.tokens, region.offsets):
+                yield token, region.start + offset
+
+    def edit(self, start: int, end: int, text: str) -> Optional[Program]:
+        # Replaces source[start:end] with text and returns the new program, or None if it doesn't parse
+        if not 0 <= start <= end <= len(self.source):
+            raise ValueError(f'Edit {start}:{end} is outside of the source')
+        old = self.source
+        source = self.source = old[:start] + text + old[end:]
+        delta = len(text) - (end - start)
+        regions = self.regions
+        starts = [region.start for region in regions]
+
+        # The token before the edit may run into it, so lexing restarts at the region holding it.
+        # A '//' only starts a comment once a newline follows it, and is lexed as two '/' until then,
+        # so an edit that adds or removes a newline on a line with a '//' before it restarts at the
+        # region holding the start of that line. Lexing stops at the first token past the edit that
+        # starts an old region at the same place
+        restart = start
+        if '\n' in text or '\n' in old[start:end]:
+            line = old.rfind('\n', 0, start) + 1
+            if '//' in old[line:start]:
+                restart = line
+        lo = max(bisect_left(starts, restart) - 1, 0)
+        tokens, offsets = [], []
+        sync, k = len(regions), lo
+        for token, offset in lex_from(source, starts[lo] if regions and starts[lo] < restart else 0):
+            if offset >= start + len(text):
+                while k < len(regions) and starts[k] < offset - delta:
+                    k += 1
+                if k < len(regions) and starts[k] == offset - delta and regions[k].tokens[0] == token:
+                    sync = k
+                    break
+            tokens.append(token)
+            offsets.append(offset)
+        for region in regions[sync:]:
+            region.start += delta
+        self.relexed = len(tokens)
+
+        # Parsing restarts at the first broken region, since the edit may have completed it
+        first = lo
+        for i in range(lo):
+            if regions[i].declaration is None:
+                first = i
+                break
+        self.regions[first:], self.reparsed = self._parse(regions[first:lo], tokens, offsets, regions[sync:])
+        return self.program
+
+    def _parse(self, before: List[Region], tokens: List[Token], offsets: List[int],
+               after: List[Region]) -> Tuple[List[Region], int]:
+        # Parses the regions before the edit and the new tokens into regions, then carries on into
+        # the regions after the edit until a declaration boundary matches an old one
+        seq = [token for region in before for token in region.tokens] + tokens
+        seq_offsets = [region.start + offset for region in before for offset in region.offsets] + offsets
+        changed = len(seq)
+        joins: Dict[int, int] = {changed: 0}  # index in seq of the start of each region in after
+        appended = 0
+        parser = CMinusParser(seq)
+        parsed: List[Region] = []
+        index = 0
+        while index not in joins or index < changed:
+            try:
+                declaration, stop = self._declaration(parser, index)
+            except IndexError:
+                if appended < len(after):
+                    # The declaration runs into the regions after the edit. Take in twice as many
+                    # as last time, so a long one is parsed again only a few times
+                    for region in after[appended:2 * appended + 1]:
+                        joins[len(seq)] = appended
+                        seq.extend(region.tokens)
+                        seq_offsets.extend(region.start + offset for offset in region.offsets)
+                        appended += 1
+                    joins[len(seq)] = appended
+                    continue
+                declaration = None
+            except ParseError:
+                declaration = None
+            if declaration is None:
+                # Everything up to the next old region is left broken
+                stop = min(i for i in joins if i > index and i >= changed)
+            parsed.append(Region(seq_offsets[index], seq[index:stop],
+                                 [offset - seq_offsets[index] for offset in seq_offsets[index:stop]],
+                                 declaration))
+            index = stop
+        reparsed = sum(region.declaration is not None for region in parsed)
+        return parsed + after[joins[index]:], reparsed
+
+    @staticmethod
+    def _declaration(parser: CMinusParser, index: int) -> Tuple[Declaration, int]:
+        parser.cursor.index = index
+        try:
+            return parser.declaration(), parser.cursor.index
+        except RecursionError:
+            # Too deeply nested for the recursive descent parser, like in parse()
+            stop = declaration_extent(parser.tokens, index)
+            program = LLParser(parser.tokens[index:stop]).parse()
+            if len(program.declarations) != 1:
+                raise ParseError('unexpected token', parser.tokens[index], index)
+            return program.declarations[0], stop
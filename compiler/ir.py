@@ -0,0 +1,186 @@
+import struct
+from array import array
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+Quadruple = Tuple[str, Optional[str], Optional[str], Optional[str]]
+Operand = int  # its id shifted left by two bits, with its kind in those bits
+
+OPCODES = ['func', 'param', 'alloc', 'end', 'block', 'return', 'arg', 'call', 'assign', 'add', 'sub', 'mult',
+           'div', 'comp', 'disp', 'br', 'brle', 'brge', 'brl', 'brg', 'brne', 'bre']
+OPCODE_IDS = {op: i for i, op in enumerate(OPCODES)}
+
+# Operand kinds, which take the low two bits of an operand. The id in the other bits is, by kind:
+#
+#   NONE      0, for a missing operand
+#   INTEGER   the integer, for operands written in decimal (sizes, counts, branch targets, constants)
+#   TEMP      the number of the temporary variable, for operands named _t followed by it
+#   POOLED    an id into the pool of the other operands (names, types, floats)
+NONE, INTEGER, TEMP, POOLED = range(4)
+EMPTY: Operand = NONE
+LIMIT = 1 << 29  # ids are below this, so that operands fit in 32 bits
+
+_MAGIC = b'CMQ2'
+_HEADER = struct.Struct('<4s2Q')
+_ARRAYS = ['ops', 'operands']
+
+
+def _decimal(digits: str) -> bool:
+    # Whether the digits are how an integer that fits in an id is written
+    return digits.isdigit() and len(digits) < 9 and (digits[0] != '0' or digits == '0')
+
+
+def integer(value: int) -> Operand:
+    # The operand for an integer below LIMIT
+    return value << 2 | INTEGER
+
+
+def temp(number: int) -> Operand:
+    return number << 2 | TEMP
+
+
+class IR:
+    # Quadruples kept in parallel arrays: an opcode byte for each quadruple, and its three operands,
+    # each the kind of the operand and its id packed in an int. Only the operands that aren't numbers
+    # are interned in the pool, so temporaries and integer constants take no memory of their own. The
+    # code generator adds quadruples as opcodes and operands; indexing and iterating give them back as
+    # tuples of strings
+
+    def __init__(self, quads: Iterable[Quadruple] = (), pool: Optional[List[str]] = None,
+                 codes: Optional[Dict[Optional[str], Operand]] = None):
+        self.ops = array('B')
+        self.operands = array('i')
+        self.pool: List[str] = [] if pool is None else pool
+        # The operand of each string in the pool, and of short integers read by append. Temporaries and
+        # other integers are mostly seen once or twice, so aren't kept
+        self.codes: Dict[Optional[str], Operand] = {None: EMPTY} if codes is None else codes
+        for quad in quads:
+            self.append(quad)
+
+    def following(self) -> 'IR':
+        # An empty IR that shares this one's pool, so that either can be extended with the other
+        # by joining their arrays
+        return IR(pool=self.pool, codes=self.codes)
+
+    @staticmethod
+    def join(irs: List['IR']) -> 'IR':
+        # The quadruples of IRs that share a pool, one after another
+        joined = irs[0].following() if irs else IR()
+        for ir in irs:
+            joined.extend(ir)
+        return joined
+
+    def __len__(self) -> int:
+        return len(self.ops)
+
+    def name(self, value: str) -> Operand:
+        # The operand for a string, which is interned in the pool
+        code = self.codes.get(value)
+        if code is None:
+            code = self.codes[value] = len(self.pool) << 2 | POOLED
+            self.pool.append(value)
+        return code
+
+    def integer(self, value: int) -> Operand:
+        return value << 2 | INTEGER if 0 <= value < LIMIT else self.name(str(value))
+
+    def operand(self, value: Optional[str]) -> Operand:
+        # The operand for a string as it is written in a quadruple
+        code = self.codes.get(value)
+        if code is not None:
+            return code
+        if value[:2] == '_t' and _decimal(value[2:]):
+            return temp(int(value[2:]))
+        if _decimal(value):
+            code = integer(int(value))
+            if len(value) > 3:
+                return code
+        else:
+            code = len(self.pool) << 2 | POOLED
+            self.pool.append(value)
+        self.codes[value] = code
+        return code
+
+    def add(self, op: str, a: Operand, b: Operand, c: Operand) -> int:
+        # Returns the index of the quadruple
+        operands = self.operands
+        operands.append(a)
+        operands.append(b)
+        operands.append(c)
+        self.ops.append(OPCODE_IDS[op])
+        return len(self.ops) - 1
+
+    def append(self, quad: Quadruple) -> int:
+        op, a, b, c = quad
+        operand = self.operand
+        return self.add(op, operand(a), operand(b), operand(c))
+
+    def extend(self, quads: Iterable[Quadruple]):
+        if isinstance(quads, IR) and quads.pool is self.pool:
+            self.ops.extend(quads.ops)
+            self.operands.extend(quads.operands)
+            return
+        for quad in quads:
+            self.append(quad)
+
+    def patch(self, i: int, target: int):
+        # Sets the line a branch jumps to
+        self.operands[3 * i + 2] = integer(target)
+
+    def value(self, code: Operand) -> Optional[str]:
+        kind, oid = code & 3, code >> 2
+        if kind == INTEGER:
+            return str(oid)
+        if kind == TEMP:
+            return f'_t{oid}'
+        if kind == POOLED:
+            return self.pool[oid]
+        return None
+
+    def __getitem__(self, i: int) -> Quadruple:
+        if i < 0:
+            i += len(self.ops)
+        operands, value = self.operands, self.value
+        return OPCODES[self.ops[i]], value(operands[3 * i]), value(operands[3 * i + 1]), value(operands[3 * i + 2])
+
+    def __iter__(self) -> Iterator[Quadruple]:
+        # All the operands are decoded at once, then grouped back into quadruples
+        pool = self.pool
+        values = iter([pool[code >> 2] if code & 3 == POOLED else f'_t{code >> 2}' if code & 3 == TEMP else
+                       str(code >> 2) if code else None for code in self.operands])
+        return zip([OPCODES[op] for op in self.ops], values, values, values)
+
+    def __repr__(self):
+        return f'IR({list(self)!r})'
+
+    def to_bytes(self) -> bytes:
+        # The arrays as they are, in the machine's byte order, then the length of each string in the
+        # pool followed by the strings
+        encoded = [string.encode() for string in self.pool]
+        header = _HEADER.pack(_MAGIC, len(self), len(encoded))
+        return b''.join([header] + [getattr(self, name).tobytes() for name in _ARRAYS] +
+                        [array('I', map(len, encoded)).tobytes()] + encoded)
+
+    @staticmethod
+    def from_bytes(data: bytes) -> 'IR':
+        magic, n, n_pool = _HEADER.unpack_from(data)
+        if magic != _MAGIC:
+            raise ValueError('Not serialized quadruples')
+        ir, offset = IR(), _HEADER.size
+        for name in _ARRAYS:
+            values = getattr(ir, name)
+            size = (3 * n if name == 'operands' else n) * values.itemsize
+            values.frombytes(data[offset:offset + size])
+            offset += size
+        lengths = array('I')
+        lengths.frombytes(data[offset:offset + n_pool * lengths.itemsize])
+        offset += n_pool * lengths.itemsize
+        for length in lengths:
+            string = data[offset:offset + length].decode()
+            ir.codes[string] = len(ir.pool) << 2 | POOLED
+            ir.pool.append(string)
+            offset += length
+        if offset != len(data):
+            raise ValueError('Serialized quadruples have the wrong length')
+        if max(ir.ops, default=0) >= len(OPCODES):
+            raise ValueError('Serialized quadruples have an unknown opcode')
+        return ir
@@ -1,36 +1,291 @@
+import codecs
+import os
 import re
-from collections import namedtuple
+import struct
+from array import array
+from collections import deque, namedtuple
+from collections.abc import Sequence
+from itertools import chain
+from typing import IO, Dict, Iterable, Iterator, List, Tuple, Union
 
 Token = namedtuple('Token', ['type', 'val'])
-scanner = re.Scanner([
-    (r'\s+', lambda _, tok: None),  # ignore whitespace
-    (r'//.*\n', lambda _, tok: None),  # ignore line comment
-    (r'==|>=|<=|>|<|!=', lambda _, token: Token('RELOP', token)),
-    (r'\(|\)|\[|\]|\{|\}|,|;|=', lambda _, token: Token('PUNCTUATION', token)),
-    (r'\+|-|/|\*', lambda _, token: Token('MATHOP', token)),
-    (r'(?=\d*[.eE][+-]?\d+)\d+(\.\d+)?([eE][+-]?\d+)?', lambda _, token: Token('FLOAT', token)),
-    (r'\d+', lambda _, token: Token('INTEGER', token)),
-    (r'int|float|void|while|if|else|return', lambda _, token: Token('KEYWORD', token)),
-    (r'[a-zA-Z]+', lambda _, token: Token('ID', token)),
-    (r'.', lambda _, token: Token('INVALID', token)),
-])
-
-
-def strip_comments(string: str):
-    string += " "
-    s, depth = '', 0
-    it = iter(range(len(string) - 1))
-    for i in it:
-        if string[i] + string[i + 1] == '/*':
-            depth += 1
-            next(it)
-        elif string[i] + string[i + 1] == '*/' and depth > 0:
-            depth -= 1
-            next(it)
-        elif depth == 0:
-            s += string[i]
-    return s
-
-
-def lex(string: str):
-    return scanner.scan(strip_comments(string))[0]
+Position = namedtuple('Position', ['line', 'column'])
+RULES = [
+    ('WHITESPACE', r'\s+'),
+    ('COMMENT', r'//.*\n'),
+    ('RELOP', r'==|>=|<=|>|<|!='),
+    ('PUNCTUATION', r'\(|\)|\[|\]|\{|\}|,|;|='),
+    ('MATHOP', r'\+|-|/|\*'),
+    ('FLOAT', r'(?=\d*[.eE][+-]?\d+)\d+(?:\.\d+)?(?:[eE][+-]?\d+)?'),
+    ('INTEGER', r'\d+'),
+    ('ID', r'[a-zA-Z]+'),  # keywords are told apart from identifiers through KEYWORDS
+    ('INVALID', r'.'),
+]
+TOKEN = re.compile('|'.join(f'(?P<{name}>{rule})' for name, rule in RULES))
+KEYWORDS = {word: Token('KEYWORD', word) for word in [
+    'int', 'float', 'void', 'while', 'if', 'else', 'return',
+]}
+SKIPPED = {'WHITESPACE', 'COMMENT'}
+SYMBOLS = {symbol: Token(kind, symbol) for kind, symbols in [
+    ('RELOP', ['==', '>=', '<=', '>', '<', '!=']),
+    ('PUNCTUATION', ['(', ')', '[', ']', '{', '}', ',', ';', '=']),
+    ('MATHOP', ['+', '-', '/', '*']),
+] for symbol in symbols}
+
+# Token types as small integers
+KINDS = {kind: i for i, kind in enumerate([
+    'RELOP', 'PUNCTUATION', 'MATHOP', 'FLOAT', 'INTEGER', 'KEYWORD', 'ID', 'INVALID',
+])}
+
+_CHUNK_SIZE = 1 << 16  # characters handed to the comment stripper at a time
+_LOOKAHEAD = 3  # characters a token rule may inspect past the end of its match (e.g. '1' in '1E+5')
+_COMMENT = re.compile(r'/\*|\*/')
+_MAGIC = b'CMT1'
+_HEADER = struct.Struct('<4s2Q')
+_ARRAYS = ['values', 'kinds', 'offsets', 'lines', 'columns']
+
+
+def _chunks(string: str, start: int = 0) -> Iterator[str]:
+    for i in range(start, len(string), _CHUNK_SIZE):
+        yield string[i:i + _CHUNK_SIZE]
+
+
+def _read(file: IO, size: int) -> Iterator[str]:
+    # Binary files and mmaps are decoded incrementally so characters split between reads survive
+    decoder = None
+    while True:
+        chunk = file.read(size)
+        if not chunk:
+            break
+        if isinstance(chunk, bytes):
+            decoder = decoder or codecs.getincrementaldecoder('utf-8')()
+            chunk = decoder.decode(chunk)
+        yield chunk
+    if decoder is not None:
+        yield decoder.decode(b'', final=True)
+
+
+def _strip(source: Iterable[str]) -> Iterator[Tuple[int, int, int, str]]:
+    # Yields the pieces of code found between (possibly nested) block comments, each with the source
+    # offset, line and column of its first character. A '/' or '*' at the end of a chunk is carried
+    # over, since it may pair up with the first character of the next one
+    depth, carry, base = 0, '', 0  # base is the source offset of string[0]
+    line, line_start, counted = 1, 0, 0  # newlines have been counted up to source offset `counted`
+
+    def advance(string: str, i: int):
+        nonlocal line, line_start, counted
+        n = string.count('\n', counted - base, i)
+        if n:
+            line += n
+            line_start = base + string.rfind('\n', counted - base, i) + 1
+        counted = base + i
+
+    def piece(string: str, i: int, j: int) -> Tuple[int, int, int, str]:
+        advance(string, i)
+        return counted, line, counted - line_start + 1, string[i:j]
+
+    for chunk in source:
+        string, pos = carry + chunk, 0
+        end = len(string)
+        while pos < end:
+            if depth == 0:
+                i = string.find('/*', pos)
+                if i < 0:
+                    stop = end - 1 if string[-1] == '/' else end
+                    if stop > pos:
+                        yield piece(string, pos, stop)
+                    pos = stop
+                    break
+                if i > pos:
+                    yield piece(string, pos, i)
+                depth, pos = 1, i + 2
+            else:
+                m = _COMMENT.search(string, pos)
+                if m is None:
+                    pos = end - 1 if string[-1] in '/*' else end
+                    break
+                depth += 1 if m.group() == '/*' else -1
+                pos = m.end()
+        advance(string, pos)
+        carry, base = string[pos:], base + pos
+    if depth == 0 and carry:
+        yield piece(carry, 0, len(carry))  # unclosed comments swallow the rest of the input
+
+
+class _Locator:
+    # Maps indexes in the tokenizer's buffer back to source positions. Indexes only move forward, so
+    # newlines are counted incrementally from the last located index
+
+    def __init__(self):
+        self.marks = deque()  # (stream index, offset, line, column) of the start of each buffered piece
+        self.trimmed = 0  # stream index of the first character left in the buffer
+        self.cursor = None  # (stream index, line, column) of the last located character
+
+    def add(self, index: int, offset: int, line: int, column: int):
+        self.marks.append((self.trimmed + index, offset, line, column))
+
+    def locate(self, code: str, index: int) -> Tuple[int, int, int]:
+        at = self.trimmed + index
+        while len(self.marks) > 1 and self.marks[1][0] <= at:
+            self.marks.popleft()
+            self.cursor = None
+        start, offset, line, column = self.marks[0]
+        if self.cursor is not None:
+            start, line, column = self.cursor
+        i = start - self.trimmed
+        n = code.count('\n', i, index)
+        if n:
+            line += n
+            column = index - code.rfind('\n', i, index)
+        else:
+            column += index - i
+        self.cursor = (at, line, column)
+        return offset + at - self.marks[0][0], line, column
+
+    def trim(self, code: str, index: int):
+        if self.marks:
+            self.locate(code, index)
+        self.trimmed += index
+
+
+def _tokenize(pieces: Iterable[Tuple[int, int, int, str]], positions: bool = False) -> Iterator:
+    # Scans the comment-free pieces as if they were one string. A match close to the end of the
+    # buffer is held back until more code arrives, since the next piece could extend it (e.g. the
+    # pieces 'i' and 'f' form the keyword 'if', and '//' only starts a comment before a newline).
+    # With positions, yields (token, offset, line, column) tuples instead of bare tokens
+    finditer, keywords, symbols = TOKEN.finditer, KEYWORDS, SYMBOLS
+    code, locator = '', _Locator()
+    for piece in chain(pieces, [None]):
+        final = piece is None
+        if not final:
+            if positions:
+                locator.add(len(code), *piece[:3])
+            code += piece[3]
+        pos, end = 0, len(code)
+        for m in finditer(code):
+            kind, stop = m.lastgroup, m.end()
+            if not final and (stop + _LOOKAHEAD > end or kind == 'MATHOP' and code.startswith('//', pos)):
+                break  # a '/' followed by '/' is a line comment still waiting for its newline
+            if kind not in SKIPPED:
+                val = m.group()
+                if kind == 'ID':
+                    token = keywords.get(val) or Token('ID', val)
+                else:
+                    token = symbols.get(val) or Token(kind, val)
+                yield (token, *locator.locate(code, pos)) if positions else token
+            pos = stop
+        if positions:
+            locator.trim(code, pos)
+        code = code[pos:]
+
+
+def _source(source: Union[str, os.PathLike, IO], chunk_size: int) -> Iterator[str]:
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, 'r') as f:
+            yield from _read(f, chunk_size)
+    else:
+        yield from _read(source, chunk_size)
+
+
+def strip_comments(string: str) -> str:
+    return ''.join(code for _, _, _, code in _strip(_chunks(string)))
+
+
+def lex(string: str) -> List[Token]:
+    return list(_tokenize(_strip(_chunks(string))))
+
+
+def lex_stream(source: Union[str, os.PathLike, IO], chunk_size: int = _CHUNK_SIZE) -> Iterator[Token]:
+    # Lazily tokenizes a path, a text or binary file object, or an mmap, reading it in chunks
+    return _tokenize(_strip(_source(source, chunk_size)))
+
+
+def lex_from(string: str, start: int = 0) -> Iterator[Tuple[Token, int]]:
+    # Lazily tokenizes string from offset start, yielding each token with its offset in string. The
+    # start must not fall inside a token or a comment
+    for token, offset, _, _ in _tokenize(_strip(_chunks(string, start)), positions=True):
+        yield token, start + offset
+
+
+class TokenStream(Sequence):
+    # Compact token list that the parser can consume in place of a list of tokens. Tokens are
+    # interned, so each one costs a value id, a kind byte and its position in parallel arrays rather
+    # than a namedtuple with two strings
+
+    def __init__(self, tokens: Iterable[Tuple[Token, int, int, int]] = ()):
+        self.table: List[Token] = []  # interned tokens, indexed by value id
+        self.ids: Dict[Token, int] = {}
+        self.values = array('I')
+        self.kinds = array('B')
+        self.offsets = array('Q')
+        self.lines = array('I')
+        self.columns = array('I')
+        for token, offset, line, column in tokens:
+            self.append(token, offset, line, column)
+
+    @staticmethod
+    def from_string(string: str) -> 'TokenStream':
+        return TokenStream(_tokenize(_strip(_chunks(string)), positions=True))
+
+    @staticmethod
+    def from_file(source: Union[str, os.PathLike, IO], chunk_size: int = _CHUNK_SIZE) -> 'TokenStream':
+        return TokenStream(_tokenize(_strip(_source(source, chunk_size)), positions=True))
+
+    def to_bytes(self) -> bytes:
+        # The arrays as they are, in the machine's byte order, then the interned tokens as their kind
+        # and the length of their value followed by the values
+        vals = [token.val.encode() for token in self.table]
+        kinds = array('B', [KINDS[token.type] for token in self.table])
+        header = _HEADER.pack(_MAGIC, len(self), len(self.table))
+        return b''.join([header] + [getattr(self, name).tobytes() for name in _ARRAYS] +
+                        [kinds.tobytes(), array('I', map(len, vals)).tobytes()] + vals)
+
+    @staticmethod
+    def from_bytes(data: bytes) -> 'TokenStream':
+        magic, n, n_table = _HEADER.unpack_from(data)
+        if magic != _MAGIC:
+            raise ValueError('Not a serialized token stream')
+        stream, offset = TokenStream(), _HEADER.size
+        for name in _ARRAYS:
+            values = getattr(stream, name)
+            values.frombytes(data[offset:offset + n * values.itemsize])
+            offset += n * values.itemsize
+        types, lengths = array('B'), array('I')
+        types.frombytes(data[offset:offset + n_table])
+        offset += n_table
+        lengths.frombytes(data[offset:offset + n_table * lengths.itemsize])
+        offset += n_table * lengths.itemsize
+        names = list(KINDS)
+        for kind, length in zip(types, lengths):
+            token = Token(names[kind], data[offset:offset + length].decode())
+            offset += length
+            stream.ids[token] = len(stream.table)
+            stream.table.append(token)
+        if offset != len(data):
+            raise ValueError('Serialized token stream has the wrong length')
+        return stream
+
+    def append(self, token: Token, offset: int = 0, line: int = 0, column: int = 0):
+        value = self.ids.get(token)
+        if value is None:
+            value = self.ids[token] = len(self.table)
+            self.table.append(token)
+        self.values.append(value)
+        self.kinds.append(KINDS[token.type])
+        self.offsets.append(offset)
+        self.lines.append(line)
+        self.columns.append(column)
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self.table[value] for value in self.values[i]]
+        return self.table[self.values[i]]
+
+    def kind(self, i: int) -> int:
+        return self.kinds[i]
+
+    def position(self, i: int) -> Position:
+        return Position(self.lines[i], self.columns[i])
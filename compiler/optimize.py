@@ -0,0 +1,263 @@
+import itertools
+import math
+import operator
+import re
+import struct
+from typing import Dict, List, Optional, Set, Union
+
+from .codegen import JUMPS, MATHOPS
+from .ir import Quadruple
+
+Constant = Union[int, float]
+
+ARITHMETIC = set(MATHOPS.values())
+COMMUTATIVE = {'add', 'mult'}
+BRANCHES = set(JUMPS.values())
+
+# Whether a branch is taken, given the two sides of the comparison before it
+TAKEN = {
+    'brle': operator.le,
+    'brge': operator.ge,
+    'brl': operator.lt,
+    'brg': operator.gt,
+    'brne': operator.ne,
+    'bre': operator.eq,
+}
+
+_INTEGER = re.compile(r'-?\d+$')
+_FLOAT = re.compile(r'-?\d')  # names are letters only, so anything else starting like this is a float
+_FLOAT32 = struct.Struct('f')
+
+
+def optimize(ir: List[Quadruple]) -> List[Quadruple]:
+    return number_values(fold_constants(ir))
+
+
+def constant(operand: Optional[str]) -> Optional[Constant]:
+    if operand is None:
+        return None
+    if _INTEGER.match(operand):
+        return int(operand)
+    if _FLOAT.match(operand):
+        return float(operand)
+    return None
+
+
+def stored(value: Optional[Constant]) -> Optional[Constant]:
+    # The value as it is stored in 4 bytes: ints as is, and floats rounded to single precision. None if
+    # it doesn't fit, since what happens then is left for when it runs
+    if isinstance(value, int):
+        return value if -2 ** 31 <= value < 2 ** 31 else None
+    if value is None:
+        return None
+    try:
+        value = _FLOAT32.unpack(_FLOAT32.pack(value))[0]
+    except OverflowError:
+        return None
+    return value if math.isfinite(value) else None
+
+
+def literal(value: Constant) -> str:
+    # How a stored constant is written in a quadruple: floats with the fewest digits that read back as
+    # the same single precision value, and with a point if they'd otherwise read as an int
+    if isinstance(value, int):
+        return str(value)
+    for precision in range(6, 10):
+        written = '%.*g' % (precision, value)
+        if stored(float(written)) == value:
+            break
+    return written if '.' in written or 'e' in written else written + '.0'
+
+
+def evaluate(op: str, lhs: Constant, rhs: Constant) -> Optional[Constant]:
+    # The value of an arithmetic operation on stored constants, or None if it isn't known until it runs.
+    # Integers divide rounding towards zero, as in C, and are never mixed with floats (the analyzer
+    # rejects that)
+    if lhs.__class__ is not rhs.__class__:
+        return None
+    if op in ('add', 'sub', 'mult'):
+        return stored(lhs + rhs if op == 'add' else lhs - rhs if op == 'sub' else lhs * rhs)
+    if not rhs:
+        return None  # division by zero
+    if isinstance(lhs, float):
+        return stored(lhs / rhs)
+    quotient = abs(lhs) // abs(rhs)
+    return stored(-quotient if (lhs < 0) != (rhs < 0) else quotient)
+
+
+def is_temp(operand: Optional[str]) -> bool:
+    return operand is not None and operand[:2] == '_t'
+
+
+def leaders(ir: List[Quadruple]) -> Set[int]:
+    # Indexes of the quadruples that start a basic block: function entries, branch targets, and the
+    # quadruples after branches
+    starts = {0}
+    for i, (op, _, _, target) in enumerate(ir):
+        if op == 'func':
+            starts.add(i)
+        elif op == 'br' or op in BRANCHES:
+            starts.add(i + 1)
+            starts.add(int(target) - 1)
+    return starts
+
+
+def renumber(ir: List[Optional[Quadruple]]) -> List[Quadruple]:
+    # Drops the quadruples that are None and moves the branch targets with those left. A branch to a
+    # dropped quadruple goes to the next one that is left
+    lines, line = [], 1
+    for quad in ir:
+        lines.append(line)
+        line += quad is not None
+    lines.append(line)
+    return [(op, a, None, str(lines[int(c) - 1])) if op == 'br' or op in BRANCHES else (op, a, b, c)
+            for op, a, b, c in filter(None, ir)]
+
+
+def fold_constants(ir: List[Quadruple]) -> List[Quadruple]:
+    # Evaluates the arithmetic and comparisons whose operands are constants, and substitutes the
+    # constants assigned to variables into the quadruples after the assignment in the same basic block.
+    # A branch on a constant comparison becomes br if it is taken, and is dropped if it isn't
+    ir = list(ir)
+    starts = leaders(ir)
+    values: Dict[str, Constant] = {}  # of variables and temporaries
+    comparisons: Dict[str, tuple] = {}  # the sides of constant comparisons by temporary
+    folded: Set[str] = set()  # temporaries whose value is a constant
+    global_names: Set[str] = set()
+    blocks: List[List[str]] = []  # the variables declared in each block being generated
+    in_function = False
+
+    def substitute(operand: Optional[str]) -> Optional[str]:
+        value = values.get(operand)
+        return operand if value is None else literal(value)
+
+    for i, (op, a, b, c) in enumerate(ir):
+        if i in starts:
+            values.clear()
+            comparisons.clear()
+        if op in ARITHMETIC or op == 'comp':
+            a, b = substitute(a), substitute(b)
+            lhs, rhs = stored(constant(a)), stored(constant(b))
+            if lhs is not None and rhs is not None:
+                if op == 'comp':
+                    comparisons[c] = lhs, rhs
+                else:
+                    value = evaluate(op, lhs, rhs)
+                    if value is not None:
+                        values[c] = value
+                        folded.add(c)
+                        ir[i] = 'assign', literal(value), None, c
+                        continue
+            ir[i] = op, a, b, c
+        elif op == 'assign':
+            a = substitute(a)
+            value = constant(a)
+            if value is None:
+                values.pop(c, None)
+            else:
+                values[c] = value
+            ir[i] = op, a, b, c
+        elif op == 'disp':
+            ir[i] = op, a, substitute(b), c
+        elif op in ('arg', 'return'):
+            ir[i] = op, a, b, substitute(c)
+        elif op in BRANCHES and a in comparisons:
+            ir[i] = ('br', None, None, c) if TAKEN[op](*comparisons[a]) else None
+        elif op == 'call':
+            for name in global_names:  # it may assign to them
+                values.pop(name, None)
+        elif op == 'func':
+            in_function = True
+        elif op == 'block':
+            blocks.append([])
+        elif op == 'alloc':
+            if not in_function:
+                global_names.add(c)
+            elif blocks:
+                blocks[-1].append(c)
+            values.pop(c, None)  # the variable it shadows, if any, isn't known until the block ends
+        elif op == 'end':
+            if a == 'func':
+                in_function = False
+            else:
+                for name in blocks.pop():
+                    values.pop(name, None)
+
+    # Drop the comparisons and constants that nothing uses anymore
+    uses: Dict[str, int] = {}
+    for quad in filter(None, ir):
+        for operand in quad[1:]:
+            if is_temp(operand):
+                uses[operand] = uses.get(operand, 0) + 1
+    for i, quad in enumerate(ir):
+        if quad is not None and (quad[0] == 'comp' or quad[3] in folded) and uses[quad[3]] == 1:
+            ir[i] = None
+    return renumber(ir)
+
+
+def number_values(ir: List[Quadruple]) -> List[Quadruple]:
+    # Local value numbering: in each basic block, gives the operands that hold the same value the same
+    # number, and drops an add, sub, mult, div, comp or disp whose operator and operand numbers are those
+    # of one before it, using the temporary of that one instead.
+    #
+    # A disp gives the address of an array element, so a temporary it defines holds whatever is stored
+    # there when it is read. Assigning to an element or calling a function starts a new generation of
+    # memory, in which the elements read and their addresses are numbered anew. Calls may also assign
+    # to globals, and the declarations of a block shadow variables outside it, so both renumber variables
+    ir = list(ir)
+    starts = leaders(ir)
+    renamed: Dict[str, str] = {}  # temporaries of dropped quadruples to the ones used instead
+    numbers = itertools.count()
+    variables: Dict[str, int] = {}
+    values: Dict[str, int] = {}  # of temporaries and constants
+    computed: Dict[tuple, str] = {}  # the temporary each operation was stored in
+    addresses: Dict[str, tuple] = {}  # the disp of each temporary that holds an address
+    loads: Dict[tuple, int] = {}  # of the element at each address, by generation of memory
+    generation = 0
+
+    def number(operand: str) -> int:
+        address = addresses.get(operand)
+        if address is not None:
+            table, operand = loads, (address, generation)
+        elif is_temp(operand) or constant(operand) is not None:
+            table = values
+        else:
+            table = variables
+        value = table.get(operand)
+        if value is None:
+            value = table[operand] = next(numbers)
+        return value
+
+    for i, quad in enumerate(ir):
+        if i in starts:
+            for table in (variables, values, computed, addresses, loads):
+                table.clear()
+        op, a, b, c = quad[0], renamed.get(quad[1], quad[1]), renamed.get(quad[2], quad[2]), \
+            renamed.get(quad[3], quad[3])
+        if op in ARITHMETIC or op == 'comp' or op == 'disp':
+            lhs, rhs = number(a), number(b)
+            if op in COMMUTATIVE and lhs > rhs:
+                lhs, rhs = rhs, lhs
+            key = (op, lhs, rhs, generation if op == 'disp' else None)
+            temp = computed.get(key)
+            if temp is not None:
+                renamed[c] = temp
+                ir[i] = None
+                continue
+            computed[key] = c
+            if op == 'disp':
+                addresses[c] = key
+        elif op == 'assign':
+            if c in addresses:
+                generation += 1
+            elif is_temp(c):
+                values[c] = number(a)
+            else:
+                variables[c] = number(a)
+        elif op == 'call':
+            variables.clear()
+            generation += 1
+        elif op in ('alloc', 'end'):
+            variables.clear()
+        ir[i] = op, a, b, c
+    return renumber(ir)
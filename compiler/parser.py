@@ -1,79 +1,288 @@
-from typing import Callable
+from collections import deque, namedtuple
+from itertools import chain
+from operator import attrgetter
+from typing import Callable, Iterable, Sequence, Tuple, TypeVar
 
 from .astnodes import *
-from .lexer import Token
+from .diagnostics import Diagnostic
+from .grammar import CMINUS, END, VALUE_TYPES, Grammar, Production, terminal
+from .lexer import Position, Token, TokenStream
 
+token_type = attrgetter('type')
+token_val = attrgetter('val')
 
-def parse(tokens: List[Token]) -> Optional[Program]:
+# FIRST sets of the grammar rules, used to pick which rule to follow
+FIRST = CMINUS.first
+VAR_DECLARATION = frozenset(CMINUS.first_of(['var-declaration', ';'])[0])
+
+# Binary operators by precedence. Operators that don't associate can't be chained without
+# parentheses, so a < b < c is a syntax error
+Operator = namedtuple('Operator', ['precedence', 'associative'])
+OPERATORS = {
+    '<=': Operator(0, False), '<': Operator(0, False), '>': Operator(0, False),
+    '>=': Operator(0, False), '==': Operator(0, False), '!=': Operator(0, False),
+    '+': Operator(1, True), '-': Operator(1, True),
+    '*': Operator(2, True), '/': Operator(2, True),
+}
+
+
+def position(tokens: Iterable[Token], index: int) -> Union[Position, int]:
+    # Source position of a token if the tokens carry positions, else its index. The end of the input
+    # is placed at the last token
+    if isinstance(tokens, TokenStream):
+        return tokens.position(min(index, len(tokens) - 1)) if len(tokens) else Position(1, 1)
+    return index
+
+
+T = TypeVar('T')
+N = TypeVar('N', bound=Node)
+
+
+class ParseError(Exception):
+    # Raised with a message, the offending token and its position
+    pass
+
+
+def parse(tokens: Iterable[Token]) -> Optional[Program]:
     parser = CMinusParser(tokens)
     try:
         return parser.parse()
-    except:
+    except RecursionError:
+        # Programs nested too deeply for the recursive descent parser go through the table-driven one
+        if isinstance(tokens, Sequence):
+            try:
+                return LLParser(tokens).parse()
+            except (ParseError, IndexError, RecursionError):
+                return None
         return None
+    except (ParseError, IndexError):
+        return None
+
+
+def recognize(tokens: Iterable[Token]) -> bool:
+    return Recognizer(tokens).recognize()
+
+
+def parse_with_diagnostics(tokens: Iterable[Token]) -> Tuple[Program, List[Diagnostic]]:
+    # Parses past syntax errors, returning what could be parsed along with every error found
+    parser = CMinusParser(tokens, recover=True)
+    try:
+        return parser.parse(), parser.diagnostics
+    except RecursionError:
+        pass
+    # Programs nested too deeply for the recursive descent parser go through the table-driven one,
+    # which stops at the first error
+    if not isinstance(tokens, Sequence):
+        return Program([]), [Diagnostic(None, 'program is nested too deeply')]
+    try:
+        return LLParser(tokens).parse(), []
+    except ParseError as error:
+        message, token, at = error.args
+        return Program([]), [Diagnostic(at, f'{message} {token.val!r}' if token is not None else message)]
+    except IndexError:
+        return Program([]), [Diagnostic(position(tokens, len(tokens)), 'unexpected end of input')]
+    except RecursionError:
+        return Program([]), [Diagnostic(None, 'program is nested too deeply')]
+
+
+class TokenCursor:
+    # Read position over a token sequence, or over a token iterator with a lookahead buffer.
+    # Consuming a token only moves the cursor, so the caller's tokens are left untouched
+
+    def __init__(self, tokens: Iterable[Token]):
+        self.tokens = tokens
+        self.index = 0  # index of the head token
+        self.iterator = None if isinstance(tokens, Sequence) else iter(tokens)
+        self.buffer = deque()
+
+    def peek(self, k: int = 0) -> Token:
+        # Raises an IndexError past the last token, like indexing a list would
+        if self.iterator is None:
+            return self.tokens[self.index + k]
+        while len(self.buffer) <= k:
+            token = next(self.iterator, None)
+            if token is None:
+                raise IndexError('no more tokens')
+            self.buffer.append(token)
+        return self.buffer[k]
+
+    def advance(self) -> Token:
+        token = self.peek()
+        if self.iterator is not None:
+            self.buffer.popleft()
+        self.index += 1
+        return token
+
+    def at_end(self) -> bool:
+        try:
+            self.peek()
+            return False
+        except IndexError:
+            return True
 
 
 class CMinusParser:
 
-    def __init__(self, tokens: List[Token]):
+    def __init__(self, tokens: Iterable[Token], recover: bool = False):
         self.tokens = tokens
+        self.cursor = TokenCursor(tokens)
+        # In recovery mode, syntax errors are recorded and parsing resumes after the next ';' or
+        # '}', or at the next declaration keyword (panic mode)
+        self.recover = recover
+        self.diagnostics: List[Diagnostic] = []
+
+    def position(self, index: int) -> Union[Position, int]:
+        return position(self.tokens, index)
+
+    def error(self, token: Token, index: int) -> ParseError:
+        return ParseError('unexpected token', token, self.position(index))
+
+    def at(self, node: N, index: int) -> N:
+        # Records the index of the token the node starts at. The source position is only looked up
+        # when a diagnostic needs it. Numbers are left without one, as no error is reported at them
+        node.position = index
+        return node
+
+    def report(self, error: Exception):
+        if isinstance(error, ParseError):
+            message, token, at = error.args
+            diagnostic = Diagnostic(at, f'{message} {token.val!r}' if token is not None else message)
+        else:
+            diagnostic = Diagnostic(self.position(self.cursor.index), 'unexpected end of input')
+        # An error that isn't recovered from locally is seen again by each enclosing rule
+        if not self.diagnostics or self.diagnostics[-1].position != diagnostic.position:
+            self.diagnostics.append(diagnostic)
+
+    def recovering(self, rule: Callable[[], T], skip: Callable[[], None]) -> Optional[T]:
+        start = self.cursor.index
+        try:
+            return rule()
+        except (ParseError, IndexError) as e:
+            self.report(e)
+            if self.cursor.index == start and not self.cursor.at_end():
+                self.cursor.advance()  # always make progress
+            skip()
+            return None
+
+    def at_function(self) -> bool:
+        # A type, a name and '(' start a function declaration, even where a statement was expected
+        try:
+            return self.lookahead() in FIRST['type-specifier'] and (
+                    self.cursor.peek(1).type == 'ID' and self.cursor.peek(2).val == '(')
+        except IndexError:
+            return False
+
+    def skip_statement(self):
+        # Skips to the end of the statement, without leaving the enclosing block
+        depth = 0
+        while not self.cursor.at_end():
+            val = self.lookahead()
+            if val == '{':
+                depth += 1
+            elif val == '}':
+                if depth == 0:
+                    return
+                depth -= 1
+                if depth == 0:
+                    self.cursor.advance()
+                    return
+            elif depth == 0 and val == ';':
+                self.cursor.advance()
+                return
+            elif self.at_function():
+                return
+            self.cursor.advance()
+
+    def skip_declaration(self):
+        # Skips to the next declaration keyword outside of any block
+        depth = 0
+        while not self.cursor.at_end():
+            val = self.lookahead()
+            if val == '{':
+                depth += 1
+            elif val == '}':
+                depth -= 1
+            elif depth <= 0 and val in FIRST['declaration'] or self.at_function():
+                return
+            self.cursor.advance()
 
     def match(self, matcher: Callable[[Token], str], *params: str) -> List[str]:
         values = []
         for x in params:
-            head = self.tokens.pop(0)
+            head = self.cursor.peek()
             if matcher(head) != x:
-                raise Exception('unexpected token', head)
+                raise self.error(head, self.cursor.index)
+            self.cursor.advance()
             values.append(head.val)
         return values
 
     def accept_type(self, *types: str) -> List[str]:
-        return self.match(lambda token: token.type, *types)
+        return self.match(token_type, *types)
 
     def accept_val(self, *values: str) -> List[str]:
-        return self.match(lambda token: token.val, *values)
+        return self.match(token_val, *values)
 
     def union(self, options: List[str]) -> str:
         for option in options:
             if self.next().val == option:
                 self.accept_val(option)
                 return option
-        raise Exception('unexpected token', self.next())
+        raise self.error(self.next(), self.cursor.index)
 
     def next(self) -> Token:
-        return self.tokens[0]
+        return self.cursor.peek()
+
+    def lookahead(self) -> str:
+        return terminal(self.cursor.peek())
 
     def parse(self) -> Program:
         program = self.program()
-        if self.tokens:
-            raise Exception('unexpected tokens after declaration list', self.tokens)
+        if not self.cursor.at_end():
+            raise ParseError('unexpected token after declaration list', self.next(),
+                             self.position(self.cursor.index))
         return program
 
     # program -> declaration declaration-list
     def program(self) -> Program:
+        if self.recover:
+            declarations = self.declaration_list([])
+            if not declarations and not self.diagnostics:
+                self.diagnostics.append(Diagnostic(self.position(0), 'expected a declaration'))
+            return Program(declarations)
         return Program(self.declaration_list([self.declaration()]))
 
     # declaration-list -> declaration declaration-list | ϵ
     def declaration_list(self, declarations: List[Declaration]) -> List[Declaration]:
-        try:
-            if self.next().val in ['int', 'float', 'void']:
-                return self.declaration_list(declarations + [self.declaration()])
-        except IndexError:
-            return declarations  # end of program
+        if self.recover:
+            while not self.cursor.at_end():
+                declaration = self.recovering(self.checked_declaration, self.skip_declaration)
+                if declaration is not None:
+                    declarations.append(declaration)
+            return declarations
+        while not self.cursor.at_end() and self.lookahead() in FIRST['declaration']:
+            declarations.append(self.declaration())
+        return declarations
+
+    def checked_declaration(self) -> Declaration:
+        if self.lookahead() not in FIRST['declaration']:
+            raise self.error(self.next(), self.cursor.index)
+        return self.declaration()
 
     # declaration -> type-specifier ID var-declaration ; | type-specifier ID ( params ) compound-stmt
     def declaration(self) -> Declaration:
+        start = self.cursor.index
         kind = self.type_specifier()
         name = self.id()
-        if self.next().val in ['[', ';']:
+        if self.lookahead() in VAR_DECLARATION:
             array = self.var_declaration()
             self.accept_val(';')
-            return VarDeclaration(kind, name, array)
+            return self.at(VarDeclaration(kind, name, array), start)
         else:
             self.accept_val('(')
             params = self.params()
             self.accept_val(')')
             body = self.compound_stmt()
-            return FunDeclaration(kind, name, params, body)
+            return self.at(FunDeclaration(kind, name, params, body), start)
 
     # var-declaration -> [ NUM ] | ϵ
     def var_declaration(self) -> Optional[Number]:
@@ -104,25 +313,27 @@ class CMinusParser:
         if self.next().val in ['int', 'float']:
             return self.param_list([self.param()])
         else:
+            start = self.cursor.index
             self.accept_val('void')
             if self.next().type == 'ID':
-                param = ParamFormal(Type.VOID, self.id(), self.param_())
+                param = self.at(ParamFormal(Type.VOID, self.id(), self.param_()), start)
                 return self.param_list([param])
             return []
 
     # param-list' -> , param param-list | ϵ
     def param_list(self, params: List[ParamFormal]) -> List[ParamFormal]:
-        if self.next().val == ',':
+        while self.next().val == ',':
             self.accept_val(',')
-            return self.param_list(params + [self.param()])
+            params.append(self.param())
         return params
 
     # param -> type-specifier ID param'
     def param(self) -> ParamFormal:
+        start = self.cursor.index
         kind = self.type_specifier()
         name = self.id()
         is_array = self.param_()
-        return ParamFormal(kind, name, is_array)
+        return self.at(ParamFormal(kind, name, is_array), start)
 
     # param' -> [] | ϵ
     def param_(self) -> bool:
@@ -133,32 +344,53 @@ class CMinusParser:
 
     # compound-stmt -> { local-declarations statement-list }
     def compound_stmt(self) -> CompoundStatement:
+        start = self.cursor.index
         self.accept_val('{')
         decls = self.local_declarations([])
         body = self.statement_list([])
         self.accept_val('}')
-        return CompoundStatement(decls, body)
+        return self.at(CompoundStatement(decls, body), start)
 
     # local-declarations -> type-specifier ID var-declaration ; local-declarations | ϵ
     def local_declarations(self, decls: List[VarDeclaration]) -> List[VarDeclaration]:
-        if self.next().val in ['int', 'float', 'void']:
-            kind = self.type_specifier()
-            name = self.id()
-            array = self.var_declaration()
-            self.accept_val(';')
-            return self.local_declarations(decls + [VarDeclaration(kind, name, array)])
+        while self.lookahead() in FIRST['type-specifier']:
+            if self.recover:
+                decl = self.recovering(self.local_declaration, self.skip_statement)
+                if decl is not None:
+                    decls.append(decl)
+            else:
+                decls.append(self.local_declaration())
         return decls
 
+    def local_declaration(self) -> VarDeclaration:
+        start = self.cursor.index
+        kind = self.type_specifier()
+        name = self.id()
+        array = self.var_declaration()
+        self.accept_val(';')
+        return self.at(VarDeclaration(kind, name, array), start)
+
     # statement-list -> statement statement-list | ϵ
     def statement_list(self, statements: List[Statement]) -> List[Statement]:
-        if self.next().val in ['(', ';', 'if', 'return', 'while', '{'] or (
-                self.next().type in ['ID', 'INTEGER', 'FLOAT']):
-            return self.statement_list(statements + [self.statement()])
+        if self.recover:
+            # Anything but the end of the block or the start of a function is taken as a statement
+            while self.lookahead() != '}' and not self.at_function():
+                statement = self.recovering(self.checked_statement, self.skip_statement)
+                if statement is not None:
+                    statements.append(statement)
+            return statements
+        while self.lookahead() in FIRST['statement']:
+            statements.append(self.statement())
         return statements
 
+    def checked_statement(self) -> Statement:
+        if self.lookahead() not in FIRST['statement']:
+            raise self.error(self.next(), self.cursor.index)
+        return self.statement()
+
     # statement -> expression-stmt | compound-stmt | selection-stmt | iteration-stmt | return-stmt
     def statement(self) -> Statement:
-        if self.next().val in ['(', ';'] or self.next().type in ['ID', 'INTEGER', 'FLOAT']:
+        if self.lookahead() in FIRST['expression-stmt']:
             return self.expression_stmt()
         elif self.next().val == '{':
             return self.compound_stmt()
@@ -171,21 +403,23 @@ class CMinusParser:
 
     # expression-stmt -> expression ; | ;
     def expression_stmt(self) -> ExpressionStatement:
-        if self.next().val == '(' or self.next().type in ['ID', 'INTEGER', 'FLOAT']:
+        start = self.cursor.index
+        if self.lookahead() in FIRST['expression']:
             expression = self.expression()
         else:
             expression = None
         self.accept_val(';')
-        return ExpressionStatement(expression)
+        return self.at(ExpressionStatement(expression), start)
 
     # selection-stmt -> if ( expression ) statement selection-stmt'
     def selection_stmt(self) -> IfStatement:
+        start = self.cursor.index
         self.accept_val('if', '(')
         cond = self.expression()
         self.accept_val(')')
         true = self.statement()
         false = self.selection_stmt_()
-        return IfStatement(cond, true, false)
+        return self.at(IfStatement(cond, true, false), start)
 
     # selection-stmt' -> else statement | ϵ
     def selection_stmt_(self) -> Optional[Statement]:
@@ -196,64 +430,60 @@ class CMinusParser:
 
     # iteration-stmt -> while ( expression ) statement
     def iteration_stmt(self) -> WhileStatement:
+        start = self.cursor.index
         self.accept_val('while', '(')
         cond = self.expression()
         self.accept_val(')')
         body = self.statement()
-        return WhileStatement(cond, body)
+        return self.at(WhileStatement(cond, body), start)
 
     # return-stmt -> return return-stmt' ;
     def return_stmt(self) -> ReturnStatement:
+        start = self.cursor.index
         self.accept_val('return')
         expression = self.return_stmt_()
         self.accept_val(';')
-        return ReturnStatement(expression)
+        return self.at(ReturnStatement(expression), start)
 
     # return-stmt' -> expression | ϵ
     def return_stmt_(self) -> Optional[Expression]:
-        if self.next().val == '(' or self.next().type in ['ID', 'INTEGER', 'FLOAT']:
+        if self.lookahead() in FIRST['expression']:
             return self.expression()
         return None
 
-    # expression -> ID var' expression'' | ID ( args ) expression''' | ( expression ) expression''' | NUM expression'''
+    # expression -> var = expression | simple-expression
     def expression(self) -> Expression:
-        if self.next().type == 'ID':
-            name = self.id()
-            if self.next().val == '(':
-                self.accept_val('(')
-                args = self.args()
-                self.accept_val(')')
-                return self.expression___(Call(name, args))
-            else:
-                index = self.var_()
-                return self.expression__(Variable(name, index))
-        else:
-            if self.next().val == '(':
-                self.accept_val('(')
-                lhs = self.expression()
-                self.accept_val(')')
-                return self.expression___(lhs)
-            else:
-                lhs = self.number()
-                return self.expression___(lhs)
-
-    # expression'' -> = expression | expression'''
-    def expression__(self, var: Variable) -> Expression:
-        if self.next().val == '=':
+        is_name = self.next().type == 'ID'
+        lhs = self.factor()
+        if is_name and isinstance(lhs, Variable) and self.next().val == '=':
+            start = self.cursor.index
             self.accept_val('=')
-            return AssignmentExpression(var, self.expression())
-        else:
-            return self.expression___(var)
-
-    # expression''' -> term' additive-expression' simple-expression
-    def expression___(self, lhs: Expression) -> Expression:
-        lhs = self.term_(lhs)
-        lhs = self.additive_expression_(lhs)
-        return self.simple_expression(lhs)
+            return self.at(AssignmentExpression(lhs, self.expression()), start)
+        return self.binary_expression(lhs, 0)
+
+    # simple-expression -> factor binop factor binop ... factor, grouped by OPERATORS precedence
+    def binary_expression(self, lhs: Expression, min_precedence: int) -> Expression:
+        while True:
+            op = self.next().val
+            operator = OPERATORS.get(op)
+            if operator is None or operator.precedence < min_precedence:
+                return lhs
+            start = self.cursor.index
+            self.cursor.advance()
+            rhs = self.factor()
+            following = OPERATORS.get(self.next().val)
+            while following is not None and following.precedence > operator.precedence:
+                rhs = self.binary_expression(rhs, following.precedence)
+                following = OPERATORS.get(self.next().val)
+            lhs = self.at(BinaryOp(op, lhs, rhs), start)
+            if not operator.associative and following is not None and (
+                    following.precedence == operator.precedence):
+                raise self.error(self.next(), self.cursor.index)
 
     # var -> ID var'
     def var(self) -> Variable:
-        return Variable(self.id(), self.var_())
+        start = self.cursor.index
+        return self.at(Variable(self.id(), self.var_()), start)
 
     # var' -> [ expression ] | ϵ
     def var_(self) -> Optional[Expression]:
@@ -264,52 +494,6 @@ class CMinusParser:
             return expression
         return None
 
-    # simple-expression -> relop additive-expression | ϵ
-    def simple_expression(self, lhs: Expression) -> Expression:
-        if self.next().type == 'RELOP':
-            op = self.relop()
-            rhs = self.additive_expression()
-            return BinaryOp(op, lhs, rhs)
-        return lhs
-
-    # relop -> <= | < | > | >= | == | !=
-    def relop(self) -> str:
-        return self.union(['<=', '<', '>', '>=', '==', '!='])
-
-    # additive-expression -> term additive-expression'
-    def additive_expression(self) -> Expression:
-        return self.additive_expression_(self.term())
-
-    # additive-expression' -> addop term additive-expression' | ϵ
-    def additive_expression_(self, lhs: Expression) -> Expression:
-        if self.next().val in ['+', '-']:
-            op = self.addop()
-            rhs = self.term()
-            node = BinaryOp(op, lhs, rhs)
-            return self.additive_expression_(node)
-        return lhs
-
-    # addop -> + | -
-    def addop(self) -> str:
-        return self.union(['+', '-'])
-
-    # term -> factor term'
-    def term(self) -> Expression:
-        return self.term_(self.factor())
-
-    # term' -> mulop factor term' | ϵ
-    def term_(self, lhs: Expression) -> Expression:
-        if self.next().val in ['*', '/']:
-            op = self.mulop()
-            rhs = self.factor()
-            node = BinaryOp(op, lhs, rhs)
-            return self.term_(node)
-        return lhs
-
-    # mulop -> * | /
-    def mulop(self) -> str:
-        return self.union(['*', '/'])
-
     # factor -> ( expression ) | ID ( args ) | ID var' | NUM
     def factor(self) -> Expression:
         if self.next().val == '(':
@@ -318,35 +502,122 @@ class CMinusParser:
             self.accept_val(')')
             return expression
         elif self.next().type == 'ID':
+            start = self.cursor.index
             name = self.id()
             if self.next().val == '(':
                 self.accept_val('(')
                 args = self.args()
                 self.accept_val(')')
-                return Call(name, args)
+                return self.at(Call(name, args), start)
             else:
                 index = self.var_()
-                return Variable(name, index)
+                return self.at(Variable(name, index), start)
         else:
             return self.number()
 
     # call -> ID ( args )
     def call(self) -> Call:
+        start = self.cursor.index
         name = self.id()
         self.accept_val('(')
         args = self.args()
         self.accept_val(')')
-        return Call(name, args)
+        return self.at(Call(name, args), start)
 
     # args -> expression arg-list' | ϵ
     def args(self) -> List[Expression]:
-        if self.next().val == '(' or self.next().type in ['ID', 'INTEGER', 'FLOAT']:
+        if self.lookahead() in FIRST['expression']:
             return self.arg_list([self.expression()])
         return []
 
     # arg-list' -> , expression arg-list' | ϵ
     def arg_list(self, expressions: List[Expression]) -> List[Expression]:
-        if self.next().val == ',':
+        while self.next().val == ',':
             self.accept_val(',')
-            return self.arg_list(expressions + [self.expression()])
+            expressions.append(self.expression())
         return expressions
+
+
+class LLParser:
+    # Table-driven parser for the same language, built from the grammar in grammar.py. Productions
+    # are expanded on an explicit stack, so nesting depth is not limited by Python's recursion
+    # limit. A production stays on the stack below its symbols and builds its value once they have
+    # all been parsed
+
+    def __init__(self, tokens: Iterable[Token], grammar: Grammar = CMINUS):
+        self.tokens = tokens
+        self.grammar = grammar
+        self.index = 0  # index of the lookahead token
+
+    def error(self, token: Optional[Token]) -> ParseError:
+        return ParseError('unexpected token', token, position(self.tokens, self.index))
+
+    def parse(self) -> Program:
+        table, value_types = self.grammar.table, VALUE_TYPES
+        tokens = iter(self.tokens)
+        stack = [END, self.grammar.start]
+        values = []
+        token = next(tokens, None)
+        lookahead = END if token is None else token.type if token.type in value_types else token.val
+        while stack:
+            top = stack.pop()
+            if top.__class__ is Production:
+                n = len(top.body)
+                if n:
+                    args = values[-n:]
+                    del values[-n:]
+                    values.append(top.action(*args))
+                else:
+                    values.append(top.action())
+            elif top in table:
+                production = table[top].get(lookahead)
+                if production is None:
+                    raise self.error(token)
+                stack.append(production)
+                stack.extend(reversed(production.body))
+            elif top == lookahead:
+                if top != END:
+                    values.append(token.val)
+                    self.index += 1
+                    token = next(tokens, None)
+                    lookahead = END if token is None else token.type if token.type in value_types else token.val
+            else:
+                raise self.error(token)
+        return values[0]
+
+
+class Recognizer:
+    # Checks that tokens form a valid program without building a tree, for when only a yes or no is
+    # needed. It follows the same LL(1) table as LLParser, but productions push their body straight
+    # onto the stack, so nothing is allocated per token beyond the stack itself
+
+    def __init__(self, tokens: Iterable[Token], grammar: Grammar = CMINUS):
+        self.tokens = tokens
+        self.grammar = grammar
+        self.expansions = {head: {symbol: p.body[::-1] for symbol, p in row.items()}
+                           for head, row in grammar.table.items()}
+
+    def lookaheads(self) -> Iterable[str]:
+        # With a token stream, each distinct token is turned into a terminal only once
+        if isinstance(self.tokens, TokenStream):
+            terminals = [terminal(token) for token in self.tokens.table]
+            return map(terminals.__getitem__, self.tokens.values)
+        return map(terminal, self.tokens)
+
+    def recognize(self) -> bool:
+        expansions = self.expansions
+        stack = [END, self.grammar.start]
+        pop, extend = stack.pop, stack.extend
+        for lookahead in chain(self.lookaheads(), [END]):
+            top = pop()
+            row = expansions.get(top)
+            while row is not None:
+                body = row.get(lookahead)
+                if body is None:
+                    return False
+                extend(body)
+                top = pop()
+                row = expansions.get(top)
+            if top != lookahead:
+                return False
+        return not stack
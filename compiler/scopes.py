@@ -0,0 +1,39 @@
+from typing import Dict, List, Tuple
+
+
+class SymbolTable:
+    # Nested scopes kept as one map from each name to the stack of its bindings, innermost last, with
+    # the depth of the scope that made each binding. Each scope logs the names it declared, so that
+    # leaving it undoes just those. Lookups and declarations take constant time, whatever the depth
+
+    def __init__(self):
+        self.bindings: Dict[str, List[Tuple[int, object]]] = {}
+        self.scopes: List[List[str]] = [[]]  # names declared in each open scope, outermost first
+
+    @property
+    def depth(self) -> int:
+        return len(self.scopes) - 1
+
+    def declared(self, name: str) -> bool:
+        # Whether the innermost scope declares name
+        stack = self.bindings.get(name)
+        return bool(stack) and stack[-1][0] == self.depth
+
+    def insert(self, name: str, binding):
+        self.bindings.setdefault(name, []).append((self.depth, binding))
+        self.scopes[-1].append(name)
+
+    def lookup(self, name: str):
+        stack = self.bindings.get(name)
+        return stack[-1][1] if stack else None
+
+    def enter(self):
+        self.scopes.append([])
+
+    def exit(self):
+        bindings = self.bindings
+        for name in self.scopes.pop():
+            stack = bindings[name]
+            stack.pop()
+            if not stack:
+                del bindings[name]
@@ -1,6 +1,22 @@
-from typing import Dict
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, Iterable
 
+from .arena import *
 from .astnodes import *
+from .diagnostics import Diagnostic
+from .lexer import Token
+from .parser import position
+from .scopes import SymbolTable
+from .visitor import Visitor, visits
+
+RELOPS = ['<=', '<', '>', '>=', '==', '!=']
+
+# The type of an expression with an error in it, when recovering from errors. Rules are not applied
+# to expressions of type None, so that an error is reported once, rather than again by each
+# expression it is part of
+ERROR = (None, False)
+INTEGER_TYPE, FLOAT_TYPE = (Type.INTEGER, False), (Type.FLOAT, False)
 
 
 def analyze(program: Optional[Program]) -> Optional[Program]:
@@ -12,198 +28,539 @@ def analyze(program: Optional[Program]) -> Optional[Program]:
     return program
 
 
-class SemanticAnalyzer:
+def analyze_with_diagnostics(program: Program, tokens: Optional[Iterable[Token]] = None) -> List[Diagnostic]:
+    # Checks the whole program and returns all of the errors in it, in the order they were found.
+    # They are placed at the positions of the tokens the program was parsed from, if given
+    analyzer = SemanticAnalyzer(recover=True)
+    analyzer.visit_program(program)
+    return place(analyzer.diagnostics, tokens)
+
+
+def analyze_parallel(program: Program, tokens: Optional[Iterable[Token]] = None,
+                     workers: Optional[int] = None) -> List[Diagnostic]:
+    # The same as analyze_with_diagnostics, with the bodies of the functions checked by a pool of
+    # worker processes once the global declarations have been. With one worker, they are checked here.
+    # The workers check copies of the tree, so its expressions aren't annotated
+    analyzer = FunctionAnalyzer(program)
+    functions = [i for i, d in enumerate(program.declarations) if isinstance(d, FunDeclaration)]
+    workers = workers or os.cpu_count() or 1
+    if workers == 1:
+        bodies = list(map(analyzer.check_function, functions))
+    else:
+        with ProcessPoolExecutor(workers, initializer=_start_worker, initargs=(program,)) as executor:
+            chunk = max(1, len(functions) // (4 * workers))
+            bodies = list(executor.map(_check_function, functions, chunksize=chunk))
+
+    # Errors are put in the order a single pass finds them in: by declaration, then the last check
+    diagnostics, bodies = [], iter(bodies)
+    for i, declaration in enumerate(program.declarations):
+        diagnostics.extend(analyzer.signatures[i])
+        if isinstance(declaration, FunDeclaration):
+            diagnostics.extend(next(bodies))
+    analyzer.diagnostics = diagnostics
+    analyzer.check_main(program)
+    return place(analyzer.diagnostics, tokens)
+
+
+def place(diagnostics: List[Diagnostic], tokens: Optional[Iterable[Token]]) -> List[Diagnostic]:
+    # Replaces the token indexes of the diagnostics with positions in the tokens, if given
+    if tokens is None:
+        return diagnostics
+    return [Diagnostic(at if at is None else position(tokens, at), message) for at, message in diagnostics]
+
+
+def analyze_arena(arena: Optional[Arena]) -> Optional[Arena]:
+    try:
+        if arena is not None:
+            ArenaAnalyzer(arena).visit_program(arena.root)
+    except ValueError:
+        return None
+    return arena
+
+
+# Type rules shared by the analyzers of the object tree and of the arena
+
+def check_var_declaration(kind: Type, name: str):
+    # Variable declarations can only use type specifier int and float
+    if kind not in [Type.INTEGER, Type.FLOAT]:
+        raise ValueError(f'Declaration {name} cannot have void type')
+
+
+def check_array_size(size: Union[int, float]):
+    # Array indexes must be of type int
+    if isinstance(size, float):
+        raise ValueError(f'Invalid array size type: {size}')
+
+
+def check_param(kind: Type, name: str):
+    # Parameter types can only be int or float
+    if kind == Type.VOID:
+        raise ValueError(f'Named parameter {name} cannot be of type void')
+
+
+def check_return(kind: Optional[Type], is_array: bool, function_type: Type):
+    # kind is None for a bare return
+    if kind is None:
+        kind = Type.VOID
+    else:
+        # Can only return simple structures (no arrays)
+        if is_array:
+            raise ValueError(f'An array cannot be returned from a function')
+        # Cannot use void in a return expression
+        if kind == Type.VOID:
+            raise ValueError(f'A void function cannot be used in a return expression')
+    # Return type must match function type
+    if kind is not function_type:
+        raise ValueError(f'Return type does not match function type {function_type}')
+
+
+def binary_type(op: str, l_type: Type, l_array: bool, r_type: Type, r_array: bool) -> Type:
+    # Cannot perform binary operations on arrays
+    if l_array or r_array:
+        raise ValueError(f'Cannot perform {op} on an array')
+    # Cannot use void in an arithmetic expression
+    if l_type == Type.VOID or r_type == Type.VOID:
+        raise ValueError(f'Cannot use void types in an arithmetic expression')
+    # The left and right sides of the argument should be the same
+    elif l_type is not r_type:
+        raise ValueError('Mixed mode arithmetic is not supported')
+    if op in RELOPS:
+        return Type.INTEGER  # booleans are ints
+    return l_type
+
+
+def assignment_type(l_type: Type, l_array: bool, r_type: Type, r_array: bool) -> Type:
+    # Cannot perform binary operations on arrays
+    if l_array or r_array:
+        raise ValueError(f'Cannot perform assignment on an array')
+    # The left and right sides of the argument should be the same
+    elif l_type is not r_type:
+        raise ValueError(f'Cannot assign an {r_type} to an {l_type}')
+    return l_type
+
 
-    def __init__(self):
-        self.stack: List[Dict[str, ParamFormal]] = []
-        self.scope: Dict[str, ParamFormal] = {}
-        self.functions: Dict[str, FunDeclaration] = {}
-        self.queue: List[ParamFormal] = []
+class SemanticAnalyzer(Visitor):
+    # Scopes map variable names to their bindings, which are whatever the analyzer needs to know about
+    # a variable: its VarDeclaration or ParamFormal here. Analysis annotates each expression with its
+    # type (resolved_type), and each Variable and Call with the declaration it refers to (binding)
 
-    def insert_var(self, declaration: ParamFormal):
+    def __init__(self, recover: bool = False):
+        self.symbols = SymbolTable()
+        self.functions: Dict[str, object] = {}
+        self.queue: List[Tuple[str, object]] = []
+        # In recovery mode, errors are recorded at the position of the node they were found at and
+        # analysis goes on, with ERROR as the type of expressions that have one
+        self.recover = recover
+        self.diagnostics: List[Diagnostic] = []
+
+    def report(self, error: ValueError, node):
+        if not self.recover:
+            raise error
+        self.diagnostics.append(Diagnostic(getattr(node, 'position', None), str(error)))
+
+    def check(self, node, rule: Callable, *args):
+        # Applies a rule that raises ValueError when it is broken, reporting the error at node. Returns
+        # what the rule does, or None if it is broken
+        try:
+            return rule(*args)
+        except ValueError as error:
+            self.report(error, node)
+            return None
+
+    def insert_var(self, name: str, binding):
         # All variables may be declared only once per scope
-        if declaration.name in self.scope:
-            raise ValueError(f'Variable {declaration.name} has already been declared')
-        self.scope[declaration.name] = declaration
+        if self.symbols.declared(name):
+            raise ValueError(f'Variable {name} has already been declared')
+        self.symbols.insert(name, binding)
 
-    def insert_fun(self, declaration: FunDeclaration):
+    def insert_fun(self, name: str, binding):
         # All variables may be declared only once
-        if declaration.name in self.functions:
-            raise ValueError(f'Function {declaration.name} has already been declared')
+        if name in self.functions:
+            raise ValueError(f'Function {name} has already been declared')
 
-        self.functions[declaration.name] = declaration
+        self.functions[name] = binding
 
-    def lookup_var(self, name: str) -> Optional[ParamFormal]:
-        for scope in reversed(self.stack + [self.scope]):
-            declaration = scope.get(name)
-            if declaration is not None:
-                return declaration
-        return None
+    def lookup_var(self, name: str):
+        return self.symbols.lookup(name)
 
-    def lookup_fun(self, name: str) -> Optional[FunDeclaration]:
+    def lookup_fun(self, name: str):
         return self.functions.get(name)
 
-    def queue_var(self, declaration: ParamFormal):
-        self.queue.append(declaration)
+    def queue_var(self, name: str, binding):
+        self.queue.append((name, binding))
 
     def add_scope(self):
-        self.stack.append(self.scope)
-        self.scope = {}
+        self.symbols.enter()
 
         # Add any variable declarations that were queued
-        for var in self.queue:
-            self.insert_var(var)
+        for name, binding in self.queue:
+            self.check(binding, self.insert_var, name, binding)
         self.queue = []
 
     def remove_scope(self):
-        self.scope = self.stack.pop()
+        self.symbols.exit()
 
     def visit_program(self, program: Program):
         for declaration in program.declarations:
-            self.visit_declaration(declaration)
+            self.visit(declaration)
+        self.check_main(program)
 
+    def check_main(self, program: Program):
         # The last declaration should be "void main(void)"
         d = program.declarations[-1]
         if not (isinstance(d, FunDeclaration) and d.name == "main" and d.type == Type.VOID and not d.params):
-            raise ValueError('Last declaration should be void main(void)')
+            self.report(ValueError('Last declaration should be void main(void)'), d)
 
     def visit_declaration(self, declaration: Declaration):
-        if isinstance(declaration, VarDeclaration):
-            self.visit_var_declaration(declaration)
-        elif isinstance(declaration, FunDeclaration):
-            self.visit_fun_declaration(declaration)
-        else:
-            raise Exception('Unknown declaration type')
+        self.visit(declaration)
 
+    @visits(VarDeclaration)
     def visit_var_declaration(self, declaration: VarDeclaration):
-        self.insert_var(ParamFormal(declaration.type, declaration.name, declaration.is_array()))
-
-        # Variable declarations can only use type specifier int and float
-        if declaration.type not in [Type.INTEGER, Type.FLOAT]:
-            raise ValueError(f'Declaration {declaration.name} cannot have void type')
+        self.check(declaration, self.insert_var, declaration.name, declaration)
+        self.check(declaration, check_var_declaration, declaration.type, declaration.name)
         if declaration.array is not None:
-            self.visit_array(declaration.array)
+            self.check(declaration, self.visit_array, declaration.array)
 
+    @visits(FunDeclaration)
     def visit_fun_declaration(self, declaration: FunDeclaration):
-        self.insert_fun(declaration)
+        self.check(declaration, self.insert_fun, declaration.name, declaration)
+        self.visit_fun_body(declaration)
+
+    def visit_fun_body(self, declaration: FunDeclaration):
         for param in declaration.params:
             self.visit_param(param)
 
         # Functions not declared void must return values of the correct type
         has_return = self.visit_compound_statement(declaration.body, declaration.type)
         if declaration.type != Type.VOID and not has_return:
-            raise ValueError(f'{declaration.type} function must have at least one return')
+            self.report(ValueError(f'{declaration.type} function must have at least one return'), declaration)
 
     def visit_param(self, param: ParamFormal):
-        self.queue_var(param)
-        # Parameter types can only be int or float
-        if param.type == Type.VOID:
-            raise ValueError(f'Named parameter {param.name} cannot be of type void')
+        self.queue_var(param.name, param)
+        self.check(param, check_param, param.type, param.name)
 
+    @visits(CompoundStatement)
     def visit_compound_statement(self, statement: CompoundStatement, function_type: Type) -> bool:
         has_return = False
         self.add_scope()
         for var in statement.vars:
             self.visit_var_declaration(var)
         for statement in statement.body:
-            has_return |= self.visit_statement(statement, function_type)
+            has_return |= self.visit(statement, function_type)
         self.remove_scope()
         return has_return
 
     def visit_statement(self, statement: Statement, function_type: Type) -> bool:
-        if isinstance(statement, ExpressionStatement):
-            if statement.expression is not None:
-                self.visit_expression(statement.expression)
+        return self.visit(statement, function_type)
+
+    @visits(ExpressionStatement)
+    def visit_expression_statement(self, statement: ExpressionStatement, function_type: Type) -> bool:
+        if statement.expression is not None:
+            self.visit(statement.expression)
+        return False
+
+    @visits(IfStatement)
+    def visit_if_statement(self, statement: IfStatement, function_type: Type) -> bool:
+        # Condition in an if statement must be an integer
+        cond = self.visit(statement.cond)
+        if cond != INTEGER_TYPE and cond != ERROR:
+            self.report(ValueError('The condition in an if statement must be an integer'), statement)
+        has_return = self.visit(statement.true, function_type)
+        if statement.false is not None:
+            has_return |= self.visit(statement.false, function_type)
+        return has_return
+
+    @visits(WhileStatement)
+    def visit_while_statement(self, statement: WhileStatement, function_type: Type) -> bool:
+        # Condition in a while statement must be an integer
+        cond = self.visit(statement.cond)
+        if cond != INTEGER_TYPE and cond != ERROR:
+            self.report(ValueError('The condition in a while statement must be an integer'), statement)
+        return self.visit(statement.body, function_type)
+
+    @visits(ReturnStatement)
+    def visit_return_statement(self, statement: ReturnStatement, function_type: Type) -> bool:
+        kind, is_array = None, False
+        if statement.expression is not None:
+            kind, is_array = self.visit(statement.expression)
+            if kind is None:
+                return True  # the expression has an error
+        self.check(statement, check_return, kind, is_array, function_type)
+        return True
+
+    def visit_expression(self, expr: Expression) -> (Type, bool):
+        return self.visit(expr)
+
+    @visits(BinaryOp)
+    def visit_binary_op(self, expr: BinaryOp) -> (Type, bool):
+        l_type, l_array = self.visit(expr.lhs)
+        r_type, r_array = self.visit(expr.rhs)
+        if l_type is None or r_type is None:
+            expr.resolved_type = ERROR
+        else:
+            kind = self.check(expr, binary_type, expr.op, l_type, l_array, r_type, r_array)
+            expr.resolved_type = kind, False  # not an array
+        return expr.resolved_type
+
+    @visits(AssignmentExpression)
+    def visit_assignment_expression(self, expr: AssignmentExpression) -> (Type, bool):
+        l_type, l_array = self.visit_variable(expr.var)
+        r_type, r_array = self.visit(expr.value)
+        if l_type is None or r_type is None:
+            expr.resolved_type = ERROR
+        else:
+            kind = self.check(expr, assignment_type, l_type, l_array, r_type, r_array)
+            expr.resolved_type = kind, False  # not an array
+        return expr.resolved_type
+
+    @visits(Call)
+    def visit_call(self, expr: Call) -> (Type, bool):
+        function = expr.binding = self.lookup_fun(expr.name)
+        # Functions must be declared before they are used
+        if function is None:
+            self.report(ValueError(f'Function {expr.name} has not been defined'), expr)
+            for e in expr.args:
+                self.visit(e)
+            expr.resolved_type = ERROR
+            return ERROR
+        # Function parameters and arguments must agree in number and type
+        expected = [(p.type, p.is_array) for p in function.params]
+        actual = [self.visit(e) for e in expr.args]
+        if expected != actual and ERROR not in actual:
+            self.report(ValueError(f'Parameter mismatch when calling function {expr.name}'), expr)
+        expr.resolved_type = function.type, False
+        return expr.resolved_type
+
+    @visits(Number)
+    def visit_number(self, expr: Number) -> (Type, bool):
+        expr.resolved_type = INTEGER_TYPE if expr.value.__class__ is int else FLOAT_TYPE
+        return expr.resolved_type
+
+    @visits(Variable)
+    def visit_variable(self, var: Variable) -> (Type, bool):
+        variable = var.binding = self.lookup_var(var.name)
+        # All variables must be declared in scope before they are used
+        if variable is None:
+            self.report(ValueError(f'Variable {var.name} has not been defined'), var)
+            if var.index is not None:
+                self.visit(var.index)
+            var.resolved_type = ERROR
+        elif variable.type == Type.VOID:
+            var.resolved_type = ERROR  # its declaration has an error
+        # Array indexes must be of type int
+        elif var.index is not None:
+            index = self.visit(var.index)
+            if index != INTEGER_TYPE and index != ERROR:
+                self.report(ValueError('Array indexes must be of type int'), var)
+            var.resolved_type = variable.type, False  # not an array
+        else:
+            # A raw variable, declared by a VarDeclaration or a ParamFormal
+            is_array = variable.is_array if variable.__class__ is ParamFormal else variable.array is not None
+            var.resolved_type = variable.type, is_array
+        return var.resolved_type
+
+    @staticmethod
+    def visit_array(array: Number):
+        check_array_size(array.value)
+
+
+class FunctionAnalyzer(SemanticAnalyzer):
+    # Checks the body of each function of a program on its own. The global declarations are checked
+    # first, keeping the errors in each, and where each global variable and function was declared,
+    # so that a body sees only those declared before it, as it would in a single pass
+
+    def __init__(self, program: Program):
+        super().__init__(recover=True)
+        self.program = program
+        self.index = 0  # of the declaration being checked
+        self.variables: Dict[str, Tuple[int, object]] = {}  # first declaration of each name
+        self.declared: Dict[str, Tuple[int, FunDeclaration]] = {}
+        self.signatures: List[List[Diagnostic]] = []
+        for i, declaration in enumerate(program.declarations):
+            start = len(self.diagnostics)
+            if isinstance(declaration, FunDeclaration):
+                self.check(declaration, self.insert_fun, declaration.name, declaration)
+                self.declared.setdefault(declaration.name, (i, declaration))
+            else:
+                self.visit(declaration)
+                self.variables.setdefault(declaration.name, (i, self.symbols.lookup(declaration.name)))
+            self.signatures.append(self.diagnostics[start:])
+        self.symbols = SymbolTable()  # the global variables are looked up by where they were declared
+
+    def check_function(self, index: int) -> List[Diagnostic]:
+        self.index, self.diagnostics = index, []
+        self.visit_fun_body(self.program.declarations[index])
+        return self.diagnostics
+
+    def lookup_var(self, name: str):
+        binding = self.symbols.lookup(name)
+        if binding is None:
+            declared = self.variables.get(name)
+            if declared is not None and declared[0] < self.index:
+                return declared[1]
+        return binding
+
+    def lookup_fun(self, name: str):
+        # A function can call itself, so it is declared before its body
+        declared = self.declared.get(name)
+        return declared[1] if declared is not None and declared[0] <= self.index else None
+
+
+_worker: Optional[FunctionAnalyzer] = None
+
+
+def _start_worker(program: Program):
+    global _worker
+    _worker = FunctionAnalyzer(program)
+
+
+def _check_function(index: int) -> List[Diagnostic]:
+    return _worker.check_function(index)
+
+
+class ArenaAnalyzer(SemanticAnalyzer):
+    # The same checks over a tree kept in an arena. Types are passed around as the type value, with
+    # ARRAY set for arrays, and variables are bound to the same, so no objects are made per node
+
+    def __init__(self, arena: Arena):
+        super().__init__()
+        self.arena = arena
+
+    def visit_program(self, program: int):
+        arena = self.arena
+        declarations = arena.children(program)
+        for i in declarations:
+            self.visit_declaration(arena.links[i])
+
+        # The last declaration should be "void main(void)"
+        d = arena.links[declarations[-1]]
+        if not (arena.kinds[d] == FUN_DECLARATION and arena.name(d) == "main" and
+                arena.types[d] == VOID and not arena.counts[arena.child(d, 0)]):
+            raise ValueError('Last declaration should be void main(void)')
+
+    def visit_declaration(self, declaration: int):
+        kind = self.arena.kinds[declaration]
+        if kind == VAR_DECLARATION:
+            self.visit_var_declaration(declaration)
+        elif kind == FUN_DECLARATION:
+            self.visit_fun_declaration(declaration)
+        else:
+            raise Exception('Unknown declaration type')
+
+    def visit_var_declaration(self, declaration: int):
+        arena = self.arena
+        kind, name, array = arena.types[declaration], arena.name(declaration), arena.child(declaration, 0)
+        self.insert_var(name, kind | ARRAY if array >= 0 else kind)
+        check_var_declaration(TYPES[kind], name)
+        if array >= 0:
+            check_array_size(arena.numbers[arena.values[array]])
+
+    def visit_fun_declaration(self, declaration: int):
+        arena = self.arena
+        self.insert_fun(arena.name(declaration), declaration)
+        for i in arena.children(arena.child(declaration, 0)):
+            self.visit_param(arena.links[i])
+
+        # Functions not declared void must return values of the correct type
+        kind = arena.types[declaration]
+        has_return = self.visit_compound_statement(arena.child(declaration, 1), kind)
+        if kind != VOID and not has_return:
+            raise ValueError(f'{TYPES[kind]} function must have at least one return')
+
+    def visit_param(self, param: int):
+        kind, name = self.arena.types[param], self.arena.name(param)
+        self.queue_var(name, kind)
+        check_param(TYPES[kind & ~ARRAY], name)
+
+    def visit_compound_statement(self, statement: int, function_type: int) -> bool:
+        arena = self.arena
+        has_return = False
+        self.add_scope()
+        for i in arena.children(arena.child(statement, 0)):
+            self.visit_var_declaration(arena.links[i])
+        for i in arena.children(arena.child(statement, 1)):
+            has_return |= self.visit_statement(arena.links[i], function_type)
+        self.remove_scope()
+        return has_return
+
+    def visit_statement(self, statement: int, function_type: int) -> bool:
+        arena = self.arena
+        kind = arena.kinds[statement]
+        if kind == EXPRESSION_STATEMENT:
+            expression = arena.child(statement, 0)
+            if expression >= 0:
+                self.visit_expression(expression)
             return False
-        elif isinstance(statement, CompoundStatement):
+        elif kind == COMPOUND:
             return self.visit_compound_statement(statement, function_type)
-        elif isinstance(statement, IfStatement):
+        elif kind == IF:
             # Condition in an if statement must be an integer
-            if self.visit_expression(statement.cond) != (Type.INTEGER, False):
+            if self.visit_expression(arena.child(statement, 0)) != INTEGER:
                 raise ValueError('The condition in an if statement must be an integer')
-            has_return = self.visit_statement(statement.true, function_type)
-            if statement.false is not None:
-                has_return |= self.visit_statement(statement.false, function_type)
+            has_return = self.visit_statement(arena.child(statement, 1), function_type)
+            if arena.child(statement, 2) >= 0:
+                has_return |= self.visit_statement(arena.child(statement, 2), function_type)
             return has_return
-        elif isinstance(statement, WhileStatement):
+        elif kind == WHILE:
             # Condition in a while statement must be an integer
-            if self.visit_expression(statement.cond) != (Type.INTEGER, False):
+            if self.visit_expression(arena.child(statement, 0)) != INTEGER:
                 raise ValueError('The condition in a while statement must be an integer')
-            return self.visit_statement(statement.body, function_type)
-        elif isinstance(statement, ReturnStatement):
-            kind = Type.VOID
-            if statement.expression is not None:
-                kind, is_array = self.visit_expression(statement.expression)
-                # Can only return simple structures (no arrays)
-                if is_array:
-                    raise ValueError(f'An array cannot be returned from a function')
-                # Cannot use void in a return expression
-                if kind == Type.VOID:
-                    raise ValueError(f'A void function cannot be used in a return expression')
-            # Return type must match function type
-            if kind is not function_type:
-                raise ValueError(f'Return type does not match function type {function_type}')
+            return self.visit_statement(arena.child(statement, 1), function_type)
+        elif kind == RETURN:
+            expression = arena.child(statement, 0)
+            if expression >= 0:
+                kind = self.visit_expression(expression)
+                check_return(TYPES[kind & ~ARRAY], kind & ARRAY, TYPES[function_type])
+            else:
+                check_return(None, False, TYPES[function_type])
             return True
         raise Exception('Unknown statement type')
 
-    def visit_expression(self, expr: Expression) -> (Type, bool):
-        if isinstance(expr, BinaryOp):
-            l_type, l_array = self.visit_expression(expr.lhs)
-            r_type, r_array = self.visit_expression(expr.rhs)
-            # Cannot perform binary operations on arrays
-            if l_array or r_array:
-                raise ValueError(f'Cannot perform {expr.op} on an array')
-            # Cannot use void in an arithmetic expression
-            if l_type == Type.VOID or r_type == Type.VOID:
-                raise ValueError(f'Cannot use void types in an arithmetic expression')
-            # The left and right sides of the argument should be the same
-            elif l_type is not r_type:
-                raise ValueError('Mixed mode arithmetic is not supported')
-            if expr.op in ['<=', '<', '>', '>=', '==', '!=']:
-                return Type.INTEGER, False  # booleans are ints
-            else:
-                return l_type, False  # not an array
-        elif isinstance(expr, AssignmentExpression):
-            l_type, l_array = self.visit_variable(expr.var)
-            r_type, r_array = self.visit_expression(expr.value)
-            # Cannot perform binary operations on arrays
-            if l_array or r_array:
-                raise ValueError(f'Cannot perform assignment on an array')
-            # The left and right sides of the argument should be the same
-            elif l_type is not r_type:
-                raise ValueError(f'Cannot assign an {r_type} to an {l_type}')
-            return l_type, False  # not an arrays
-        elif isinstance(expr, Variable):
+    def visit_expression(self, expr: int) -> int:
+        arena = self.arena
+        kind, first = arena.kinds[expr], arena.firsts[expr]
+        if kind == BINARY_OP:
+            lhs = self.visit_expression(arena.links[first])
+            rhs = self.visit_expression(arena.links[first + 1])
+            return binary_type(arena.name(expr), TYPES[lhs & ~ARRAY], lhs & ARRAY, TYPES[rhs & ~ARRAY],
+                               rhs & ARRAY).value
+        elif kind == ASSIGNMENT:
+            lhs = self.visit_variable(arena.links[first])
+            rhs = self.visit_expression(arena.links[first + 1])
+            return assignment_type(TYPES[lhs & ~ARRAY], lhs & ARRAY, TYPES[rhs & ~ARRAY], rhs & ARRAY).value
+        elif kind == VARIABLE:
             return self.visit_variable(expr)
-        elif isinstance(expr, Call):
-            function = self.lookup_fun(expr.name)
+        elif kind == CALL:
+            name = arena.name(expr)
+            function = self.lookup_fun(name)
             # Functions must be declared before they are used
             if function is None:
-                raise ValueError(f'Function {expr.name} has not been defined')
+                raise ValueError(f'Function {name} has not been defined')
             # Function parameters and arguments must agree in number and type
-            expected = [(p.type, p.is_array) for p in function.params]
-            actual = [self.visit_expression(e) for e in expr.args]
-            if expected != actual:
-                raise ValueError(f'Parameter mismatch when calling function {expr.name}')
-            return function.type, False
-        elif isinstance(expr, Number):
-            return Type.INTEGER if isinstance(expr.value, int) else Type.FLOAT, False
+            params, args = arena.children(arena.child(function, 0)), arena.children(expr)
+            mismatch = len(params) != len(args)
+            for param, arg in zip(params, args):
+                mismatch |= self.visit_expression(arena.links[arg]) != arena.types[arena.links[param]]
+            for arg in args[len(params):]:
+                self.visit_expression(arena.links[arg])
+            if mismatch:
+                raise ValueError(f'Parameter mismatch when calling function {name}')
+            return arena.types[function]
+        elif kind == NUMBER:
+            return INTEGER if isinstance(arena.numbers[arena.values[expr]], int) else FLOAT
         raise Exception('Unknown expression type')
 
-    def visit_variable(self, var: Variable) -> (Type, bool):
-        variable = self.lookup_var(var.name)
+    def visit_variable(self, var: int) -> int:
+        arena = self.arena
+        name = arena.name(var)
+        variable = self.lookup_var(name)
         # All variables must be declared in scope before they are used
         if variable is None:
-            raise ValueError(f'Variable {var.name} has not been defined')
+            raise ValueError(f'Variable {name} has not been defined')
         # Array indexes must be of type int
-        if var.index is not None:
-            if self.visit_expression(var.index) != (Type.INTEGER, False):
+        index = arena.links[arena.firsts[var]]
+        if index >= 0:
+            if self.visit_expression(index) != INTEGER:
                 raise ValueError('Array indexes must be of type int')
-            return variable.type, False  # not an array
-        return variable.type, variable.is_array  # raw variable
-
-    @staticmethod
-    def visit_array(array: Number):
-        # Array indexes must be of type int
-        if isinstance(array.value, float):
-            raise ValueError(f'Invalid array size type: {array.value}')
+            return variable & ~ARRAY  # not an array
+        return variable  # raw variable
@@ -0,0 +1,41 @@
+from typing import Callable, Dict
+
+
+def visits(*node_classes: type) -> Callable[[Callable], Callable]:
+    # Marks a visitor method as the one that handles nodes of the given classes
+    def mark(method: Callable) -> Callable:
+        method.visits = node_classes
+        return method
+    return mark
+
+
+class Visitor:
+    # Dispatches on the class of a node through a table built when the visitor class is created, so
+    # visiting a node costs one dictionary lookup whatever its class. Methods are registered with
+    # @visits. A node of a class without a method of its own is handled by the method of its closest
+    # base class. Methods are looked up by name, so a subclass can override them without @visits
+    dispatch: Dict[type, Callable] = {}
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        names = {}
+        for klass in reversed(cls.__mro__):
+            for name, attr in vars(klass).items():
+                for node_class in getattr(attr, 'visits', ()):
+                    names[node_class] = name
+        cls.dispatch = {node_class: getattr(cls, name) for node_class, name in names.items()}
+
+    def visit(self, node, *args):
+        method = self.dispatch.get(node.__class__)
+        if method is None:
+            method = self.resolve(node.__class__)
+        return method(self, node, *args)
+
+    @classmethod
+    def resolve(cls, node_class: type) -> Callable:
+        for klass in node_class.__mro__[1:]:
+            method = cls.dispatch.get(klass)
+            if method is not None:
+                cls.dispatch[node_class] = method
+                return method
+        raise Exception(f'Unknown node type {node_class.__name__}')
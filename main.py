@@ -1,15 +1,93 @@
+import os
 import sys
-from compiler.lexer import lex
-from compiler.parser import parse
-from compiler.semantics import analyze
-from compiler.codegen import to_ir
+from typing import Callable, Iterable, Iterator, List, Optional
 
+from compiler.arena import Arena
+from compiler.astnodes import Program
+from compiler.cache import Cache
+from compiler.dependencies import analyze_incremental
+from compiler.diagnostics import Diagnostic
+from compiler.lexer import TokenStream
+from compiler.parser import parse_with_diagnostics
+from compiler.codegen import Quadruple, stream_ir
+from compiler.ir import IR
+from compiler.optimize import optimize
 
-def display(num, line):
-    instruction, source1, source2, dest = line
-    print(f'{num + 1:<4}{instruction:10}{source1 or "":10}{source2 or "":10}{dest or ""}')
+
+def display(quads: Iterable[Quadruple], start: int = 0):
+    # Prints the quadruples numbered from the one after start
+    for num, (instruction, source1, source2, dest) in enumerate(quads, start + 1):
+        print(f'{num:<4}{instruction:10}{source1 or "":10}{source2 or "":10}{dest or ""}')
+
+
+def cached(cache: Optional[Cache], key: str, stage: str, compute: Callable):
+    value = cache.load(key, stage) if cache else None
+    if value is None:
+        value = compute()
+        if cache and value is not None:
+            cache.store(key, stage, value)
+    return value
+
+
+def compile_file(path: str, cache: Optional[Cache]) -> Optional[Iterable[IR]]:
+    # Returns the quadruples in one or more IRs, or None if the program has syntax or semantic errors,
+    # which are printed. The result of each stage is looked up in the cache before it is computed.
+    # Quadruples that aren't cached are generated as they are read, a declaration at a time, and cached
+    # once all are read
+    key = cache.file_key(path) if cache else None
+
+    def lex() -> TokenStream:
+        with open(path, 'rb') as f:
+            return TokenStream.from_file(f)
+
+    def report(diagnostics: List[Diagnostic]) -> bool:
+        for diagnostic in diagnostics:
+            print(f'{path}:{diagnostic}', file=sys.stderr)
+        return bool(diagnostics)
+
+    def generate(program: Program) -> Iterator[IR]:
+        irs = []
+        for ir in stream_ir(program):
+            if cache:
+                irs.append(ir)
+            yield ir
+        if cache:
+            cache.store(key, 'ir', IR.join(irs))
+
+    ir = cache.load(key, 'ir') if cache else None
+    if ir is not None:
+        return [ir]
+    tokens = cached(cache, key, 'tokens', lex)
+    arena = cache.load(key, 'ast') if cache else None
+    if arena is not None:
+        program = arena.to_tree()  # with the positions of the nodes, for the analysis
+    else:
+        program, diagnostics = parse_with_diagnostics(tokens)
+        if report(diagnostics):
+            return None
+        if cache:
+            cache.store(key, 'ast', Arena.from_tree(program))
+    # The dependency graph is kept by the path of the file, to be used once the file has changed
+    graph_key = cache.key(os.path.abspath(path)) if cache else None
+    graph = cache.load(graph_key, 'checks') if cache else None
+    diagnostics, graph = analyze_incremental(program, tokens, graph)
+    if cache:
+        cache.store(graph_key, 'checks', graph)
+    return None if report(diagnostics) else generate(program)
 
 
 if __name__ == '__main__':
-    with open(sys.argv[1], 'r') as f:
-        [display(i, line) for i, line in enumerate(to_ir(analyze(parse(lex(f.read())))))]
+    cache = None
+    if '--no-cache' not in sys.argv[2:]:
+        try:
+            cache = Cache()
+        except OSError:
+            pass  # compile without a cache if it can't be created
+    irs = compile_file(sys.argv[1], cache)
+    if irs is not None and '--optimize' in sys.argv[2:]:
+        irs = [optimize([quad for ir in irs for quad in ir])]  # over the whole program, as branches are moved
+    if irs is not None:
+        line = 0
+        for ir in irs:
+            display(ir, line)
+            line += len(ir)
@@ -0,0 +1,86 @@
+import compiler.lexer as lexer
+import compiler.parser as parser
+import compiler.semantics as semantics
+from compiler.arena import ARRAY, NUMBER, PARAM, Arena
+from compiler.astnodes import Type
+
+
+class TestArena(object):
+
+    sample = parser.parse(lexer.lex('''
+    int x[10]; float y;
+    int f(int a, float b[]) { int i; return a * (i + 2) - x[a] / 3; }
+    void g(void) { }
+    void main(void) {
+        int z;
+        while (z < 10) { z = z + f(z, y); if (z == 3) if (z) g(); else ; }
+        y = 1.5E-2 * y;
+        return;
+    }
+    '''))
+
+    @staticmethod
+    def error(analyzer, root):
+        try:
+            analyzer.visit_program(root)
+            return None
+        except ValueError as e:
+            return str(e)
+
+    def test_converts_to_and_from_tree(self):
+        arena = Arena.from_tree(self.sample)
+        assert arena.to_tree() == self.sample
+        assert arena.kinds[arena.root] == 0  # the program is added last
+
+    def test_keeps_positions(self):
+        tree = Arena.from_bytes(Arena.from_tree(self.sample).to_bytes()).to_tree()
+        f = tree.declarations[2]
+        assert f.position == self.sample.declarations[2].position
+        assert f.body.body[0].expression.position == self.sample.declarations[2].body.body[0].expression.position
+        assert f.body.annotation('position') is not None and f.params[0].annotation('position') is not None
+
+    def test_interns_names_and_numbers(self):
+        arena = Arena.from_tree(parser.parse(lexer.lex('int f(int a[]) { return a[1] + a[1]; } float x[1];')))
+        assert arena.strings.count('a') == 1
+        assert arena.numbers == [1]
+        assert [arena.types[h] for h in range(len(arena)) if arena.kinds[h] == PARAM] == [Type.INTEGER.value | ARRAY]
+        assert len([h for h in range(len(arena)) if arena.kinds[h] == NUMBER]) == 3
+
+    def test_keeps_ints_and_floats_apart(self):
+        arena = Arena.from_tree(parser.parse(lexer.lex('void main(void) { x = 1 + 1.0 + 1; }')))
+        assert arena.numbers == [1, 1.0] and isinstance(arena.numbers[1], float)
+
+    def test_serializes(self):
+        arena = Arena.from_tree(self.sample)
+        data = arena.to_bytes()
+        assert Arena.from_bytes(data).to_tree() == self.sample
+        assert Arena.from_bytes(Arena().to_bytes()).to_tree() is None
+        try:
+            Arena.from_bytes(b'x' + data[1:])
+            assert False
+        except ValueError:
+            pass
+
+    def test_serializes_floats_exactly(self):
+        tree = parser.parse(lexer.lex('void main(void) { x = 1.1E-7 * 0.1 + 3E+300; }'))
+        assert Arena.from_bytes(Arena.from_tree(tree).to_bytes()).to_tree() == tree
+
+    def test_reports_same_errors_as_object_analyzer(self):
+        for string in [
+            'int x; int x; void main(void) { }',
+            'int f(int a[]) { return a; } void main(void) { }',
+            'int f(int a, float b) { return a; } void main(void) { f(1, 2); }',
+            'int f(int a) { return a; } void main(void) { f(1, 2); }',
+            'void main(void) { int x[2.5]; }',
+            'void main(void) { int x; x = 1.5; }',
+            'void main(void) { int x[2]; if (x) ; }',
+            'void main(void) { return 1; }',
+            'float f(void) { } void main(void) { }',
+            'void main(void) { y = 1; }',
+            'void f(void a) { } void main(void) { }',
+            'void main(int x) { }',
+        ]:
+            tree = parser.parse(lexer.lex(string))
+            arena = Arena.from_tree(tree)
+            error = self.error(semantics.SemanticAnalyzer(), tree)
+            assert error is not None and self.error(semantics.ArenaAnalyzer(arena), arena.root) == error, string
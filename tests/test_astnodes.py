@@ -0,0 +1,42 @@
+from compiler.astnodes import *
+
+
+class TestNodes(object):
+
+    @staticmethod
+    def tree(value) -> Program:
+        return Program([FunDeclaration(Type.INTEGER, 'f', [ParamFormal(Type.INTEGER, 'a', True)], CompoundStatement(
+            [VarDeclaration(Type.FLOAT, 'x', None)],
+            [ReturnStatement(BinaryOp('+', Variable('a', Number(0)), Number(value)))],
+        ))])
+
+    def test_compares_structurally(self):
+        assert self.tree(1) == self.tree(1)
+        assert self.tree(1) != self.tree(2)
+        assert self.tree(1) != self.tree(1.0)
+        assert Number(1) != Variable('a', None)
+        assert VarDeclaration(Type.INTEGER, 'x', None) != VarDeclaration(Type.INTEGER, 'x', Number(3))
+
+    def test_compares_deeply_nested_trees(self):
+        a, b = Number(1), Number(1)
+        for _ in range(100000):
+            a, b = BinaryOp('-', a, Number(2)), BinaryOp('-', b, Number(2))
+        assert a == b
+
+    def test_has_no_instance_dict(self):
+        for node in [Number(1), Variable('a', None), VarDeclaration(Type.INTEGER, 'x', None), Program([])]:
+            assert not hasattr(node, '__dict__')
+
+    def test_lists_fields_through_base_classes(self):
+        assert FunDeclaration.fields == ('type', 'name', 'params', 'body')
+        assert VarDeclaration(Type.INTEGER, 'x', None).fields == ('type', 'name', 'array')
+
+    def test_reads_unset_annotations_as_none(self):
+        variable = Variable('a', None)
+        assert variable.annotation('binding') is None and variable.annotation('position') is None
+        variable.position = 3
+        assert variable.annotation('position') == 3
+
+    def test_repr(self):
+        assert repr(BinaryOp('*', Variable('a', None), Number(2))) == \
+            "BinaryOp(op='*', lhs=Variable(name='a', index=None), rhs=Number(value=2))"
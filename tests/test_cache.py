@@ -0,0 +1,128 @@
+import os
+
+import compiler.cache as cache
+import compiler.codegen as codegen
+import compiler.dependencies as dependencies
+import compiler.lexer as lexer
+import compiler.parser as parser
+import compiler.semantics as semantics
+import main
+from compiler.ir import IR
+
+
+class TestCache(object):
+
+    source = '''
+    int x[10];
+    int f(int a) { if (a > 0) return a * x[2]; else return 1.5E1 > 2.0; }
+    void main(void) { x[1] = f(3); /* done */ }
+    '''
+
+    @staticmethod
+    def compile(path, store):
+        irs = main.compile_file(str(path), store)
+        return None if irs is None else [quad for ir in irs for quad in ir]
+
+    def test_round_trips_every_stage(self, tmp_path):
+        store = cache.Cache(str(tmp_path))
+        key = store.key(self.source)
+        tokens = lexer.TokenStream.from_string(self.source)
+        program = parser.parse(tokens)
+        ir = codegen.CodeGenerator().program(semantics.analyze(program))
+        store.store(key, 'tokens', tokens)
+        store.store(key, 'ir', ir)
+        loaded = store.load(key, 'tokens')
+        assert list(loaded) == list(tokens) and list(loaded.offsets) == list(tokens.offsets)
+        assert list(loaded.lines) == list(tokens.lines) and list(loaded.columns) == list(tokens.columns)
+        loaded = store.load(key, 'ir')
+        assert list(loaded) == list(ir) and loaded.pool == ir.pool
+
+    def test_keys_by_source_and_version(self, monkeypatch):
+        key = cache.Cache.key(self.source)
+        assert cache.Cache.key(self.source.encode()) == key
+        assert cache.Cache.key(self.source + ' ') != key
+        monkeypatch.setattr(cache, '_version', 'another build')
+        assert cache.Cache.key(self.source) != key
+
+    def test_misses_unknown_entries(self, tmp_path):
+        assert cache.Cache(str(tmp_path)).load('0' * 64, 'ir') is None
+
+    def test_keys_files_by_contents(self, tmp_path):
+        path = tmp_path / 'program.cm'
+        path.write_text(self.source)
+        assert cache.Cache.file_key(str(path), chunk_size=7) == cache.Cache.key(self.source)
+
+    def test_drops_damaged_entries(self, tmp_path):
+        store = cache.Cache(str(tmp_path))
+        tokens = lexer.TokenStream.from_string(self.source)
+        ir = codegen.CodeGenerator().program(semantics.analyze(parser.parse(tokens)))
+        for stage, value in [('tokens', tokens), ('ir', ir)]:
+            store.store('a', stage, value)
+            with open(store.path('a', stage), 'rb') as f:
+                data = f.read()
+            for size in range(len(data)):
+                with open(store.path('a', stage), 'wb') as f:
+                    f.write(data[:size])
+                assert store.load('a', stage) is None, (stage, size)
+                assert not os.path.exists(store.path('a', stage))
+
+    def test_evicts_least_recently_used(self, tmp_path):
+        ir = IR([('alloc', '4', None, 'x' * 100)])
+        size = len(ir.to_bytes())
+        store = cache.Cache(str(tmp_path), max_size=3 * size)
+        for i, key in enumerate('abc'):
+            store.store(key, 'ir', ir)
+            os.utime(store.path(key, 'ir'), (i, i))
+        assert list(store.load('a', 'ir')) == list(ir)  # now the most recently used
+        store.store('d', 'ir', ir)
+        assert sorted(os.listdir(str(tmp_path))) == ['a.ir', 'c.ir', 'd.ir']
+
+    def test_compiles_from_cache(self, tmp_path, monkeypatch):
+        path = tmp_path / 'program.cm'
+        path.write_text(self.source)
+        store = cache.Cache(str(tmp_path / 'cache'))
+        ir = self.compile(path, store)
+        assert ir == codegen.to_ir(semantics.analyze(parser.parse(lexer.lex(self.source))))
+        assert len(os.listdir(store.directory)) == 4  # and the dependency graph
+
+        def fail(*args):
+            raise AssertionError('recompiled')
+        monkeypatch.setattr(main, 'parse_with_diagnostics', fail)
+        assert self.compile(path, store) == ir
+
+    def test_doesnt_cache_syntax_errors(self, tmp_path, capsys):
+        path = tmp_path / 'program.cm'
+        path.write_text('void main(void) { x = ; }')
+        store = cache.Cache(str(tmp_path / 'cache'))
+        for _ in range(2):
+            assert self.compile(path, store) is None
+            assert 'unexpected token' in capsys.readouterr().err
+        assert os.listdir(store.directory) == [f'{store.key(path.read_bytes())}.tokens']
+
+    def test_reports_semantic_errors_at_their_positions(self, tmp_path, capsys, monkeypatch):
+        path = tmp_path / 'program.cm'
+        path.write_text('void main(void) {\n  x = 1.5 + 1;\n}')
+        store = cache.Cache(str(tmp_path / 'cache'))
+        for run in range(2):  # the second time, from the cached tree
+            if run:
+                monkeypatch.setattr(main, 'parse_with_diagnostics', None)
+            assert self.compile(path, store) is None
+            assert capsys.readouterr().err.splitlines() == [
+                f'{path}:2:3: Variable x has not been defined',
+                f'{path}:2:11: Mixed mode arithmetic is not supported',
+            ]
+        assert not os.path.exists(store.path(store.key(path.read_bytes()), 'ir'))
+
+    def test_rechecks_only_changed_functions(self, tmp_path, monkeypatch):
+        path = tmp_path / 'program.cm'
+        path.write_text(self.source)
+        store = cache.Cache(str(tmp_path / 'cache'))
+        self.compile(path, store)
+        checked = []
+        check_function = dependencies.RecordingAnalyzer.check_function
+        monkeypatch.setattr(dependencies.RecordingAnalyzer, 'check_function',
+                            lambda self, i: checked.append(i) or check_function(self, i))
+        source = self.source.replace('x[1] = f(3)', 'x[1] = f(4)')
+        path.write_text(source)
+        assert self.compile(path, store) == codegen.to_ir(parser.parse(lexer.lex(source)))
+        assert checked == [2]  # main
@@ -2,6 +2,8 @@ import compiler.lexer as lexer
 import compiler.parser as parser
 import compiler.semantics as semantics
 import compiler.codegen as codegen
+from compiler.arena import Arena
+from compiler.ir import IR
 
 
 class TestCodegen(object):
@@ -10,7 +12,11 @@ class TestCodegen(object):
     def to_ir(string: str):
         analyzed = semantics.analyze(parser.parse(lexer.lex(string)))
         assert analyzed is not None  # make sure the program passes the semantic analysis
-        return codegen.to_ir(analyzed)
+        ir = codegen.to_ir(analyzed)
+        assert codegen.arena_to_ir(Arena.from_tree(analyzed)) == ir  # same from the arena
+        assert [quad for quads in codegen.stream_ir(analyzed) for quad in quads] == ir  # and streamed
+        assert list(IR.join(list(codegen.stream_ir(analyzed)))) == ir
+        return ir
 
     def test_sample_program_1(self):
         assert self.to_ir('''
@@ -155,3 +161,47 @@ class TestCodegen(object):
             ('assign', '_t18', None, '_t19'),
             ('end', 'func', 'main', None),
         ]
+
+    def test_nested_branches(self):
+        assert self.to_ir('''
+        void main(void) {
+          int x;
+          if (x) while (x < 3) { if (x == 1) x = 2; else x = x + 1; }
+          x = 0;
+        }
+        ''') == [
+            ('func', 'main', 'void', '0'),
+            ('alloc', '4', None, 'x'),
+            ('comp', 'x', '0', '_t0'),
+            ('brle', '_t0', None, '17'),
+            ('comp', 'x', '3', '_t1'),  # 5
+            ('brge', '_t1', None, '16'),
+            ('block', None, None, None),
+            ('comp', 'x', '1', '_t2'),
+            ('brne', '_t2', None, '12'),
+            ('assign', '2', None, 'x'),
+            ('br', None, None, '14'),
+            ('add', 'x', '1', '_t3'),  # 12
+            ('assign', '_t3', None, 'x'),
+            ('end', 'block', None, None),  # 14
+            ('br', None, None, '5'),
+            ('br', None, None, '17'),  # 16
+            ('assign', '0', None, 'x'),  # 17
+            ('end', 'func', 'main', None),
+        ]
+
+    def test_streams_a_declaration_at_a_time(self):
+        program = parser.parse(lexer.lex('int x; void main(void) { while (x) x = x - 1; } int y;'))
+        stream = codegen.stream_ir(program)
+        assert list(next(stream)) == [('alloc', '4', None, 'x')]
+        assert program.declarations.pop() is not None  # the rest isn't generated yet
+        assert list(next(stream)) == [
+            ('func', 'main', 'void', '0'),
+            ('comp', 'x', '0', '_t0'),  # 3
+            ('brle', '_t0', None, '8'),
+            ('sub', 'x', '1', '_t1'),
+            ('assign', '_t1', None, 'x'),
+            ('br', None, None, '3'),
+            ('end', 'func', 'main', None),  # 8
+        ]
+        assert list(stream) == []
@@ -0,0 +1,74 @@
+import compiler.lexer as lexer
+import compiler.parser as parser
+import compiler.semantics as semantics
+from compiler.astnodes import Type
+from compiler.dependencies import FunctionGraph, analyze_incremental
+
+
+class TestDependencies(object):
+
+    source = '''int x;
+    float y[4];
+    int f(int a) { return a + x; }
+    float g(void) { return y[1]; }
+    int h(int b) { return f(b) * 2; }
+    void main(void) { x = h(1); }'''
+
+    @staticmethod
+    def analyze(source: str, graph=None):
+        tokens = lexer.TokenStream.from_string(source)
+        program = parser.parse(tokens)
+        diagnostics, graph = analyze_incremental(program, tokens, graph)
+        assert diagnostics == semantics.analyze_with_diagnostics(program, tokens)  # same as a full run
+        return [str(d) for d in diagnostics], FunctionGraph.from_bytes(graph.to_bytes()), graph.checked
+
+    def test_checks_everything_the_first_time(self):
+        assert self.analyze(self.source)[0::2] == ([], [2, 3, 4, 5])
+
+    def test_checks_only_changed_functions(self):
+        _, graph, _ = self.analyze(self.source)
+        assert self.analyze(self.source.replace('f(b) * 2', 'f(b) * 3'), graph)[2] == [4]
+
+    def test_checks_users_of_changed_signatures(self):
+        _, graph, _ = self.analyze(self.source)
+        diagnostics, _, checked = self.analyze(self.source.replace('int f(int a)', 'int f(float a)'), graph)
+        assert checked == [2, 4] and diagnostics == ['3:31: Mixed mode arithmetic is not supported',
+                                                     '5:27: Parameter mismatch when calling function f']
+        diagnostics, _, checked = self.analyze(self.source.replace('int x;', 'float x;'), graph)
+        assert checked == [2, 5]
+        assert diagnostics == ['3:29: Mixed mode arithmetic is not supported',
+                               '6:25: Cannot assign an Type.INTEGER to an Type.FLOAT']
+
+    def test_moved_functions_keep_their_errors(self):
+        source = self.source.replace('return y[1];', 'return y;')
+        diagnostics, graph, _ = self.analyze(source)
+        assert diagnostics == ['4:21: An array cannot be returned from a function']
+        diagnostics, _, checked = self.analyze('int z;\n' + source, graph)
+        assert checked == [] and diagnostics == ['5:21: An array cannot be returned from a function']
+
+    def test_declaring_a_used_name_later_changes_nothing(self):
+        source = self.source.replace('return a + x;', 'return a + z;')
+        diagnostics, graph, _ = self.analyze(source)
+        assert diagnostics == ['3:31: Variable z has not been defined']
+        diagnostics, _, checked = self.analyze(source.replace('void main', 'int z;\nvoid main'), graph)
+        assert checked == [] and diagnostics == ['3:31: Variable z has not been defined']
+        diagnostics, _, checked = self.analyze(source.replace('int x;', 'int x; int z;'), graph)
+        assert checked == [3] and diagnostics == []  # f, now the fourth declaration
+
+    def test_annotates_only_checked_functions(self):
+        _, graph, _ = self.analyze(self.source)
+        tokens = lexer.TokenStream.from_string(self.source.replace('f(b) * 2', 'f(b) * 3'))
+        program = parser.parse(tokens)
+        analyze_incremental(program, tokens, graph)
+        f, h = program.declarations[2], program.declarations[4]
+        assert f.body.body[0].expression.annotation('resolved_type') is None  # reused
+        call = h.body.body[0].expression.lhs
+        assert call.annotation('resolved_type') == (Type.INTEGER, False) and call.binding is f
+
+    def test_rejects_damaged_graphs(self):
+        for data in [b'', b'CMG1{', b'CMG1[1]', b'CMG1{"a":1}']:
+            try:
+                FunctionGraph.from_bytes(data)
+                assert False, data
+            except ValueError:
+                pass
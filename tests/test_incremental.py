@@ -0,0 +1,107 @@
+import random
+
+import compiler.lexer as lexer
+import compiler.parser as parser
+from compiler.astnodes import Program
+from compiler.incremental import IncrementalParser
+
+
+class TestIncrementalParser(object):
+
+    sample = '''
+    int x[10]; float y;
+    int f(int a, float b[]) { int i; return a * (i + 2) - x[a] / 3; }
+    /* a comment */ void g(void) { }
+    void main(void) {
+        int z;
+        while (z < 10) { z = z + f(z, y); if (z == 3) g(); }
+        return;
+    }
+    '''
+
+    @classmethod
+    def check(cls, incremental: IncrementalParser):
+        # The tokens and the tree must match those of lexing and parsing the whole source again
+        stream = lexer.TokenStream.from_string(incremental.source)
+        assert list(incremental.tokens()) == list(zip(stream, stream.offsets))
+        assert incremental.program == parser.parse(lexer.lex(incremental.source))
+
+    def edit(self, incremental: IncrementalParser, old: str, new: str, after: str = ''):
+        start = incremental.source.index(old, incremental.source.index(after))
+        return incremental.edit(start, start + len(old), new)
+
+    def test_parses_initial_source(self):
+        incremental = IncrementalParser(self.sample)
+        assert isinstance(incremental.program, Program)
+        self.check(incremental)
+
+    def test_reuses_unchanged_declarations(self):
+        incremental = IncrementalParser(self.sample)
+        before = incremental.program.declarations
+        after = self.edit(incremental, 'a * (i + 2)', 'a + i', 'int f').declarations
+        assert [a is b for a, b in zip(before, after)] == [True, True, False, True, True]
+        assert incremental.reparsed == 1
+        self.check(incremental)
+
+    def test_relexes_only_the_edited_declaration(self):
+        incremental = IncrementalParser(self.sample)
+        self.edit(incremental, 'z < 10', 'z < 100')
+        assert incremental.relexed == len(lexer.lex(self.sample[self.sample.index('void main'):]))
+        self.check(incremental)
+
+    def test_adds_and_removes_declarations(self):
+        incremental = IncrementalParser(self.sample)
+        assert len(self.edit(incremental, 'float y;', 'float y; int w; int v[2];').declarations) == 7
+        assert len(self.edit(incremental, 'void g(void) { }', '').declarations) == 6
+        self.check(incremental)
+
+    def test_recovers_once_edit_is_undone(self):
+        incremental = IncrementalParser(self.sample)
+        assert self.edit(incremental, 'return a', 'return a +') is None
+        assert isinstance(self.edit(incremental, 'return a +', 'return a'), Program)
+        self.check(incremental)
+
+    def test_completes_declaration_across_later_ones(self):
+        incremental = IncrementalParser('int f(void) {\nint a;\n')
+        assert incremental.program is None
+        assert isinstance(incremental.edit(len(incremental.source), len(incremental.source), '}'), Program)
+        self.check(incremental)
+
+    def test_comments_out_following_declarations(self):
+        incremental = IncrementalParser(self.sample)
+        self.edit(incremental, '/* a comment */', '/* a comment')
+        self.check(incremental)
+        self.edit(incremental, '/* a comment', '// a comment\n')
+        self.check(incremental)
+
+    def test_comments_out_earlier_declarations_with_a_newline(self):
+        incremental = IncrementalParser('int a; int y; void main(void) { }')
+        assert incremental.edit(7, 7, '//') is None  # no newline ends the comment, so '//' is two '/'
+        self.check(incremental)
+        assert isinstance(self.edit(incremental, 'void', '\nvoid'), Program)
+        self.check(incremental)
+        assert self.edit(incremental, '\n', '') is None
+        self.check(incremental)
+
+    def test_joins_tokens_across_edit(self):
+        incremental = IncrementalParser('int x; int y;')
+        incremental.edit(5, 7, '')  # 'int xint y;'
+        self.check(incremental)
+        assert incremental.program is None
+
+    def test_matches_full_parse_after_random_edits(self):
+        pieces = ['int x;', '{', '}', '/*', '*/', '//', '\n', ' ', 'void f(void) {', 'return 1;', 'x = 2;', ';']
+        rng = random.Random(0)
+        incremental = IncrementalParser(self.sample)
+        for _ in range(300):
+            start = rng.randint(0, len(incremental.source))
+            end = min(len(incremental.source), start + rng.choice([0, 1, 5]))
+            incremental.edit(start, end, rng.choice(pieces + ['']))
+            self.check(incremental)
+
+    def test_rejects_edit_outside_of_source(self):
+        try:
+            IncrementalParser('int x;').edit(3, 10, '')
+            assert False
+        except ValueError:
+            pass
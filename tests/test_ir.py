@@ -0,0 +1,53 @@
+from compiler.ir import EMPTY, POOLED, IR, integer, temp
+
+
+class TestIR(object):
+
+    quads = [
+        ('func', 'main', 'void', '0'),
+        ('alloc', '40', None, 'x'),
+        ('mult', '_t0', '4', '_t1'),
+        ('disp', 'x', '_t1', '_t2'),
+        ('add', '_t2', '1.5E-7', '_t3'),
+        ('brle', '_t3', None, '12'),
+        ('end', 'func', 'main', None),
+    ]
+
+    def test_reproduces_quadruples(self):
+        ir = IR(self.quads)
+        assert len(ir) == len(self.quads) and list(ir) == self.quads
+        assert ir[3] == self.quads[3] and ir[-1] == self.quads[-1]
+
+    def test_pools_only_names(self):
+        ir = IR(self.quads)
+        assert sorted(ir.pool) == ['1.5E-7', 'func', 'main', 'void', 'x']
+        assert ir.operand('_t3') == temp(3) and ir.operand('40') == integer(40)
+
+    def test_keeps_operands_that_only_look_like_numbers(self):
+        quads = [('assign', '007', None, '_t01'), ('assign', '12345678901', None, '_t'), ('arg', None, None, '-1')]
+        ir = IR(quads)
+        assert list(ir) == quads
+        assert {ir.operand(value) & 3 for quad in quads for value in quad[1:] if value} == {POOLED}
+
+    def test_patches_branches(self):
+        ir = IR()
+        assert ir.append(('func', 'main', 'void', '0')) == 0
+        branch = ir.append(('brne', '_t0', None, None))
+        ir.patch(branch, 7)
+        assert ir[branch] == ('brne', '_t0', None, '7')
+
+    def test_adds_operands(self):
+        ir = IR()
+        ir.add('mult', temp(0), integer(4), temp(1))
+        ir.add('call', ir.name('f'), ir.integer(2 ** 40), EMPTY)
+        assert list(ir) == [('mult', '_t0', '4', '_t1'), ('call', 'f', '1099511627776', None)]
+
+    def test_joins_irs_that_share_a_pool(self):
+        first = IR(self.quads[:3])
+        second = first.following()
+        second.extend(self.quads[3:])
+        assert list(IR.join([first, second])) == self.quads and second.pool is first.pool
+
+    def test_round_trips_bytes(self):
+        ir = IR.from_bytes(IR(self.quads).to_bytes())
+        assert list(ir) == self.quads and ir.operand('x') == IR(self.quads).operand('x')
@@ -1,3 +1,6 @@
+import io
+import mmap
+
 import compiler.lexer as lexer
 
 
@@ -77,6 +80,14 @@ class TestIdentifiers:
     def test_reads_identifiers_followed_by_numbers(self):
         assert lexer.lex('abc99') == [('ID', 'abc'), ('INTEGER', '99')]
 
+    def test_reads_identifiers_starting_with_keywords(self):
+        assert lexer.lex('integer iff returned elsewhere') == [
+            ('ID', 'integer'),
+            ('ID', 'iff'),
+            ('ID', 'returned'),
+            ('ID', 'elsewhere'),
+        ]
+
 
 class TestBrackets:
 
@@ -206,3 +217,84 @@ class TestIntegration:
             ('PUNCTUATION', '('),
             ('PUNCTUATION', ')'),
         ]
+
+
+class TestChunkBoundaries:
+
+    @staticmethod
+    def lex_in_chunks(string: str, size: int):
+        return list(lexer._tokenize(lexer._strip(string[i:i + size] for i in range(0, len(string), size))))
+
+    def test_joins_tokens_split_by_comments(self):
+        assert lexer.lex('in/**/t x =/* c */= 1/**/.5') == [
+            ('KEYWORD', 'int'),
+            ('ID', 'x'),
+            ('RELOP', '=='),
+            ('FLOAT', '1.5'),
+        ]
+
+    def test_line_comment_requires_newline(self):
+        assert lexer.lex('1 // 2') == [('INTEGER', '1'), ('MATHOP', '/'), ('MATHOP', '/'), ('INTEGER', '2')]
+
+    def test_chunk_size_doesnt_change_tokens(self):
+        string = '''
+          /* a /* nested */ comment */ int x[10]; // line comment
+          float y; void main(void) { x[1] = 2 >= 3.5E-2 + y /**/ / 4; } /* unclosed
+        '''
+        expected = lexer.lex(string)
+        for size in range(1, 8):
+            assert self.lex_in_chunks(string, size) == expected
+
+
+class TestStream:
+
+    source = 'int x; /* a /* nested */ comment */ float y; // café\nvoid main(void) { x = 1.5E+2; }'
+
+    def test_streams_text_files(self):
+        for size in [1, 2, 3, 64]:
+            assert list(lexer.lex_stream(io.StringIO(self.source), size)) == lexer.lex(self.source)
+
+    def test_streams_binary_files_split_inside_characters(self):
+        for size in [1, 2, 3, 64]:
+            stream = io.BytesIO(self.source.encode('utf-8'))
+            assert list(lexer.lex_stream(stream, size)) == lexer.lex(self.source)
+
+    def test_streams_paths_and_mmaps(self, tmp_path):
+        path = tmp_path / 'input.txt'
+        path.write_text(self.source, encoding='utf-8')
+        assert list(lexer.lex_stream(path)) == lexer.lex(self.source)
+        with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+            assert list(lexer.lex_stream(m, 5)) == lexer.lex(self.source)
+
+    def test_yields_tokens_lazily(self):
+        tokens = lexer.lex_stream(io.StringIO('int x;' + ' ' * 100 + '@'), 8)
+        assert next(tokens) == ('KEYWORD', 'int')
+
+
+class TestTokenStream:
+
+    def test_matches_lexed_tokens(self):
+        string = 'int x; /* c */ void main(void) { x = 1.5E+2 >= 3; }'
+        stream = lexer.TokenStream.from_string(string)
+        assert list(stream) == lexer.lex(string)
+        assert stream[1:3] == [('ID', 'x'), ('PUNCTUATION', ';')]
+
+    def test_interns_tokens(self):
+        stream = lexer.TokenStream.from_string('x x x')
+        assert len(stream) == 3 and len(stream.table) == 1
+        assert stream[0] is stream[2]
+        assert stream.kind(0) == lexer.KINDS['ID']
+
+    def test_records_positions_across_comments(self):
+        stream = lexer.TokenStream.from_string('int x;\n/* a\ncomment */ x = 1/*\n*/2;\n  y')
+        assert [stream.position(i) for i in range(len(stream))] == [
+            (1, 1), (1, 5), (1, 6), (3, 12), (3, 14), (3, 16), (4, 4), (5, 3),
+        ]
+        assert stream[5] == ('INTEGER', '12')
+        assert stream.offsets[3] == 23
+
+    def test_reads_files(self):
+        string = 'void main(void) {\n  x;\n}'
+        stream = lexer.TokenStream.from_file(io.StringIO(string), 4)
+        assert list(stream) == lexer.lex(string)
+        assert stream.position(6) == (2, 3)
@@ -0,0 +1,275 @@
+import compiler.codegen as codegen
+import compiler.lexer as lexer
+import compiler.parser as parser
+import compiler.semantics as semantics
+from compiler.optimize import fold_constants, number_values, optimize
+
+
+class TestOptimize(object):
+
+    @staticmethod
+    def to_ir(string: str):
+        analyzed = semantics.analyze(parser.parse(lexer.lex(string)))
+        assert analyzed is not None  # make sure the program passes the semantic analysis
+        return codegen.to_ir(analyzed)
+
+
+class TestFoldConstants(TestOptimize):
+
+    def fold(self, string: str):
+        return fold_constants(self.to_ir(string))
+
+    def test_folds_arithmetic(self):
+        assert self.fold('''
+        void main(void) {
+          int x; int y;
+          x = 2 * 4 + y;
+          y = 7 / 2 - 9 / (0 - 2);
+        }
+        ''') == [
+            ('func', 'main', 'void', '0'),
+            ('alloc', '4', None, 'x'),
+            ('alloc', '4', None, 'y'),
+            ('add', '8', 'y', '_t1'),
+            ('assign', '_t1', None, 'x'),
+            ('assign', '7', None, 'y'),  # integer division rounds towards zero
+            ('end', 'func', 'main', None),
+        ]
+
+    def test_folds_floats(self):
+        assert self.fold('''
+        void main(void) {
+          float f; int x;
+          f = 1.5 * 2.0 + 1.0 / 4.0;
+          x = 1 / 0;
+          f = 1E+300 * 1E+300;
+        }
+        ''') == [
+            ('func', 'main', 'void', '0'),
+            ('alloc', '4', None, 'f'),
+            ('alloc', '4', None, 'x'),
+            ('assign', '3.25', None, 'f'),
+            ('div', '1', '0', '_t3'),  # left for when it runs
+            ('assign', '_t3', None, 'x'),
+            ('mult', '1e+300', '1e+300', '_t4'),
+            ('assign', '_t4', None, 'f'),
+            ('end', 'func', 'main', None),
+        ]
+
+    def test_leaves_integers_that_overflow(self):
+        assert self.fold('''
+        void main(void) {
+          int x;
+          x = 65536 * 65536;
+          x = 2147483647 + 1;
+          x = 0 - 2147483647 - 1;
+        }
+        ''') == [
+            ('func', 'main', 'void', '0'),
+            ('alloc', '4', None, 'x'),
+            ('mult', '65536', '65536', '_t0'),
+            ('assign', '_t0', None, 'x'),
+            ('add', '2147483647', '1', '_t1'),
+            ('assign', '_t1', None, 'x'),
+            ('assign', '-2147483648', None, 'x'),  # the smallest int fits
+            ('end', 'func', 'main', None),
+        ]
+
+    def test_folds_floats_in_single_precision(self):
+        assert self.fold('''
+        void main(void) {
+          float f;
+          f = 0.1 + 0.2;
+          f = 3.4E+38 * 1.0;
+          f = 1E+8 * 1E+8 * 1E+8 * 1E+8 * 1E+8;
+          f = 1.5 * 2.0;
+        }
+        ''') == [
+            ('func', 'main', 'void', '0'),
+            ('alloc', '4', None, 'f'),
+            ('assign', '0.3', None, 'f'),
+            ('assign', '3.4e+38', None, 'f'),
+            ('mult', '1e+32', '100000000.0', '_t5'),  # 1e+40 is out of range
+            ('assign', '_t5', None, 'f'),
+            ('assign', '3.0', None, 'f'),  # still a float
+            ('end', 'func', 'main', None),
+        ]
+
+    def test_propagates_within_basic_blocks(self):
+        assert self.fold('''
+        void main(void) {
+          int x; int y; int a[4];
+          x = 3; y = x + 1; a[x - 2] = y;
+          while (x < 10) x = x + y;
+          y = x;
+        }
+        ''') == [
+            ('func', 'main', 'void', '0'),
+            ('alloc', '4', None, 'x'),
+            ('alloc', '4', None, 'y'),
+            ('alloc', '16', None, 'a'),
+            ('assign', '3', None, 'x'),
+            ('assign', '4', None, 'y'),
+            ('disp', 'a', '4', '_t3'),
+            ('assign', '4', None, '_t3'),
+            ('comp', 'x', '10', '_t4'),  # 9, the start of the loop
+            ('brge', '_t4', None, '14'),
+            ('add', 'x', 'y', '_t5'),
+            ('assign', '_t5', None, 'x'),
+            ('br', None, None, '9'),
+            ('assign', 'x', None, 'y'),  # 14
+            ('end', 'func', 'main', None),
+        ]
+
+    def test_resolves_constant_branches(self):
+        assert self.fold('''
+        void main(void) {
+          int x;
+          if (1 < 2) x = 1; else x = 2;
+          while (0) x = x + 1;
+          if (x) x = 3;
+        }
+        ''') == [
+            ('func', 'main', 'void', '0'),
+            ('alloc', '4', None, 'x'),
+            ('assign', '1', None, 'x'),
+            ('br', None, None, '6'),
+            ('assign', '2', None, 'x'),
+            ('br', None, None, '10'),  # 6
+            ('add', 'x', '1', '_t2'),
+            ('assign', '_t2', None, 'x'),
+            ('br', None, None, '6'),
+            ('comp', 'x', '0', '_t3'),  # 10, after a branch target
+            ('brle', '_t3', None, '14'),
+            ('assign', '3', None, 'x'),
+            ('br', None, None, '14'),
+            ('end', 'func', 'main', None),  # 14
+        ]
+
+    def test_forgets_what_calls_and_blocks_may_change(self):
+        assert self.fold('''
+        int g;
+        void f(void) { g = 2; }
+        void main(void) {
+          int x; int y;
+          g = 1; x = 1; y = 1;
+          { int x; x = 5; y = x; }
+          f();
+          y = x + g + y;
+        }
+        ''')[-6:] == [
+            ('end', 'block', None, None),
+            ('call', 'f', '0', '_t0'),
+            ('add', 'x', 'g', '_t1'),  # x is the one outside the block again
+            ('add', '_t1', '5', '_t2'),
+            ('assign', '_t2', None, 'y'),
+            ('end', 'func', 'main', None),
+        ]
+
+    def test_keeps_the_sample_program(self):
+        ir = self.to_ir(open('input.txt').read())
+        assert fold_constants(ir) == ir
+
+
+class TestNumberValues(TestOptimize):
+
+    def number(self, string: str):
+        ir = self.to_ir(string)
+        numbered = number_values(ir)
+        return len(ir), numbered
+
+    def test_reuses_array_elements(self):
+        assert self.number('''
+        void main(void) {
+          int a[10]; int i;
+          a[i] = a[i] + 1;
+        }
+        ''') == (10, [
+            ('func', 'main', 'void', '0'),
+            ('alloc', '40', None, 'a'),
+            ('alloc', '4', None, 'i'),
+            ('mult', 'i', '4', '_t0'),
+            ('disp', 'a', '_t0', '_t1'),
+            ('add', '_t1', '1', '_t2'),
+            ('assign', '_t2', None, '_t1'),
+            ('end', 'func', 'main', None),
+        ])
+
+    def test_renumbers_after_assignments(self):
+        assert self.number('''
+        void main(void) {
+          int a[10]; int i; int x;
+          x = a[i] * a[i];
+          a[i] = 5;
+          x = a[i] + i * 2 + 2 * i;
+          i = i + 1;
+          x = i * 2;
+        }
+        ''') == (25, [
+            ('func', 'main', 'void', '0'),
+            ('alloc', '40', None, 'a'),
+            ('alloc', '4', None, 'i'),
+            ('alloc', '4', None, 'x'),
+            ('mult', 'i', '4', '_t0'),
+            ('disp', 'a', '_t0', '_t1'),
+            ('mult', '_t1', '_t1', '_t4'),
+            ('assign', '_t4', None, 'x'),
+            ('assign', '5', None, '_t1'),
+            ('disp', 'a', '_t0', '_t8'),  # the element may have changed, its offset hasn't
+            ('mult', 'i', '2', '_t9'),
+            ('add', '_t8', '_t9', '_t10'),
+            ('add', '_t10', '_t9', '_t12'),
+            ('assign', '_t12', None, 'x'),
+            ('add', 'i', '1', '_t13'),
+            ('assign', '_t13', None, 'i'),
+            ('mult', 'i', '2', '_t14'),
+            ('assign', '_t14', None, 'x'),
+            ('end', 'func', 'main', None),
+        ])
+
+    def test_renumbers_after_calls(self):
+        n, ir = self.number('''
+        int g;
+        int f(int v[]) { v[0] = 1; g = 2; return 0; }
+        void main(void) {
+          int a[10]; int x;
+          x = a[0] + g + f(a) + a[0] + g;
+        }
+        ''')
+        assert n == len(ir)
+
+    def test_keeps_blocks_apart(self):
+        n, ir = self.number('''
+        void main(void) {
+          int a[10]; int i;
+          while (i < 10) { a[i] = a[i] * 2; i = i + 1; }
+          a[i] = a[i] * 2;
+        }
+        ''')
+        assert n - len(ir) == 4  # the offset and element of each assignment
+        assert ir[3:5] == [('comp', 'i', '10', '_t0'), ('brge', '_t0', None, '15')]
+        assert ir[13:15] == [('br', None, None, '4'), ('mult', 'i', '4', '_t7')]  # not reused from the loop
+
+    def test_shrinks_array_heavy_code(self):
+        ir = self.to_ir(self.program)
+        numbered = number_values(ir)
+        assert len(numbered) < 0.8 * len(ir)
+        assert optimize(ir) == number_values(fold_constants(ir))
+
+    program = '''
+    void swap(int v[], int i, int j) {
+      int t;
+      t = v[i]; v[i] = v[j]; v[j] = t;
+    }
+    void main(void) {
+      int a[100]; int i; int j;
+      i = 0;
+      while (i < 99) {
+        j = i + 1;
+        if (a[i] > a[j]) swap(a, i, j);
+        a[i] = a[i] + a[i] * a[i] - a[i] / (a[j] + 1);
+        a[j] = (a[j] - a[i]) * (a[j] - a[i]);
+        i = i + 1;
+      }
+    }
+    '''
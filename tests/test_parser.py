@@ -1,6 +1,12 @@
+import io
+import sys
+
+import pytest
+
 import compiler.lexer as lexer
 import compiler.parser as parser
-from compiler.astnodes import Program
+from compiler.astnodes import AssignmentExpression, BinaryOp, Program, Variable
+from compiler.grammar import CMINUS
 
 
 class TestParser(object):
@@ -32,4 +38,204 @@ class TestParser(object):
             }
         }
         extra
-        ''') is False
\ No newline at end of file
+        ''') is False
+
+    def test_parses_token_streams(self):
+        stream = lexer.TokenStream.from_string('void main(void) { int x; x = 2; }')
+        assert isinstance(parser.parse(stream), Program)
+
+    def test_reports_position_of_unexpected_token(self):
+        stream = lexer.TokenStream.from_string('void main(void) {\n  x = ;\n}')
+        with pytest.raises(parser.ParseError) as e:
+            parser.CMinusParser(stream).parse()
+        assert e.value.args[2] == (2, 7)
+
+    def test_leaves_tokens_untouched(self):
+        tokens = lexer.lex('void main(void) { int x; x = 2; }')
+        copy = list(tokens)
+        assert isinstance(parser.parse(tokens), Program)
+        assert tokens == copy
+
+    def test_parses_token_iterators(self):
+        tokens = lexer.lex_stream(io.StringIO('int x; void main(void) { x = 2; }'), 4)
+        assert isinstance(parser.parse(tokens), Program)
+        assert parser.parse(iter(lexer.lex('void main(void) { } extra'))) is None
+
+    def test_rejects_truncated_declarations(self):
+        assert self.parse('''
+        void main(void) { }
+        int f(void) {
+        ''') is False
+
+
+class TestExpressions(object):
+
+    @staticmethod
+    def expression(string: str):
+        program = parser.parse(lexer.lex('void main(void) { ' + string + '; }'))
+        return program and program.declarations[0].body.body[0].expression
+
+    @classmethod
+    def shape(cls, node):
+        if isinstance(node, BinaryOp):
+            return cls.shape(node.lhs), node.op, cls.shape(node.rhs)
+        if isinstance(node, AssignmentExpression):
+            return cls.shape(node.var), '=', cls.shape(node.value)
+        return node.name if isinstance(node, Variable) else node.value
+
+    def test_groups_operators_by_precedence(self):
+        assert self.shape(self.expression('a + b * c - d / e < f')) == (
+            (('a', '+', ('b', '*', 'c')), '-', ('d', '/', 'e')), '<', 'f')
+
+    def test_operators_associate_left(self):
+        assert self.shape(self.expression('a - b - c * d * e')) == (('a', '-', 'b'), '-', (('c', '*', 'd'), '*', 'e'))
+
+    def test_assignments_associate_right(self):
+        assert self.shape(self.expression('a = b = (c) + 1')) == ('a', '=', ('b', '=', ('c', '+', 1)))
+
+    def test_relational_operators_dont_chain(self):
+        assert self.expression('a < b < c') is None
+        assert self.shape(self.expression('(a < b) < c')) == (('a', '<', 'b'), '<', 'c')
+
+    def test_only_variables_are_assigned(self):
+        assert self.expression('(a) = 1') is None
+        assert self.expression('f() = 1') is None
+        assert self.expression('a + b = 1') is None
+
+
+class TestStress(object):
+
+    @staticmethod
+    def statements(n: int) -> str:
+        return 'void main(void) { int x; ' + 'x = x + 1;' * n + ' }'
+
+    @staticmethod
+    def terms(n: int) -> str:
+        return 'void main(void) { int x; x = ' + ' + '.join(['x * 2'] * n) + '; }'
+
+    def test_parses_100k_statement_bodies(self):
+        program = parser.parse(lexer.lex(self.statements(100000)))
+        assert len(program.declarations[0].body.body) == 100000
+
+    def test_parses_50k_term_expressions(self):
+        program = parser.parse(lexer.lex(self.terms(50000)))
+        node, terms = program.declarations[0].body.body[0].expression.value, 1
+        while isinstance(node, BinaryOp) and node.op == '+':
+            assert node.rhs.op == '*'
+            node, terms = node.lhs, terms + 1
+        assert terms == 50000
+
+
+class TestLLParser(object):
+
+    sample = '''
+    int x[10]; float y;
+    int f(int a, float b[]) { int i; return a * (i + 2) - x[a] / 3; }
+    void g(void) { }
+    void main(void) {
+        int z;
+        while (z < 10) { z = z + f(z, y); if (z == 3) if (z) g(); else ; }
+        y = 1.5E-2 * y;
+        return;
+    }
+    '''
+
+    def test_builds_same_tree_as_recursive_descent(self):
+        tokens = lexer.lex(self.sample)
+        assert parser.LLParser(tokens).parse() == parser.CMinusParser(tokens).parse()
+
+    def test_rejects_invalid_programs(self):
+        for string in ['int main() { }', 'void main(void) { x = ; }', 'void main(void) { } extra', '']:
+            try:
+                parser.LLParser(lexer.lex(string)).parse()
+                assert False, string
+            except Exception as e:
+                assert e.args[0] == 'unexpected token'
+
+    def test_parses_deeply_nested_programs(self):
+        string = 'void main(void) { x = ' + '(' * 5000 + '1' + ')' * 5000 + '; ' + '{' * 5000 + '}' * 5000 + ' }'
+        assert isinstance(parser.LLParser(lexer.lex(string)).parse(), Program)
+        assert isinstance(parser.parse(lexer.lex(string)), Program)
+
+    def test_computes_first_and_follow_sets(self):
+        assert CMINUS.first['expression'] == {'(', 'ID', 'INTEGER', 'FLOAT'}
+        assert CMINUS.follow['expression'] == {';', ')', ']', ','}
+        assert 'operators' in CMINUS.nullable and 'expression' not in CMINUS.nullable
+
+    def test_resolves_dangling_else_to_closest_if(self):
+        assert CMINUS.table['selection-stmt\'']['else'].body == ('else', 'statement')
+
+
+class TestRecognizer(object):
+
+    def test_accepts_what_the_parser_accepts(self):
+        strings = [TestLLParser.sample, 'int main() { }', 'void main(void) { x = ; }', 'void main(void) { } extra',
+                   '', 'int x', 'void main(void) { if (a < b) if (b) ; else x = y = 2; }', 'int a[2.5];']
+        for string in strings:
+            expected = parser.parse(lexer.lex(string)) is not None
+            assert parser.recognize(lexer.lex(string)) is expected, string
+            assert parser.recognize(lexer.TokenStream.from_string(string)) is expected, string
+
+    def test_recognizes_deeply_nested_programs(self):
+        string = 'void main(void) { x = ' + '(' * 5000 + '1' + ')' * 5000 + '; ' + '{' * 5000 + '}' * 5000 + ' }'
+        assert parser.recognize(lexer.TokenStream.from_string(string)) is True
+        assert parser.recognize(lexer.lex(string[:-1])) is False
+
+
+class TestRecovery(object):
+
+    @staticmethod
+    def parse(string: str):
+        program, diagnostics = parser.parse_with_diagnostics(lexer.TokenStream.from_string(string))
+        return program, [str(d) for d in diagnostics]
+
+    def test_reports_every_syntax_error(self):
+        program, diagnostics = self.parse('''int x[10];
+            int f(int a b) { return a; }
+            void g(void) {
+                int y;
+                y = ;
+                while (y < ) { y = y + 1; }
+                if (y == 1 x = 2;
+                y = 3;
+            }
+            float z
+            void main(void) { g(); }''')
+        assert diagnostics == [
+            "2:25: unexpected token 'b'",
+            "5:21: unexpected token ';'",
+            "6:28: unexpected token ')'",
+            "7:28: unexpected token 'x'",
+            "11:13: unexpected token 'void'",
+        ]
+        assert [d.name for d in program.declarations] == ['x', 'g', 'main']
+        assert len(program.declarations[1].body.body) == 1
+
+    def test_valid_programs_have_no_diagnostics(self):
+        program, diagnostics = self.parse('int x; void main(void) { x = 1; }')
+        assert diagnostics == [] and len(program.declarations) == 2
+
+    def test_skips_misplaced_local_declarations(self):
+        program, diagnostics = self.parse('void main(void) { x = 1; int y; y = 2; }')
+        assert diagnostics == ["1:26: unexpected token 'int'"]
+        assert len(program.declarations[0].body.body) == 2
+
+    def test_resumes_at_next_function_after_unclosed_block(self):
+        program, diagnostics = self.parse('void f(void) { x = 1;\nvoid main(void) { }')
+        assert diagnostics == ["2:1: unexpected token 'void'"]
+        assert [d.name for d in program.declarations] == ['main']
+
+    def test_reports_end_of_input(self):
+        assert self.parse('void main(void) {')[1] == ['1:17: unexpected end of input']
+        assert self.parse('')[1] == ['1:1: expected a declaration']
+
+    def test_uses_token_indexes_without_positions(self):
+        program, diagnostics = parser.parse_with_diagnostics(lexer.lex('void main(void) { ) }'))
+        assert [str(d) for d in diagnostics] == ["token 6: unexpected token ')'"]
+
+    def test_parses_programs_nested_deeper_than_the_recursion_limit(self):
+        depth = sys.getrecursionlimit() + 100
+        program, diagnostics = self.parse('void main(void) { int x; x = ' + '(' * depth + '1' + ')' * depth + '; }')
+        assert diagnostics == [] and [d.name for d in program.declarations] == ['main']
+        program, diagnostics = self.parse('void main(void) { x = ' + '(' * depth + '1' + ')' * depth + ' }')
+        assert diagnostics == [f"1:{2 * depth + 25}: unexpected token '}}'"] and program.declarations == []
@@ -0,0 +1,44 @@
+from compiler.scopes import SymbolTable
+
+
+class TestSymbolTable(object):
+
+    def test_inner_scopes_shadow_outer_ones(self):
+        table = SymbolTable()
+        table.insert('x', 'global')
+        table.enter()
+        assert table.lookup('x') == 'global'
+        table.insert('x', 'local')
+        assert table.lookup('x') == 'local'
+        table.exit()
+        assert table.lookup('x') == 'global'
+
+    def test_declared_only_in_innermost_scope(self):
+        table = SymbolTable()
+        table.insert('x', 1)
+        table.enter()
+        assert not table.declared('x')
+        table.insert('x', 2)
+        assert table.declared('x')
+        assert not table.declared('y')
+
+    def test_exit_forgets_scope_names(self):
+        table = SymbolTable()
+        table.enter()
+        table.insert('y', 1)
+        table.enter()
+        table.insert('y', 2)
+        table.exit()
+        table.exit()
+        assert table.lookup('y') is None
+        assert table.bindings == {} and table.depth == 0
+
+    def test_deep_nesting(self):
+        table = SymbolTable()
+        for depth in range(10000):
+            table.enter()
+            table.insert(f'v{depth % 10}', depth)
+        assert table.lookup('v3') == 9993
+        for _ in range(10000):
+            table.exit()
+        assert table.bindings == {}
@@ -1,6 +1,8 @@
 import compiler.lexer as lexer
 import compiler.parser as parser
 import compiler.semantics as semantics
+from compiler.arena import Arena
+from compiler.astnodes import Type
 
 
 class TestSemantics(object):
@@ -9,7 +11,12 @@ class TestSemantics(object):
     def analyze(string: str):
         parse = parser.parse(lexer.lex(string))
         assert parse is not None  # make sure the program is grammatically valid
-        return semantics.analyze(parse) is not None
+        valid = semantics.analyze(parse) is not None
+        assert (semantics.analyze_arena(Arena.from_tree(parse)) is not None) is valid  # same on the arena
+        diagnostics = semantics.analyze_with_diagnostics(parse)
+        assert (not diagnostics) is valid  # same when recovering
+        assert semantics.analyze_parallel(parse, workers=1) == diagnostics  # and function by function
+        return valid
 
     @staticmethod
     def with_main(string: str) -> str:
@@ -341,3 +348,131 @@ class TestScope(TestSemantics):
           while (1) { int x; }
           x = 4;
         }''') is False
+
+
+class TestDiagnostics(TestSemantics):
+
+    @staticmethod
+    def diagnostics(string: str):
+        tokens = lexer.TokenStream.from_string(string)
+        return [str(d) for d in semantics.analyze_with_diagnostics(parser.parse(tokens), tokens)]
+
+    def test_reports_every_error(self):
+        assert self.diagnostics('''int x;
+        void x(void) { }
+        void main(void) { int x; int x; y = 1; x = f(1); }''') == [
+            '3:34: Variable x has already been declared',
+            '3:41: Variable y has not been defined',
+            '3:52: Function f has not been defined',
+        ]
+
+    def test_errors_are_not_reported_again_by_enclosing_expressions(self):
+        assert self.diagnostics('''int f(int a) { return a; }
+        void main(void) {
+            int x[4];
+            if (x[y] * 2 + 1 > f(z)) x[0] = 1.0 + x[1] - 3;
+        }''') == [
+            '4:19: Variable y has not been defined',
+            '4:34: Variable z has not been defined',
+            '4:49: Mixed mode arithmetic is not supported',
+        ]
+
+    def test_analysis_goes_on_after_declaration_errors(self):
+        assert self.diagnostics('''void v;
+        int f(void x, int x) { }
+        void main(void) { v = 1; f(v, 1); }''') == [
+            '1:1: Declaration v cannot have void type',
+            '2:15: Named parameter x cannot be of type void',
+            '2:23: Variable x has already been declared',
+            '2:9: Type.INTEGER function must have at least one return',
+        ]
+
+    def test_last_declaration_should_be_void_main_void(self):
+        assert self.diagnostics('''void main(void) { }
+        int f(void) { return 1.5; }''') == [
+            '2:23: Return type does not match function type Type.INTEGER',
+            '2:9: Last declaration should be void main(void)',
+        ]
+
+    def test_positions_are_indexes_without_tokens(self):
+        program = parser.parse(lexer.lex('void main(void) { x = 1; }'))
+        assert [str(d) for d in semantics.analyze_with_diagnostics(program)] == [
+            'token 6: Variable x has not been defined']
+        assert [str(d) for d in semantics.analyze_with_diagnostics(Arena.from_tree(program).to_tree())] == [
+            'token 6: Variable x has not been defined']  # the arena keeps the positions
+
+    def test_valid_programs_have_no_diagnostics(self):
+        assert self.diagnostics('int x; void main(void) { x = 1; }') == []
+
+
+class TestParallel(TestSemantics):
+
+    source = '''int x;
+    int f(int a) { return a + x + g(1); }
+    int x;
+    int g(int b) { return f(b) * y; }
+    float y;
+    void h(void) { y = 1.0; return 2; }
+    int f(void) { return h(); }
+    void main(void) { x = f(1) + z; }'''
+
+    def test_same_as_a_single_pass(self):
+        tokens = lexer.TokenStream.from_string(self.source)
+        program = parser.parse(tokens)
+        expected = semantics.analyze_with_diagnostics(program, tokens)
+        assert [str(d) for d in expected] == [
+            '2:35: Function g has not been defined',  # declared later
+            '3:5: Variable x has already been declared',
+            '4:34: Variable y has not been defined',
+            '6:29: Return type does not match function type Type.VOID',
+            '7:5: Function f has already been declared',
+            '7:19: A void function cannot be used in a return expression',
+            '8:34: Variable z has not been defined',
+        ]
+        assert semantics.analyze_parallel(program, tokens, workers=1) == expected
+        assert semantics.analyze_parallel(program, tokens, workers=2) == expected
+
+    def test_valid_programs(self):
+        program = parser.parse(lexer.lex(self.with_main('''
+        int f(int a[]) { return a[0]; }
+        int g(void) { int a[2]; return f(a); }''')))
+        assert semantics.analyze_parallel(program, workers=2) == []
+
+
+class TestAnnotations(TestSemantics):
+
+    def test_expressions_have_their_types(self):
+        program = parser.parse(lexer.lex('''float g(float a[]) { return a[0] * 2.0; }
+        void main(void) { float b[2]; int i; i = 1 < 2; b[i] = g(b); }'''))
+        copy = Arena.from_tree(program).to_tree()
+        semantics.analyze(program)
+        g, main = program.declarations
+        ret = g.body.body[0].expression
+        assert ret.resolved_type == (Type.FLOAT, False)
+        assert ret.lhs.resolved_type == (Type.FLOAT, False) and ret.rhs.resolved_type == (Type.FLOAT, False)
+        assert ret.lhs.index.resolved_type == (Type.INTEGER, False)
+        compare, store = main.body.body[0].expression, main.body.body[1].expression
+        assert compare.value.resolved_type == (Type.INTEGER, False)
+        assert store.resolved_type == (Type.FLOAT, False)
+        assert store.value.args[0].resolved_type == (Type.FLOAT, True)
+        assert program == copy  # annotations aren't fields
+
+    def test_names_are_bound_to_their_declarations(self):
+        program = parser.parse(lexer.lex('''int x;
+        int f(int x) { return x; }
+        void main(void) { x = f(x); { int x; x = 2; } }'''))
+        semantics.analyze(program)
+        x, f, main = program.declarations
+        assert f.body.body[0].expression.binding is f.params[0]
+        assign = main.body.body[0].expression
+        assert assign.var.binding is x and assign.value.args[0].binding is x
+        assert assign.value.binding is f
+        inner = main.body.body[1]
+        assert inner.body[0].expression.var.binding is inner.vars[0]
+
+    def test_errors_have_no_type(self):
+        program = parser.parse(lexer.lex('void main(void) { int x; x = y + 1; }'))
+        semantics.analyze_with_diagnostics(program)
+        assign = program.declarations[0].body.body[0].expression
+        assert assign.value.lhs.binding is None
+        assert assign.value.resolved_type == semantics.ERROR and assign.resolved_type == semantics.ERROR
@@ -0,0 +1,52 @@
+import pytest
+
+from compiler.astnodes import *
+from compiler.codegen import CodeGenerator
+from compiler.semantics import SemanticAnalyzer
+from compiler.visitor import Visitor, visits
+
+
+class Printer(Visitor):
+
+    @visits(Number)
+    def number(self, node: Number, suffix: str = '') -> str:
+        return f'{node.value}{suffix}'
+
+    @visits(Statement)
+    def statement(self, node: Statement) -> str:
+        return 'statement'
+
+
+class Louder(Printer):
+
+    def number(self, node: Number, suffix: str = '') -> str:
+        return f'{node.value}!{suffix}'
+
+
+class TestVisitor(object):
+
+    def test_builds_table_with_class(self):
+        assert Printer.dispatch == {Number: Printer.number, Statement: Printer.statement}
+
+    def test_passes_arguments(self):
+        assert Printer().visit(Number(1)) == '1'
+        assert Printer().visit(Number(1), '?') == '1?'
+
+    def test_falls_back_to_base_class(self):
+        assert Printer().visit(ReturnStatement(None)) == 'statement'
+        assert Printer.dispatch[ReturnStatement] is Printer.statement
+
+    def test_overrides_by_name(self):
+        assert Louder().visit(Number(1)) == '1!'
+        assert Printer().visit(Number(1)) == '1'
+
+    def test_rejects_unknown_nodes(self):
+        with pytest.raises(Exception, match='Unknown node type Variable'):
+            Printer().visit(Variable('x', None))
+
+    def test_covers_every_node_of_the_passes(self):
+        expressions = [Variable, Call, BinaryOp, AssignmentExpression, Number]
+        statements = [ExpressionStatement, CompoundStatement, IfStatement, WhileStatement, ReturnStatement]
+        declarations = [VarDeclaration, FunDeclaration]
+        for visitor in [SemanticAnalyzer, CodeGenerator]:
+            assert set(visitor.dispatch) >= set(expressions + statements + declarations)